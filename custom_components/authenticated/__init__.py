@@ -2,27 +2,48 @@
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+import homeassistant.helpers.config_validation as cv
 
 from .const import DOMAIN
 
 PLATFORMS = ["sensor"]
 
+# Only the legacy ``sensor: platform: authenticated`` YAML is supported.
+CONFIG_SCHEMA = cv.platform_only_config_schema(DOMAIN)
+
 
 class AuthenticatedBaseException(Exception):
     """Base exception for Authenticated."""
 
 
+async def async_setup(hass: HomeAssistant, config) -> bool:
+    """Set up the Authenticated services and websocket commands."""
+    from .services import async_setup_services
+    from .websocket_api import async_setup_websocket_api
+
+    async_setup_services(hass)
+    async_setup_websocket_api(hass)
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Authenticated from a config entry."""
+    from .coordinator import async_get_coordinator
+
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = entry.data
+    hass.data[DOMAIN][entry.entry_id] = async_get_coordinator(
+        hass, entry.data, entry.entry_id
+    )
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
+    from .coordinator import async_release_coordinator
+
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id, None)
+        await async_release_coordinator(hass, entry.entry_id)
     return unload_ok
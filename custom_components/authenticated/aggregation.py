@@ -0,0 +1,276 @@
+"""Merge login data from several Home Assistant nodes via a shared directory.
+
+Every node periodically publishes its tracked IP records as a CSV journal
+(``<node>.journal.csv``) into the shared directory. A node running in
+aggregate mode ingests all journals and merges them last-writer-wins on
+``last_used_at`` per (node, IP, user). All nodes consult one geo cache
+(``geo_cache.json``) in the same directory before calling their provider, so
+an IP is looked up once for the whole fleet instead of once per node, and
+count their provider requests in one ``quota.json``, so the fleet shares
+one provider quota. Nodes update both files under an exclusive ``flock`` on
+a ``.lock`` file next to them, so concurrent flushes do not lose updates.
+"""
+
+import csv
+import fcntl
+import logging
+import os
+import threading
+from contextlib import contextmanager, suppress
+from itertools import islice
+
+from .export import FORMAT_CSV, RECORD_COLUMNS, iter_records, write_export
+from .serialization import json_dumps, load_json_file
+
+_LOGGER = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal.csv"
+GEO_CACHE_FILE = "geo_cache.json"
+QUOTA_FILE = "quota.json"
+# Most recently stored results kept in the shared geo cache.
+MAX_GEO_CACHE_ENTRIES = 50000
+
+
+def _stat(path):
+    with suppress(OSError):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    return None
+
+
+@contextmanager
+def _file_lock(path):
+    """Hold an exclusive lock shared with every process updating ``path``.
+
+    The lock is taken on a separate ``.lock`` file, since ``path`` itself is
+    replaced on each write.
+    """
+    with open(f"{path}.lock", "ab") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _replace_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json_dumps(data))
+    os.replace(tmp_path, path)
+
+
+class SharedGeoCache:
+    """Geo lookup results shared by all nodes through one JSON file.
+
+    Reads are served from memory and refreshed when the file changes; new
+    results are buffered and merged into the file on :meth:`flush`, which
+    keeps only the ``max_entries`` most recently stored ones. Methods are
+    called from executor threads, so access is serialized by a lock.
+    """
+
+    def __init__(self, path, max_entries=MAX_GEO_CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = {}
+        self._pending = {}
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            return load_json_file(self.path)
+        except (OSError, ValueError):
+            return {}
+
+    def refresh(self):
+        """Reload the cache file if another node changed it."""
+        with self._lock:
+            stat = _stat(self.path)
+            if stat is None or stat == self._stat:
+                return
+            self._entries = {**self._read(), **self._pending}
+            self._stat = stat
+
+    def get(self, ip):
+        """Return the cached ``computed_result`` for ``ip``, if any."""
+        with self._lock:
+            return self._entries.get(ip)
+
+    def put(self, ip, result):
+        """Remember ``result`` for ``ip`` until the next flush."""
+        with self._lock:
+            self._entries[ip] = result
+            self._pending[ip] = result
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def shed(self):
+        """Drop the entries read from the file, keeping unflushed results.
+
+        The file is not read again until another node changes it.
+        """
+        with self._lock:
+            self._entries = dict(self._pending)
+
+    def flush(self):
+        """Merge buffered results into the shared file, dropping the oldest."""
+        with self._lock:
+            if not self._pending:
+                return
+            with _file_lock(self.path):
+                entries = self._read()
+                # Re-inserted so the file stays ordered oldest first.
+                for ip, result in self._pending.items():
+                    entries.pop(ip, None)
+                    entries[ip] = result
+                excess = len(entries) - self.max_entries
+                if excess > 0:
+                    entries = dict(islice(entries.items(), excess, None))
+                _replace_json(self.path, entries)
+                self._stat = _stat(self.path)
+            self._entries = entries
+            self._pending = {}
+
+
+class SharedQuota:
+    """Provider request counts shared by all nodes through one JSON file.
+
+    The file holds the fleet's counts per provider and period, as
+    ``{provider: {period: {"key": ..., "used": ...}}}``. Requests counted
+    here are buffered as deltas and added to the file on :meth:`flush`, so
+    nodes add to each other's counts instead of overwriting them. Methods
+    are called from the event loop and executor threads, so access is
+    serialized by a lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._usage = {}
+        self._pending = {}
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            return load_json_file(self.path)
+        except (OSError, ValueError):
+            return {}
+
+    def refresh(self):
+        """Reload the quota file if another node changed it."""
+        with self._lock:
+            stat = _stat(self.path)
+            if stat is None or stat == self._stat:
+                return
+            self._usage = self._read()
+            self._stat = stat
+
+    def add(self, provider, keys, count):
+        """Count ``count`` requests in the periods ``keys`` maps to their keys."""
+        with self._lock:
+            for period, key in keys.items():
+                slot = (provider, period, key)
+                self._pending[slot] = self._pending.get(slot, 0) + count
+
+    def used(self, provider, period, key):
+        """Return the fleet's requests to ``provider`` in the period ``key``."""
+        with self._lock:
+            entry = self._usage.get(provider, {}).get(period) or {}
+            used = entry.get("used", 0) if entry.get("key") == key else 0
+            return max(used + self._pending.get((provider, period, key), 0), 0)
+
+    def flush(self):
+        """Add buffered counts to the shared file."""
+        with self._lock:
+            if not self._pending:
+                return
+            with _file_lock(self.path):
+                usage = self._read()
+                for (provider, period, key), count in self._pending.items():
+                    periods = usage.setdefault(provider, {})
+                    entry = periods.get(period) or {}
+                    if (entry.get("key") or "") > key:
+                        # Another node already started the next period.
+                        continue
+                    if entry.get("key") != key:
+                        entry = periods[period] = {"key": key, "used": 0}
+                    entry["used"] = max(entry.get("used", 0) + count, 0)
+                _replace_json(self.path, usage)
+                self._stat = _stat(self.path)
+            self._usage = usage
+            self._pending = {}
+
+
+class NodeAggregator:
+    """Publish this node's journal and merge the journals of other nodes."""
+
+    def __init__(self, shared_dir, node_id, aggregate=False):
+        self.shared_dir = shared_dir
+        self.node_id = node_id
+        self.aggregate = aggregate
+        self.geo_cache = SharedGeoCache(os.path.join(shared_dir, GEO_CACHE_FILE))
+        self.quota = SharedQuota(os.path.join(shared_dir, QUOTA_FILE))
+        self.merged = {}
+        self._journal_stats = {}
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.shared_dir, f"{self.node_id}{JOURNAL_SUFFIX}")
+
+    def merge_row(self, node, row):
+        """Merge one record, keeping the most recently used version."""
+        key = (node, row.get("ip"), row.get("user_id") or None)
+        current = self.merged.get(key)
+        if current is None or (row.get("last_used_at") or "") > (
+            current.get("last_used_at") or ""
+        ):
+            self.merged[key] = {**row, "node": node}
+
+    def _ingest_journal(self, node, path):
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                self.merge_row(node, {k: v for k, v in row.items() if v != ""})
+
+    def ingest(self):
+        """Merge every journal in the shared directory that changed."""
+        changed = 0
+        with os.scandir(self.shared_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(JOURNAL_SUFFIX):
+                    continue
+                stat = _stat(entry.path)
+                if stat is None or self._journal_stats.get(entry.path) == stat:
+                    continue
+                node = entry.name[: -len(JOURNAL_SUFFIX)]
+                try:
+                    self._ingest_journal(node, entry.path)
+                except (OSError, csv.Error) as err:
+                    _LOGGER.warning("Unable to ingest journal %s: %s", entry.path, err)
+                    continue
+                self._journal_stats[entry.path] = stat
+                changed += 1
+        return changed
+
+    def sync(self, records):
+        """Publish ``records`` as this node's journal and refresh shared state.
+
+        Runs in an executor job.
+        """
+        os.makedirs(self.shared_dir, exist_ok=True)
+        write_export(self.journal_path, FORMAT_CSV, RECORD_COLUMNS, iter_records(records))
+        self.geo_cache.flush()
+        self.geo_cache.refresh()
+        self.quota.flush()
+        self.quota.refresh()
+        if self.aggregate:
+            changed = self.ingest()
+            _LOGGER.debug(
+                "Ingested %s changed journals, %s merged records", changed, len(self.merged)
+            )
+
+    def merged_rows(self):
+        """Return the merged rows for every (node, IP, user)."""
+        return list(self.merged.values())
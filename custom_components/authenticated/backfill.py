@@ -0,0 +1,108 @@
+"""Low-priority re-enrichment of tracked IPs whose geo data has gone stale."""
+
+import heapq
+import logging
+import time
+from datetime import timedelta
+
+from homeassistant.util import dt as dt_util
+
+from .blocking import guarded
+from .quota import PRIORITY_BACKFILL
+
+_LOGGER = logging.getLogger(__name__)
+
+BACKFILL_INTERVAL = timedelta(minutes=10)
+BACKFILL_BATCH = 3
+IDLE_SECONDS = 120
+FAILURE_BACKOFF = 60 * 60
+
+
+def is_stale(ipdata, cutoff):
+    """Return True if ``ipdata`` was never enriched or enriched before ``cutoff``."""
+    return not ipdata.enriched_at or ipdata.enriched_at < cutoff
+
+
+class BackfillScheduler:
+    """Re-enrich stale records a few at a time while the integration is idle.
+
+    Live logins and due retries always go first: a batch only starts when no
+    login arrived for ``idle`` seconds and no retry is due or paused, and it
+    stops as soon as either changes. A Retry-After from the provider pauses
+    the backfill, and so does running into the share of the provider quota
+    kept for live logins and retries. Candidates are the most recently used
+    IPs first, so active addresses are refreshed before ones nobody logs in
+    from any more.
+    """
+
+    def __init__(self, coordinator, max_age_days, batch_size=BACKFILL_BATCH, idle=IDLE_SECONDS):
+        self.coordinator = coordinator
+        self.max_age = timedelta(days=max_age_days)
+        self.batch_size = batch_size
+        self.idle = idle
+        self.paused_until = 0.0
+        self._skip_until = {}
+        self._running = False
+
+    def is_idle(self, now=None):
+        """Return True if nothing with a higher priority needs the provider."""
+        now = time.time() if now is None else now
+        coordinator = self.coordinator
+        retry_queue = coordinator.retry_queue
+        return (
+            coordinator.last_update_success
+            and now - coordinator.last_activity >= self.idle
+            and now >= self.paused_until
+            and now >= retry_queue.paused_until
+            and not retry_queue.due(now)
+        )
+
+    def candidates(self, now=None):
+        """Return up to ``batch_size`` stale IPs, most recently used first."""
+        now = time.time() if now is None else now
+        cutoff = (dt_util.utcnow() - self.max_age).isoformat()
+        retry_queue = self.coordinator.retry_queue
+        stale = (
+            ipdata
+            for ip, ipdata in self.coordinator.ips.items()
+            if ip not in retry_queue
+            and self._skip_until.get(ip, 0) <= now
+            and is_stale(ipdata, cutoff)
+        )
+        return heapq.nlargest(self.batch_size, stale, key=lambda d: d.last_used_at or "")
+
+    @guarded
+    async def async_run(self, now=None):
+        """Refresh one batch of stale records if the integration is idle."""
+        if self._running or not self.is_idle():
+            return
+        self._running = True
+        try:
+            refreshed = await self._async_refresh_batch()
+        finally:
+            self._running = False
+        if refreshed:
+            _LOGGER.debug("Re-enriched %s stale records", refreshed)
+            await self.coordinator.async_write_to_file()
+            self.coordinator.async_update_listeners()
+
+    async def _async_refresh_batch(self):
+        coordinator = self.coordinator
+        hass = coordinator.hass
+        refreshed = 0
+        for ipdata in self.candidates():
+            if not self.is_idle():
+                break
+            if not coordinator.quota.acquire(coordinator.provider, PRIORITY_BACKFILL):
+                break
+            # Bypass the shared geo cache, it may hold the same stale result.
+            if await hass.async_add_executor_job(ipdata.lookup, False):
+                self._skip_until.pop(ipdata.ip_address, None)
+                refreshed += 1
+                continue
+            now = time.time()
+            self._skip_until[ipdata.ip_address] = now + FAILURE_BACKOFF
+            if ipdata.retry_after:
+                self.paused_until = now + ipdata.retry_after
+                break
+        return refreshed
@@ -0,0 +1,240 @@
+"""Detect the integration blocking the event loop.
+
+Meant for debugging and tests; the integration only enables one with the
+``detect_blocking`` option. While a :class:`BlockingDetector` is enabled, every coroutine and callback decorated with :func:`guarded` is
+timed one slice at a time, meaning each stretch it runs on the loop
+before yielding. A slice over the threshold is reported, and so is any
+filesystem, socket, sleep or subprocess call made on the loop thread
+inside one. Reports are logged and kept in :attr:`BlockingDetector.reports`.
+
+Calls are seen through an audit hook, which cannot be removed once added
+and returns straight away while no detector is enabled. ``os.stat`` raises
+no audit event, and so neither does ``os.path.exists``; it is patched for
+as long as a detector is enabled, along with ``os.lstat`` and
+``time.sleep``.
+"""
+
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Coroutine
+
+from .profiling import in_package
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.1
+MAX_REPORTS = 100
+
+KIND_SLOW = "slow"
+KIND_CALL = "call"
+
+BLOCKING_EVENTS = frozenset(
+    {
+        "open",
+        "os.chmod",
+        "os.link",
+        "os.listdir",
+        "os.mkdir",
+        "os.remove",
+        "os.rename",
+        "os.rmdir",
+        "os.scandir",
+        "os.symlink",
+        "os.truncate",
+        "os.utime",
+        "glob.glob",
+        "shutil.copyfile",
+        "shutil.move",
+        "shutil.rmtree",
+        "socket.bind",
+        "socket.connect",
+        "socket.getaddrinfo",
+        "socket.gethostbyaddr",
+        "socket.gethostbyname",
+        "socket.getnameinfo",
+        "socket.sendto",
+        "subprocess.Popen",
+    }
+)
+# Calls without an audit event on every supported Python.
+PATCHED_CALLS = ((os, "stat"), (os, "lstat"), (time, "sleep"))
+
+_detector = None
+_hook_installed = False
+_originals = {}
+
+
+def _caller_location():
+    """Return ``file:line`` of the innermost integration frame on the stack."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if in_package(filename) and filename != __file__:
+            return f"{os.path.basename(filename)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+class BlockingDetector:
+    """Times guarded slices and flags blocking calls made during them."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.reports = deque(maxlen=MAX_REPORTS)
+        self._current = None
+        self._thread = None
+        self._reporting = threading.local()
+
+    def enable(self):
+        """Make this the active detector."""
+        global _detector
+        _install()
+        _detector = self
+
+    def disable(self):
+        global _detector
+        if _detector is self:
+            _detector = None
+            _restore()
+
+    def run(self, name, func, *args):
+        """Run one slice of ``name`` on the loop, timing it."""
+        if self._current is not None:
+            # Nested guarded code is part of the enclosing slice.
+            return func(*args)
+        self._current = name
+        self._thread = threading.get_ident()
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._current = None
+            if elapsed > self.threshold:
+                self._report(KIND_SLOW, name, f"ran {elapsed * 1000:.0f} ms without yielding")
+
+    def on_call(self, event, args):
+        """Report ``event`` if it was raised on the loop inside a guarded slice."""
+        if self._current is None or threading.get_ident() != self._thread:
+            return
+        if getattr(self._reporting, "active", False):
+            return
+        detail = f"{event}({args[0]!r})" if args else event
+        self._report(KIND_CALL, self._current, detail, _caller_location())
+
+    def _report(self, kind, name, detail, location=None):
+        self._reporting.active = True
+        try:
+            self.reports.append(
+                {"kind": kind, "name": name, "detail": detail, "location": location}
+            )
+            _LOGGER.warning(
+                "%s blocked the event loop: %s%s",
+                name,
+                detail,
+                f" at {location}" if location else "",
+            )
+        finally:
+            self._reporting.active = False
+
+
+def _audit_hook(event, args):
+    detector = _detector
+    if detector is not None and event in BLOCKING_EVENTS:
+        detector.on_call(event, args)
+
+
+def _patched(event, original):
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        detector = _detector
+        if detector is not None:
+            detector.on_call(event, args)
+        return original(*args, **kwargs)
+
+    return wrapper
+
+
+def _install():
+    global _hook_installed
+    if not _hook_installed:
+        sys.addaudithook(_audit_hook)
+        _hook_installed = True
+    for module, name in PATCHED_CALLS:
+        if (module, name) not in _originals:
+            original = getattr(module, name)
+            _originals[(module, name)] = original
+            setattr(module, name, _patched(f"{module.__name__}.{name}", original))
+
+
+def _restore():
+    while _originals:
+        (module, name), original = _originals.popitem()
+        setattr(module, name, original)
+
+
+def get_detector():
+    """Return the active detector, or None."""
+    return _detector
+
+
+class _GuardedCoroutine(Coroutine):
+    """Drives a coroutine, timing each step it takes on the event loop."""
+
+    def __init__(self, coro, detector, name):
+        self._coro = coro
+        self._detector = detector
+        self._name = name
+
+    def send(self, value):
+        return self._detector.run(self._name, self._coro.send, value)
+
+    def throw(self, *exc):
+        return self._detector.run(self._name, self._coro.throw, *exc)
+
+    def close(self):
+        self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+
+def guarded(func):
+    """Time ``func`` with the active detector, if there is one.
+
+    Works on coroutine functions and on event loop callbacks, and keeps
+    coroutine functions recognisable as such. Costs one call when no
+    detector is enabled.
+    """
+    name = func.__qualname__
+    if not inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            detector = _detector
+            if detector is None:
+                return func(*args, **kwargs)
+            return detector.run(name, functools.partial(func, *args, **kwargs))
+
+        return wrapper
+
+    @functools.wraps(func)
+    async def async_wrapper(*args, **kwargs):
+        detector = _detector
+        if detector is None:
+            return await func(*args, **kwargs)
+        return await _GuardedCoroutine(func(*args, **kwargs), detector, name)
+
+    return async_wrapper
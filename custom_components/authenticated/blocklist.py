@@ -0,0 +1,259 @@
+"""Compact IP range index for large local blocklists.
+
+Each list file is parsed into sorted, non-overlapping integer ranges held in
+``array`` objects, so a million-entry list costs a few bytes per range and a
+membership test is a single binary search. IPv6 ranges are stored at /64
+granularity (the smallest block a single host is normally assigned), which
+lets both families use fixed-width machine integers. Entries are sorted a
+chunk at a time and merged, so loading does not hold a Python object per
+entry either.
+"""
+
+import heapq
+import logging
+import os
+import socket
+from array import array
+from bisect import bisect_right
+
+_LOGGER = logging.getLogger(__name__)
+
+LIST_EXTENSIONS = (".txt", ".list", ".netset", ".ipset", ".cidr")
+
+_V4_MAX = 0xFFFFFFFF
+_V6_MAX = (1 << 128) - 1
+_U64_MAX = (1 << 64) - 1
+
+CHUNK_SIZE = 1 << 15
+
+
+def parse_address(text):
+    """Return ``(version, int)`` for an IP address string, or None."""
+    try:
+        if ":" in text:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big")
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except (OSError, ValueError):
+        return None
+
+
+def parse_entry(token):
+    """Parse an IP, CIDR or ``start-end`` token into ``(version, start, end)``."""
+    if "-" in token:
+        first, _, last = token.partition("-")
+        start, end = parse_address(first.strip()), parse_address(last.strip())
+        if start is None or end is None or start[0] != end[0] or start[1] > end[1]:
+            return None
+        return start[0], start[1], end[1]
+    address, _, prefix = token.partition("/")
+    parsed = parse_address(address)
+    if parsed is None:
+        return None
+    version, value = parsed
+    bits = 32 if version == 4 else 128
+    if not prefix:
+        return version, value, value
+    try:
+        length = int(prefix)
+    except ValueError:
+        return None
+    if not 0 <= length <= bits:
+        return None
+    hostmask = (1 << (bits - length)) - 1
+    start = value & ((_V4_MAX if version == 4 else _V6_MAX) ^ hostmask)
+    return version, start, start | hostmask
+
+
+class RangeIndex:
+    """Sorted, merged, non-overlapping ``[start, end]`` integer ranges."""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, typecode, ranges):
+        """Build the index from ``(start, end)`` pairs sorted by start."""
+        self.starts = array(typecode)
+        self.ends = array(typecode)
+        for start, end in ranges:
+            if self.ends and start <= self.ends[-1] + 1:
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __contains__(self, value):
+        pos = bisect_right(self.starts, value) - 1
+        return pos >= 0 and self.ends[pos] >= value
+
+    @property
+    def nbytes(self):
+        return (len(self.starts) + len(self.ends)) * self.starts.itemsize
+
+
+def _unpack_v4(packed):
+    for value in packed:
+        yield value >> 32, value & _V4_MAX
+
+
+def _unpack_v6(packed):
+    for value in packed:
+        yield value >> 64, value & _U64_MAX
+
+
+def _run_values(run, words):
+    if words == 1:
+        return iter(run)
+    it = iter(run)
+    return (high << 64 | low for high, low in zip(it, it))
+
+
+class SortedRuns:
+    """Unsigned integers of ``words`` 64-bit words, sorted in bounded chunks.
+
+    Values are buffered as Python ints only up to :data:`CHUNK_SIZE`; each
+    full chunk is sorted and packed into an ``array``. :meth:`values`
+    merges the packed runs lazily.
+    """
+
+    def __init__(self, words=1):
+        self.words = words
+        self._runs = []
+        self._chunk = []
+
+    def append(self, value):
+        self._chunk.append(value)
+        if len(self._chunk) >= CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        self._chunk.sort()
+        run = array("Q")
+        if self.words == 1:
+            run.extend(self._chunk)
+        else:
+            for value in self._chunk:
+                run.append(value >> 64)
+                run.append(value & _U64_MAX)
+        self._runs.append(run)
+        self._chunk = []
+
+    def values(self):
+        """Return an iterator over every value in ascending order."""
+        if self._chunk:
+            self._flush()
+        runs, self._runs = self._runs, []
+        return heapq.merge(*(_run_values(run, self.words) for run in runs))
+
+
+class Blocklist:
+    """One list file, tagged with its file name."""
+
+    def __init__(self, tag, path):
+        self.tag = tag
+        self.path = path
+        self.stat = None
+        self.v4 = RangeIndex("I", ())
+        self.v6 = RangeIndex("Q", ())
+
+    def load(self):
+        """Parse the list file into fresh range indexes."""
+        # Ranges are packed as start << width | end so they sort as one
+        # integer without building a tuple per entry.
+        packed_v4 = SortedRuns()
+        packed_v6 = SortedRuns(words=2)
+        invalid = 0
+        with open(self.path, encoding="utf-8", errors="ignore") as f:
+            st = os.fstat(f.fileno())
+            for line in f:
+                token = line.split("#", 1)[0].split(";", 1)[0].strip()
+                if not token:
+                    continue
+                entry = parse_entry(token.split()[0])
+                if entry is None:
+                    invalid += 1
+                    continue
+                version, start, end = entry
+                if version == 4:
+                    packed_v4.append(start << 32 | end)
+                else:
+                    packed_v6.append(start >> 64 << 64 | end >> 64)
+
+        self.v4 = RangeIndex("I", _unpack_v4(packed_v4.values()))
+        self.v6 = RangeIndex("Q", _unpack_v6(packed_v6.values()))
+        self.stat = (st.st_mtime_ns, st.st_size)
+        if invalid:
+            _LOGGER.debug("Skipped %s unparsable entries in %s", invalid, self.path)
+        _LOGGER.debug(
+            "Loaded blocklist %s: %s IPv4 and %s IPv6 ranges (%s bytes)",
+            self.tag,
+            len(self.v4),
+            len(self.v6),
+            self.v4.nbytes + self.v6.nbytes,
+        )
+
+    def __contains__(self, parsed):
+        version, value = parsed
+        if version == 4:
+            return value in self.v4
+        return (value >> 64) in self.v6
+
+
+class BlocklistSet:
+    """All list files in a directory, reloaded incrementally as they change."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lists = {}
+
+    def refresh(self):
+        """Reload new or changed list files and drop removed ones.
+
+        Runs in an executor job. Unchanged files keep their loaded index,
+        and the set of lists is swapped in one assignment so lookups on the
+        event loop never see a partially built index. Returns True if
+        anything changed.
+        """
+        try:
+            with os.scandir(self.directory) as it:
+                entries = [
+                    entry
+                    for entry in it
+                    if entry.is_file() and entry.name.endswith(LIST_EXTENSIONS)
+                ]
+        except OSError as err:
+            _LOGGER.warning("Unable to read blocklist directory %s: %s", self.directory, err)
+            return False
+
+        lists = {}
+        changed = False
+        for entry in entries:
+            tag = os.path.splitext(entry.name)[0]
+            st = entry.stat()
+            current = self.lists.get(tag)
+            if current is not None and current.stat == (st.st_mtime_ns, st.st_size):
+                lists[tag] = current
+                continue
+            blocklist = Blocklist(tag, entry.path)
+            try:
+                blocklist.load()
+            except OSError as err:
+                _LOGGER.warning("Unable to load blocklist %s: %s", entry.path, err)
+                if current is not None:
+                    lists[tag] = current
+                continue
+            lists[tag] = blocklist
+            changed = True
+
+        changed = changed or lists.keys() != self.lists.keys()
+        self.lists = lists
+        return changed
+
+    def match(self, ip):
+        """Return the sorted tags of every list containing ``ip``."""
+        parsed = parse_address(ip)
+        if parsed is None:
+            return []
+        return sorted(tag for tag, blocklist in self.lists.items() if parsed in blocklist)
@@ -6,15 +6,36 @@ from homeassistant.config_entries import ConfigFlow
 import homeassistant.helpers.config_validation as cv
 
 from .const import (
+    CONF_AGGREGATE,
+    CONF_BLOCKLIST_DIR,
+    CONF_BRUTE_FORCE_THRESHOLD,
+    CONF_BRUTE_FORCE_WINDOW,
+    CONF_DAILY_QUOTA,
+    CONF_DETECT_BLOCKING,
     CONF_EXCLUDE,
     CONF_EXCLUDE_CLIENTS,
+    CONF_GEO_MAX_AGE,
+    CONF_IPV6_PREFIX,
+    CONF_MEMORY_BUDGET,
+    CONF_MONTHLY_QUOTA,
+    CONF_NODE_ID,
     CONF_NOTIFY,
     CONF_NOTIFY_EXCLUDE_ASN,
     CONF_NOTIFY_EXCLUDE_HOSTNAMES,
     CONF_PROVIDER,
+    CONF_PROVIDER_API_KEY,
+    CONF_PROVIDER_BATCH_URL,
+    CONF_PROVIDER_FIELDS,
+    CONF_PROVIDER_HEADERS,
+    CONF_PROVIDER_URL,
+    CONF_SHARED_DIR,
+    DEFAULT_BRUTE_FORCE_THRESHOLD,
+    DEFAULT_BRUTE_FORCE_WINDOW,
+    DEFAULT_GEO_MAX_AGE,
+    DEFAULT_IPV6_PREFIX,
     DOMAIN,
 )
-from .providers import PROVIDERS
+from .providers import PROVIDERS, SelfHostedProvider
 
 
 class AuthenticatedConfigFlow(ConfigFlow, domain=DOMAIN):
@@ -24,28 +45,66 @@ class AuthenticatedConfigFlow(ConfigFlow, domain=DOMAIN):
 
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
+        errors = {}
         if user_input is not None:
             # Prevent duplicate entries
             await self.async_set_unique_id(DOMAIN)
             self._abort_if_unique_id_configured()
 
-            return self.async_create_entry(
-                title="Authenticated",
-                data=user_input,
-            )
+            if user_input.get(CONF_PROVIDER) == SelfHostedProvider.name and not user_input.get(
+                CONF_PROVIDER_URL
+            ):
+                errors[CONF_PROVIDER_URL] = "provider_url_required"
+            else:
+                return self.async_create_entry(
+                    title="Authenticated",
+                    data=user_input,
+                )
 
         return self.async_show_form(
             step_id="user",
+            errors=errors,
             data_schema=vol.Schema(
                 {
                     vol.Optional(CONF_PROVIDER, default="ipapi"): vol.In(
                         list(PROVIDERS.keys())
                     ),
+                    vol.Optional(CONF_PROVIDER_URL, default=""): cv.string,
+                    vol.Optional(CONF_PROVIDER_BATCH_URL, default=""): cv.string,
+                    vol.Optional(CONF_PROVIDER_API_KEY, default=""): cv.string,
+                    vol.Optional(CONF_PROVIDER_HEADERS, default=""): cv.string,
+                    vol.Optional(CONF_PROVIDER_FIELDS, default=""): cv.string,
+                    vol.Optional(CONF_DAILY_QUOTA): vol.All(
+                        vol.Coerce(int), vol.Range(min=0)
+                    ),
+                    vol.Optional(CONF_MONTHLY_QUOTA): vol.All(
+                        vol.Coerce(int), vol.Range(min=0)
+                    ),
                     vol.Optional(CONF_NOTIFY, default=True): cv.boolean,
                     vol.Optional(CONF_EXCLUDE, default=""): cv.string,
                     vol.Optional(CONF_EXCLUDE_CLIENTS, default=""): cv.string,
                     vol.Optional(CONF_NOTIFY_EXCLUDE_ASN, default=""): cv.string,
                     vol.Optional(CONF_NOTIFY_EXCLUDE_HOSTNAMES, default=""): cv.string,
+                    vol.Optional(CONF_NODE_ID, default=""): cv.string,
+                    vol.Optional(CONF_SHARED_DIR, default=""): cv.string,
+                    vol.Optional(CONF_AGGREGATE, default=False): cv.boolean,
+                    vol.Optional(CONF_BLOCKLIST_DIR, default=""): cv.string,
+                    vol.Optional(
+                        CONF_BRUTE_FORCE_THRESHOLD, default=DEFAULT_BRUTE_FORCE_THRESHOLD
+                    ): cv.positive_int,
+                    vol.Optional(
+                        CONF_BRUTE_FORCE_WINDOW, default=DEFAULT_BRUTE_FORCE_WINDOW
+                    ): cv.positive_int,
+                    vol.Optional(CONF_GEO_MAX_AGE, default=DEFAULT_GEO_MAX_AGE): vol.All(
+                        vol.Coerce(int), vol.Range(min=0)
+                    ),
+                    vol.Optional(CONF_IPV6_PREFIX, default=DEFAULT_IPV6_PREFIX): vol.All(
+                        vol.Coerce(int), vol.Range(min=1, max=128)
+                    ),
+                    vol.Optional(CONF_MEMORY_BUDGET): vol.All(
+                        vol.Coerce(int), vol.Range(min=1)
+                    ),
+                    vol.Optional(CONF_DETECT_BLOCKING, default=False): cv.boolean,
                 }
             ),
         )
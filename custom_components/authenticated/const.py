@@ -22,6 +22,56 @@ CONF_EXCLUDE = "exclude"
 CONF_EXCLUDE_CLIENTS = "exclude_clients"
 CONF_PROVIDER = "provider"
 CONF_LOG_LOCATION = "log_location"
+CONF_NODE_ID = "node_id"
+CONF_SHARED_DIR = "shared_directory"
+CONF_AGGREGATE = "aggregate_nodes"
+CONF_BLOCKLIST_DIR = "blocklist_directory"
+CONF_BRUTE_FORCE_THRESHOLD = "brute_force_threshold"
+CONF_BRUTE_FORCE_WINDOW = "brute_force_window"
+CONF_GEO_MAX_AGE = "geo_max_age"
+CONF_IPV6_PREFIX = "ipv6_prefix"
+CONF_PROVIDER_URL = "provider_url"
+CONF_PROVIDER_BATCH_URL = "provider_batch_url"
+CONF_PROVIDER_API_KEY = "provider_api_key"
+CONF_PROVIDER_HEADERS = "provider_headers"
+CONF_PROVIDER_FIELDS = "provider_fields"
+CONF_DAILY_QUOTA = "daily_quota"
+CONF_MONTHLY_QUOTA = "monthly_quota"
+CONF_MEMORY_BUDGET = "memory_budget"
+CONF_DETECT_BLOCKING = "detect_blocking"
+
+# Option defaults, shared by the config flow and the YAML platform
+DEFAULT_BRUTE_FORCE_THRESHOLD = 10
+DEFAULT_BRUTE_FORCE_WINDOW = 300
+DEFAULT_GEO_MAX_AGE = 30
+# 128 tracks every IPv6 address on its own; shorter prefixes group them.
+DEFAULT_IPV6_PREFIX = 128
+
+# hass.data key of the instance-wide coordinator
+DATA_COORDINATOR = f"{DOMAIN}_coordinator"
 
 # Output file for authenticated IPs
-OUTFILE = ".ip_authenticated.yaml"
\ No newline at end of file
+OUTFILE = ".ip_authenticated.yaml"
+
+# Records moved out of memory to stay within the memory budget
+SPILL_FILE = ".ip_authenticated_spill.db"
+
+# Append-only journal of every successful login
+HISTORY_FILE = ".ip_authenticated_history.jsonl"
+
+# Events
+EVENT_LOGIN_FAILED = f"{DOMAIN}_login_failed"
+EVENT_BRUTE_FORCE = f"{DOMAIN}_brute_force"
+
+# Services
+SERVICE_EXPORT = "export"
+SERVICE_STATS = "stats"
+SERVICE_PROFILE = "profile"
+ATTR_DATASET = "dataset"
+ATTR_FORMAT = "format"
+ATTR_PATH = "path"
+ATTR_PERIOD = "period"
+ATTR_LIMIT = "limit"
+ATTR_DURATION = "duration"
+ATTR_MODE = "mode"
+ATTR_MEMORY = "memory"
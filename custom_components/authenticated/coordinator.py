@@ -0,0 +1,1132 @@
+"""Shared coordinator owning login ingestion, the IP index and persistence."""
+
+import asyncio
+import io
+import logging
+import os
+import socket
+import time
+from ipaddress import ip_address, ip_network
+from datetime import datetime, timedelta
+from contextlib import suppress
+
+from homeassistant.components.persistent_notification import async_create
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util, slugify
+
+from .aggregation import NodeAggregator
+from .backfill import BACKFILL_INTERVAL, BackfillScheduler
+from .blocking import BlockingDetector, get_detector, guarded
+from .const import (
+    CONF_AGGREGATE,
+    CONF_BRUTE_FORCE_THRESHOLD,
+    CONF_BRUTE_FORCE_WINDOW,
+    CONF_DAILY_QUOTA,
+    CONF_DETECT_BLOCKING,
+    CONF_EXCLUDE,
+    CONF_EXCLUDE_CLIENTS,
+    CONF_GEO_MAX_AGE,
+    CONF_IPV6_PREFIX,
+    CONF_MEMORY_BUDGET,
+    CONF_MONTHLY_QUOTA,
+    CONF_NODE_ID,
+    CONF_NOTIFY,
+    CONF_NOTIFY_EXCLUDE_ASN,
+    CONF_NOTIFY_EXCLUDE_HOSTNAMES,
+    CONF_PROVIDER,
+    CONF_PROVIDER_API_KEY,
+    CONF_PROVIDER_BATCH_URL,
+    CONF_PROVIDER_FIELDS,
+    CONF_PROVIDER_HEADERS,
+    CONF_PROVIDER_URL,
+    CONF_SHARED_DIR,
+    DATA_COORDINATOR,
+    DEFAULT_BRUTE_FORCE_THRESHOLD,
+    DEFAULT_BRUTE_FORCE_WINDOW,
+    DEFAULT_GEO_MAX_AGE,
+    DEFAULT_IPV6_PREFIX,
+    DOMAIN,
+    EVENT_BRUTE_FORCE,
+    EVENT_LOGIN_FAILED,
+    HISTORY_FILE,
+    OUTFILE,
+    SPILL_FILE,
+)
+from .enrichment import apply_enrichers, get_enrichers
+from .export import append_history
+from .failed_logins import BAN_LOGGER, BanLogHandler, FailedLoginTracker
+from .long_term_stats import IMPORT_INTERVAL, LongTermStats
+from .memory import MemoryBudget, RecordSpill, RecordsView, compact_record
+from .providers import PROVIDERS, SelfHostedProvider
+from .quota import PRIORITY_BACKFILL, PRIORITY_LIVE, PRIORITY_RETRY, QuotaTracker
+from .retry import RetryQueue
+from .serialization import load_json_file, yaml_dump, yaml_load_chunks, yaml_record
+from .stats import LoginStats
+
+_LOGGER = logging.getLogger(__name__)
+
+UPDATE_INTERVAL = timedelta(minutes=1)
+RETRY_INTERVAL = timedelta(minutes=1)
+EVENT_AUTH = "homeassistant_auth"
+
+MAX_ADDRESSES = 16
+
+OUTFILE_HEADER = b"---\n"
+# Spill metadata describing the outfile it was written alongside.
+META_OUTFILE = "outfile"
+
+
+# ------------------------
+# Helper functions
+# ------------------------
+def humanize_time(timestring):
+    return datetime.strptime(timestring[:19], "%Y-%m-%dT%H:%M:%S")
+
+
+def is_public(ip):
+    try:
+        ip_obj = ip_address(ip)
+        return not (ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved)
+    except Exception:
+        return False
+
+
+def as_list(value):
+    """Return a config value as a list, splitting comma-separated strings."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return list(value)
+
+
+def tracking_key(ip, ipv6_prefix=DEFAULT_IPV6_PREFIX):
+    """Return the key ``ip`` is tracked under: the address, or its IPv6 prefix."""
+    if ipv6_prefix >= 128 or ":" not in ip:
+        return ip
+    try:
+        return str(ip_network(f"{ip}/{ipv6_prefix}", strict=False))
+    except ValueError:
+        return ip
+
+
+def aggregate_records(records, ipv6_prefix):
+    """Fold stored per-address IPv6 records into one record per prefix.
+
+    The most recently used record of each prefix is kept, and the addresses
+    of all folded records are merged into its ``addresses`` list.
+    """
+    if ipv6_prefix >= 128:
+        return records
+    folded = {}
+    by_last_use = sorted(
+        ((ip, attrs or {}) for ip, attrs in records.items()),
+        key=lambda item: item[1].get("last_used_at") or "",
+    )
+    for ip, attrs in by_last_use:
+        key = tracking_key(ip, ipv6_prefix)
+        if key == ip:
+            folded[ip] = attrs
+            continue
+        addresses = as_list((folded.get(key) or {}).get("addresses"))
+        for address in as_list(attrs.get("addresses")) or [ip]:
+            if address in addresses:
+                addresses.remove(address)
+            addresses.append(address)
+        folded[key] = {**attrs, "addresses": addresses[-MAX_ADDRESSES:]}
+    return folded
+
+
+def needs_enrichment(attrs):
+    """Return True if a stored record never received geo data."""
+    return not any(attrs.get(key) for key in ("country", "asn", "org"))
+
+
+def get_hostname(ip):
+    if ip.startswith("127.") or ip == "::1":
+        return "localhost"
+    with suppress(Exception):
+        hostname = socket.getfqdn(ip)
+        if hostname and hostname != ip:
+            return hostname
+    return "unknown"
+
+
+# ------------------------
+# Async File I/O
+# ------------------------
+def _load_records(stream):
+    records = {}
+    for chunk in yaml_load_chunks(stream):
+        for ip, attrs in chunk.items():
+            records[ip] = compact_record(attrs)
+    return records
+
+
+async def async_get_outfile_content(hass, file, size=None):
+    """Read the outfile records, or only those in its first ``size`` bytes."""
+
+    def _read():
+        if not os.path.exists(file):
+            return {}
+        if size is None:
+            with open(file, encoding="utf-8") as f:
+                return _load_records(f)
+        with open(file, "rb") as f:
+            return _load_records(io.StringIO(f.read(size).decode()))
+
+    return await hass.async_add_executor_job(_read)
+
+
+def write_outfile(file, records, spill=None):
+    """Write ``records``, then the spilled records not among them, to the outfile.
+
+    Records are written one at a time rather than dumped as one document.
+    Without a spill, that is without a memory budget, each goes through the
+    YAML dumper, which gives the same file as dumping the whole mapping.
+    With one, the faster :func:`yaml_record` renderer is used, and the
+    spilled records' stored fragments follow. Either way a temporary file
+    replaces the outfile once complete, so readers never see a partial file.
+    Returns the size of the part holding ``records``.
+    """
+    tmp_path = f"{file}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(OUTFILE_HEADER)
+        for ip in sorted(records, key=str):
+            if spill is None:
+                f.write(yaml_dump({ip: records[ip]}, explicit_start=False).encode())
+            else:
+                f.write(yaml_record(ip, records[ip]).encode())
+        size = f.tell()
+        if spill is not None:
+            spill.write_yaml(f, skip=records)
+    os.replace(tmp_path, file)
+    return size
+
+
+def _get_aggregator(hass, config):
+    """Return the multi-node aggregator for ``config``, if one is configured."""
+    shared_dir = config.get(CONF_SHARED_DIR)
+    if not shared_dir:
+        return None
+    node_id = slugify(config.get(CONF_NODE_ID) or hass.config.location_name or "home")
+    return NodeAggregator(shared_dir, node_id, config.get(CONF_AGGREGATE, False))
+
+
+# ------------------------
+# Coordinator
+# ------------------------
+@callback
+def async_get_coordinator(hass, config, consumer):
+    """Return the instance-wide coordinator, starting it for the first consumer.
+
+    Config entries and the legacy YAML platform all share one coordinator;
+    the options of whichever consumer arrives first are used.
+    """
+    coordinator = hass.data.get(DATA_COORDINATOR)
+    if coordinator is None:
+        coordinator = hass.data[DATA_COORDINATOR] = AuthenticatedCoordinator(hass, config)
+        coordinator.async_start()
+    coordinator.consumers.add(consumer)
+    return coordinator
+
+
+async def async_release_coordinator(hass, consumer):
+    """Drop ``consumer`` and stop the coordinator once nothing uses it.
+
+    A stopped coordinator saves its stores before this returns, so a
+    coordinator set up next loads current data, and no delayed save of
+    the old one can overwrite what the new one saves.
+    """
+    coordinator = hass.data.get(DATA_COORDINATOR)
+    if coordinator is None:
+        return
+    coordinator.consumers.discard(consumer)
+    if not coordinator.consumers:
+        coordinator.async_stop()
+        hass.data.pop(DATA_COORDINATOR, None)
+        await coordinator.async_save()
+
+
+class AuthenticatedCoordinator:
+    """Single owner of auth ingestion, the tracked IP index and the outfile.
+
+    There is one coordinator per Home Assistant instance. It holds the only
+    ``homeassistant_auth`` listener and timers, so the work done per login
+    does not grow with the number of entities or reloads. Entities subscribe
+    with :meth:`async_add_listener` and are called back after every change.
+    """
+
+    def __init__(self, hass, config):
+        self.hass = hass
+        self.config = config
+        self.provider = config.get(CONF_PROVIDER) or "ipapi"
+        if self.provider == SelfHostedProvider.name:
+            SelfHostedProvider.configure(
+                config.get(CONF_PROVIDER_URL),
+                batch_url=config.get(CONF_PROVIDER_BATCH_URL),
+                api_key=config.get(CONF_PROVIDER_API_KEY),
+                headers=config.get(CONF_PROVIDER_HEADERS),
+                fields=config.get(CONF_PROVIDER_FIELDS),
+            )
+        self.notify = config.get(CONF_NOTIFY, True)
+        self.notify_exclude_asn = as_list(config.get(CONF_NOTIFY_EXCLUDE_ASN))
+        self.notify_exclude_hostnames = as_list(config.get(CONF_NOTIFY_EXCLUDE_HOSTNAMES))
+        self.exclude = as_list(config.get(CONF_EXCLUDE))
+        self.exclude_clients = as_list(config.get(CONF_EXCLUDE_CLIENTS))
+        self.out = hass.config.path(OUTFILE)
+        self.history_file = hass.config.path(HISTORY_FILE)
+        self.aggregator = _get_aggregator(hass, config)
+        self.geo_cache = self.aggregator.geo_cache if self.aggregator else None
+        self.enrichers = get_enrichers(config)
+        self.retry_queue = RetryQueue(hass)
+        self.quota = QuotaTracker(
+            hass,
+            config.get(CONF_DAILY_QUOTA),
+            config.get(CONF_MONTHLY_QUOTA),
+            shared=self.aggregator.quota if self.aggregator else None,
+        )
+        self.stats = LoginStats(hass)
+        self.long_term_stats = LongTermStats(hass)
+        self.failed_logins = FailedLoginTracker(
+            window=config.get(CONF_BRUTE_FORCE_WINDOW) or DEFAULT_BRUTE_FORCE_WINDOW,
+            threshold=config.get(CONF_BRUTE_FORCE_THRESHOLD) or DEFAULT_BRUTE_FORCE_THRESHOLD,
+        )
+        self._failed_logins_changed = False
+        max_age = config.get(CONF_GEO_MAX_AGE, DEFAULT_GEO_MAX_AGE)
+        self.backfill = BackfillScheduler(self, max_age) if max_age else None
+        self.ipv6_prefix = config.get(CONF_IPV6_PREFIX) or DEFAULT_IPV6_PREFIX
+        memory_budget = config.get(CONF_MEMORY_BUDGET)
+        self.budget = MemoryBudget(memory_budget) if memory_budget else None
+        self.spill = RecordSpill(hass.config.path(SPILL_FILE)) if self.budget else None
+        self.last_activity = 0.0
+        self.consumers = set()
+        self.ips = {}
+        self.stored = {}
+        self.all_users = {}
+        self.last_ip = None
+        self.last_update_success = False
+        self._listeners = []
+        self._login_subscribers = []
+        self._unsubs = []
+        self._refresh_task = None
+        self._write_lock = asyncio.Lock()
+        self._write_pending = False
+
+    # Lifecycle ---------------------------------------------------------
+
+    @callback
+    def async_start(self):
+        """Subscribe to auth events, start timers and schedule the first refresh."""
+        ban_logger = logging.getLogger(BAN_LOGGER)
+        ban_handler = BanLogHandler(
+            self.hass.loop, self.async_record_failed_login, self.async_record_ban
+        )
+        ban_logger.addHandler(ban_handler)
+        self._unsubs = [
+            self.hass.bus.async_listen(EVENT_AUTH, self._async_on_auth_event),
+            self.hass.bus.async_listen(EVENT_LOGIN_FAILED, self._async_on_login_failed),
+            lambda: ban_logger.removeHandler(ban_handler),
+            async_track_time_interval(self.hass, self._async_scheduled_refresh, UPDATE_INTERVAL),
+            async_track_time_interval(self.hass, self.async_process_retries, RETRY_INTERVAL),
+            async_track_time_interval(
+                self.hass, self.long_term_stats.async_import, IMPORT_INTERVAL
+            ),
+            async_track_time_interval(
+                self.hass,
+                self._async_sweep_failed_logins,
+                timedelta(seconds=self.failed_logins.bucket_seconds),
+            ),
+        ]
+        if self.backfill is not None:
+            self._unsubs.append(
+                async_track_time_interval(self.hass, self.backfill.async_run, BACKFILL_INTERVAL)
+            )
+        if self.config.get(CONF_DETECT_BLOCKING) and get_detector() is None:
+            detector = BlockingDetector()
+            detector.enable()
+            self._unsubs.append(detector.disable)
+        self._refresh_task = self.hass.async_create_background_task(
+            self.async_refresh(), f"{DOMAIN}_initial_refresh"
+        )
+
+    @callback
+    def async_stop(self):
+        """Remove every listener and timer registered by :meth:`async_start`."""
+        while self._unsubs:
+            self._unsubs.pop()()
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        if self.spill is not None:
+            self.hass.async_add_executor_job(self.spill.close)
+        self._listeners.clear()
+        self._login_subscribers.clear()
+
+    async def async_save(self):
+        """Save every store now, cancelling their delayed saves."""
+        await self.retry_queue.async_save()
+        await self.quota.async_save()
+        await self.stats.async_save()
+        await self.long_term_stats.async_save()
+
+    # Subscribers -------------------------------------------------------
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Call ``update_callback`` after every change; returns a remover."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove():
+            with suppress(ValueError):
+                self._listeners.remove(update_callback)
+
+        return _remove
+
+    @callback
+    def async_update_listeners(self):
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def async_subscribe_logins(self, login_callback):
+        """Call ``login_callback(row)`` with every enriched login; returns a remover.
+
+        ``row`` is the history journal row written for the login.
+        """
+        self._login_subscribers.append(login_callback)
+
+        @callback
+        def _remove():
+            with suppress(ValueError):
+                self._login_subscribers.remove(login_callback)
+
+        return _remove
+
+    # Ingestion ---------------------------------------------------------
+
+    @callback
+    def _async_on_auth_event(self, event):
+        self.hass.async_create_task(self.async_handle_auth_event(event))
+
+    async def _async_scheduled_refresh(self, now=None):
+        await self.async_refresh()
+
+    @guarded
+    async def async_refresh(self):
+        """Reconcile the auth file with the index and enrich new IPs."""
+        await self.retry_queue.async_load()
+        await self.quota.async_load()
+        if self.aggregator is not None:
+            # Count what other nodes spent since the last sync before looking up.
+            await self.hass.async_add_executor_job(self.aggregator.quota.refresh)
+        await self.stats.async_load(self.history_file)
+        await self.long_term_stats.async_load(self.history_file)
+        for enricher in self.enrichers:
+            await self.hass.async_add_executor_job(enricher.refresh)
+        users, tokens = await async_load_authentications(
+            self.hass, ".storage/auth", self.exclude, self.exclude_clients
+        )
+        # Update in place so IPData instances keep referencing current names.
+        self.all_users.clear()
+        self.all_users.update(users)
+
+        if not self.last_update_success:
+            size = None
+            if self.spill is not None:
+                size = await self.hass.async_add_executor_job(self._unspilled_size)
+            stored = await async_get_outfile_content(self.hass, self.out, size)
+            self.stored = aggregate_records(stored, self.ipv6_prefix)
+
+        cold = set()
+        if self.spill is not None:
+            cold = await self._async_restore_used(tokens)
+
+        new_ips = []
+        # Oldest first, so the newest address of a prefix ends up last.
+        # Tokens only hold public IPs; they are checked as they are read.
+        for ip, attrs in sorted(tokens.items(), key=lambda item: item[1]["last_used_at"] or ""):
+            key = tracking_key(ip, self.ipv6_prefix)
+            if key in cold:
+                continue
+            ipdata = self.ips.get(key)
+            if ipdata is not None:
+                ipdata.add_address(ip)
+                if (attrs["last_used_at"] or "") > (ipdata.last_used_at or ""):
+                    ipdata.last_used_at = attrs["last_used_at"]
+                    ipdata.user_id = attrs["user_id"]
+            else:
+                stored = self.stored.get(key)
+                # Keep previously enriched fields; the token only carries usage.
+                access_data = AuthenticatedData(key, {**(stored or {}), **attrs})
+                ipdata = IPData(
+                    access_data,
+                    self.all_users,
+                    self.provider,
+                    new=False,
+                    geo_cache=self.geo_cache,
+                )
+                ipdata.add_address(ip)
+                self.ips[key] = ipdata
+                if stored is None:
+                    new_ips.append(ipdata)
+                elif needs_enrichment(stored) and key not in self.retry_queue:
+                    self.retry_queue.schedule(key)
+            if self.enrichers:
+                apply_enrichers(self.enrichers, ipdata)
+
+        if new_ips:
+            # Reconciling a cleared outfile can mean thousands of lookups;
+            # they must not eat the budget kept for live logins.
+            results = await self.async_lookup(new_ips, PRIORITY_BACKFILL)
+            for ipdata, result in zip(new_ips, results):
+                if result is False or (result is None and self.backfill is None):
+                    self.retry_queue.schedule(
+                        ipdata.ip_address, ipdata.retry_after, ipdata.lookup_error
+                    )
+
+        await self.async_write_to_file()
+
+        if self.aggregator is not None:
+            await self.hass.async_add_executor_job(self.aggregator.sync, self.all_records)
+
+        if self.ips:
+            self.last_ip = max(self.ips.values(), key=lambda x: x.last_used_at or "")
+
+        self.last_update_success = True
+        self.async_update_listeners()
+
+    @guarded
+    async def async_handle_auth_event(self, event):
+        data = event.data
+        ip = data.get("ip_address")
+        user_id = data.get("user_id")
+        if not ip or not is_public(ip):
+            return
+
+        self.last_activity = time.time()
+        now = dt_util.utcnow()
+        now_iso = now.isoformat()
+        key = tracking_key(ip, self.ipv6_prefix)
+
+        new_key = key not in self.ips
+        if new_key and self.spill is not None:
+            await self._async_unspill([key])
+            new_key = key not in self.ips
+        if not new_key:
+            ipdata = self.ips[key]
+            ipdata.prev_used_at = ipdata.last_used_at
+            ipdata.last_used_at = now_iso
+            ipdata.add_address(ip)
+        else:
+            access_data = AuthenticatedData(
+                key,
+                {
+                    "user_id": user_id,
+                    "last_used_at": now_iso,
+                    "prev_used_at": None,
+                },
+            )
+            ipdata = IPData(
+                access_data, self.all_users, self.provider, geo_cache=self.geo_cache
+            )
+            ipdata.add_address(ip)
+            # Index before the lookup so a burst from the same IP or prefix
+            # reuses this record instead of issuing its own lookup.
+            self.ips[key] = ipdata
+            if not ipdata.apply_cached():
+                if not self.quota.acquire(self.provider, PRIORITY_LIVE):
+                    self.retry_queue.schedule(
+                        key,
+                        self.quota.seconds_until_available(self.provider),
+                        "Lookup quota exhausted",
+                    )
+                elif not await self.hass.async_add_executor_job(ipdata.lookup):
+                    self.retry_queue.schedule(key, ipdata.retry_after, ipdata.lookup_error)
+            if self.enrichers:
+                apply_enrichers(self.enrichers, ipdata)
+
+        # Rotating privacy addresses rarely have PTR records; resolve a
+        # prefix once instead of once per address.
+        if key == ip or new_key:
+            ipdata.hostname = await self.hass.async_add_executor_job(get_hostname, ip)
+        self.last_ip = ipdata
+
+        row = {
+            "timestamp": now_iso,
+            "ip": ip,
+            "user_id": ipdata.user_id,
+            "username": ipdata.username,
+            "country": ipdata.country,
+            "country_code": ipdata.country_code,
+            "asn": ipdata.asn,
+            "org": ipdata.org,
+            "hostname": ipdata.hostname,
+            "new_ip": ipdata.new_ip,
+            "flags": ipdata.flags,
+        }
+        await self.hass.async_add_executor_job(append_history, self.history_file, row)
+        for login_callback in list(self._login_subscribers):
+            login_callback(row)
+        self.stats.record(now, ipdata.country, ipdata.asn, ipdata.username)
+        self.long_term_stats.record(now, ip, ipdata.username, ipdata.new_ip)
+
+        if self.notify:
+            if ipdata.asn not in self.notify_exclude_asn and ipdata.hostname not in self.notify_exclude_hostnames:
+                ipdata.notify(self.hass)
+        # Only the first login from an IP is new, whether or not it was notified.
+        ipdata.new_ip = False
+
+        await self.async_write_to_file()
+        self.async_update_listeners()
+
+    # Failed logins -----------------------------------------------------
+
+    @callback
+    @guarded
+    def _async_on_login_failed(self, event):
+        ip = event.data.get("ip_address")
+        if ip:
+            self.async_record_failed_login(ip, event.data.get("username"))
+
+    @callback
+    def async_record_failed_login(self, ip, username=None):
+        """Count a failed attempt, firing an event when a key crosses the threshold.
+
+        Called for every attempt, so it only touches in-memory counters;
+        subscribers are refreshed by the sweep timer unless a key was flagged.
+        """
+        triggered = self.failed_logins.record(ip, username)
+        for kind, key, attempts in triggered:
+            _LOGGER.warning(
+                "Possible brute force: %s failed logins for %s %s in %ss",
+                attempts,
+                kind,
+                key,
+                self.failed_logins.window,
+            )
+            self.hass.bus.async_fire(
+                EVENT_BRUTE_FORCE,
+                {
+                    "kind": kind,
+                    "key": key,
+                    "attempts": attempts,
+                    "window": self.failed_logins.window,
+                },
+            )
+        if triggered:
+            self._failed_logins_changed = False
+            self.async_update_listeners()
+        else:
+            self._failed_logins_changed = True
+
+    @callback
+    def async_record_ban(self, ip):
+        self.failed_logins.record_ban(ip)
+        self._failed_logins_changed = True
+
+    @callback
+    @guarded
+    def _async_sweep_failed_logins(self, now=None):
+        flagged = sum(len(keys) for keys in self.failed_logins.flagged.values())
+        self.failed_logins.sweep()
+        if flagged != sum(len(keys) for keys in self.failed_logins.flagged.values()):
+            self._failed_logins_changed = True
+        if self._failed_logins_changed:
+            self._failed_logins_changed = False
+            self.async_update_listeners()
+
+    @guarded
+    async def async_process_retries(self, now=None):
+        """Retry a batch of failed lookups that are due."""
+        if not self.retry_queue.loaded:
+            return
+        due = []
+        for ip in self.retry_queue.due():
+            ipdata = self.ips.get(ip)
+            if ipdata is None:
+                self.retry_queue.discard(ip)
+            else:
+                due.append(ipdata)
+        if not due:
+            return
+        results = await self.async_lookup(due, PRIORITY_RETRY)
+        enriched = False
+        for ipdata, result in zip(due, results):
+            if result:
+                self.retry_queue.discard(ipdata.ip_address)
+                enriched = True
+            elif result is False:
+                self.retry_queue.schedule(
+                    ipdata.ip_address, ipdata.retry_after, ipdata.lookup_error
+                )
+            # None: not attempted, the provider asked us to back off or the
+            # quota is kept for live logins. Leave it queued.
+        if enriched:
+            await self.async_write_to_file()
+            self.async_update_listeners()
+
+    async def async_lookup(self, ipdatas, priority):
+        """Enrich ``ipdatas`` within the provider quota left for ``priority``.
+
+        Returns True, False or None per entry like :func:`lookup_many`.
+        Cached results cost nothing; lookups the quota cannot cover are
+        None and are not sent.
+        """
+        results = [None] * len(ipdatas)
+        pending = []
+        for index, ipdata in enumerate(ipdatas):
+            if ipdata.apply_cached():
+                results[index] = True
+            else:
+                pending.append(index)
+        granted = pending[: self.quota.acquire(self.provider, priority, len(pending))]
+        if granted:
+            looked_up = await self.hass.async_add_executor_job(
+                lookup_many, [ipdatas[index] for index in granted]
+            )
+            unsent = looked_up.count(None)
+            if unsent:
+                self.quota.release(self.provider, unsent)
+            for index, result in zip(granted, looked_up):
+                results[index] = result
+        return results
+
+    # Persistence -------------------------------------------------------
+
+    @property
+    def all_records(self):
+        """Return every record, including spilled ones, as ``{ip: attributes}``.
+
+        With a spill, the result reads it on demand; walk it in an executor job.
+        """
+        if self.spill is None:
+            return self.stored
+        return RecordsView(self.stored, self.spill)
+
+    async def async_write_to_file(self):
+        """Write the index over the stored records to the outfile.
+
+        The coordinator is the only writer, so the previously written
+        records are reused instead of re-reading the file. ``stored`` is
+        replaced rather than mutated so in-flight exports see a stable dict.
+        Unchanged records keep their previous object, so only changed ones
+        are held twice while the file is written.
+
+        Writes are serialized and coalesced: callers that ask while a write
+        is running wait for the next one, which covers all of their changes.
+        """
+        self._write_pending = True
+        async with self._write_lock:
+            if not self._write_pending:
+                # A write started after this call already covered it.
+                return
+            self._write_pending = False
+            await self._async_write_outfile()
+
+    async def _async_write_outfile(self):
+        stored = self.stored
+        info = dict(stored)
+        for ip, data in self.ips.items():
+            record = data.as_record()
+            if record != stored.get(ip):
+                info[ip] = record
+        self.stored = info
+        if self.budget is not None:
+            # First, so the outfile is written the way it will be read back.
+            await self.async_enforce_memory_budget()
+        await self.hass.async_add_executor_job(self._write_outfile, self.stored)
+
+    def _write_outfile(self, records):
+        size = write_outfile(self.out, records, self.spill)
+        if self.spill is not None:
+            stat = os.stat(self.out)
+            self.spill.set_meta(
+                META_OUTFILE,
+                {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "unspilled_size": size,
+                    "ipv6_prefix": self.ipv6_prefix,
+                },
+            )
+
+    def _unspilled_size(self):
+        """Return how much of the outfile to read when the rest is spilled.
+
+        Returns None, after emptying the spill, unless the outfile is the one
+        last written with it; then everything past that size is in the spill.
+        """
+        meta = self.spill.get_meta(META_OUTFILE) or {}
+        with suppress(OSError):
+            stat = os.stat(self.out)
+            written = (meta.get("size"), meta.get("mtime_ns"), meta.get("ipv6_prefix"))
+            if written == (stat.st_size, stat.st_mtime_ns, self.ipv6_prefix):
+                return meta["unspilled_size"]
+        self.spill.clear()
+        return None
+
+    # Memory budget -----------------------------------------------------
+
+    async def async_enforce_memory_budget(self):
+        """Shed the geo cache, then spill cold records, while over the budget.
+
+        Returns the number of records spilled.
+        """
+        cached = len(self.geo_cache) if self.geo_cache is not None else 0
+        if self.budget.estimate(self.ips, self.stored, cached) <= self.budget.limit:
+            return 0
+        if cached:
+            await self.hass.async_add_executor_job(self.geo_cache.shed)
+            cached = len(self.geo_cache)
+            if self.budget.estimate(self.ips, self.stored, cached) <= self.budget.limit:
+                return 0
+
+        keep = set(self.retry_queue.entries)
+        if self.last_ip is not None:
+            keep.add(self.last_ip.ip_address)
+        spilled = [
+            (key, self.stored[key])
+            for key in self.budget.select(self.ips, self.stored, keep)
+        ]
+        if not spilled:
+            return 0
+        await self.hass.async_add_executor_job(self.spill.put_many, spilled)
+
+        stored = dict(self.stored)
+        count = 0
+        for key, record in spilled:
+            # Keep anything that changed while the spill was being written.
+            ipdata = self.ips.get(key)
+            if stored.get(key) is not record or (
+                ipdata is not None and ipdata.as_record() != record
+            ):
+                continue
+            del stored[key]
+            self.ips.pop(key, None)
+            count += 1
+        self.stored = stored
+        _LOGGER.debug(
+            "Spilled %s records to stay within %s MiB", count, self.budget.limit // 2**20
+        )
+        return count
+
+    async def _async_unspill(self, keys):
+        """Move the spilled records of ``keys`` back into the index."""
+        records = await self.hass.async_add_executor_job(self.spill.get_many, keys)
+        records = {
+            key: record
+            for key, record in records.items()
+            if key not in self.ips and key not in self.stored
+        }
+        if not records:
+            return
+        self.stored = {**self.stored, **records}
+        for key, record in records.items():
+            self.ips[key] = IPData(
+                AuthenticatedData(key, record),
+                self.all_users,
+                self.provider,
+                new=False,
+                geo_cache=self.geo_cache,
+            )
+
+    async def _async_restore_used(self, tokens):
+        """Restore spilled records whose tokens were used since they were spilled.
+
+        Returns the keys of the spilled records left alone.
+        """
+        latest = {}
+        for ip, attrs in tokens.items():
+            key = tracking_key(ip, self.ipv6_prefix)
+            if key not in self.ips and key not in self.stored:
+                latest[key] = max(latest.get(key, ""), attrs["last_used_at"] or "")
+        if not latest:
+            return set()
+        spilled = await self.hass.async_add_executor_job(self.spill.last_used, latest)
+        used = [key for key, last_used in spilled.items() if latest[key] > (last_used or "")]
+        if used:
+            await self._async_unspill(used)
+        return set(spilled).difference(used)
+
+
+# ------------------------
+# Auth / IPData classes
+# ------------------------
+async def async_load_authentications(hass, authfile_path, exclude, exclude_clients):
+    file_path = hass.config.path(authfile_path)
+
+    def _load():
+        if not os.path.exists(file_path):
+            return None
+        # Reduced here so the parsed auth file is freed before returning.
+        return _clean_tokens(load_json_file(file_path), exclude, exclude_clients)
+
+    result = await hass.async_add_executor_job(_load)
+    if result is None:
+        _LOGGER.critical("Auth file missing: %s", file_path)
+        return {}, {}
+    return result
+
+
+def _clean_tokens(auth, exclude, exclude_clients):
+    users = {u["id"]: u["name"] for u in auth["data"]["users"]}
+    tokens_cleaned = {}
+    for t in auth["data"]["refresh_tokens"]:
+        try:
+            ip = t.get("last_used_ip")
+            if ip is None or not is_public(ip):
+                continue
+            if any(ip_address(ip) in ip_network(net, strict=False) for net in exclude):
+                continue
+            if t.get("client_id") in exclude_clients:
+                continue
+            if ip in tokens_cleaned:
+                if t["last_used_at"] > tokens_cleaned[ip]["last_used_at"]:
+                    tokens_cleaned[ip]["last_used_at"] = t["last_used_at"]
+                    tokens_cleaned[ip]["user_id"] = t["user_id"]
+            else:
+                tokens_cleaned[ip] = {"last_used_at": t["last_used_at"], "user_id": t["user_id"]}
+        except Exception:
+            continue
+    return users, tokens_cleaned
+
+
+def lookup_many(ipdatas):
+    """Enrich ``ipdatas``, returning True, False or None for each of them.
+
+    False means the lookup failed and should be retried; None means it was
+    not attempted because the provider asked to back off. Providers with a
+    batch endpoint look up every uncached IP with one request per chunk.
+    """
+    results = [None] * len(ipdatas)
+    provider = PROVIDERS[ipdatas[0].provider] if ipdatas else None
+    if len(ipdatas) > 1 and getattr(provider, "batch_url", None):
+        pending = []
+        for index, ipdata in enumerate(ipdatas):
+            if ipdata.apply_cached():
+                results[index] = True
+            else:
+                pending.append(index)
+        if pending:
+            geos = provider.lookup_batch([ipdatas[index].address for index in pending])
+            for index, geo in zip(pending, geos):
+                results[index] = ipdatas[index].apply_lookup(geo)
+        return results
+
+    for index, ipdata in enumerate(ipdatas):
+        results[index] = ipdata.lookup()
+        if ipdata.retry_after:
+            break
+    return results
+
+
+class AuthenticatedData:
+    def __init__(self, ipaddr, attributes):
+        self.ipaddr = ipaddr
+        self.attributes = attributes
+        self.last_access = attributes.get("last_used_at")
+        self.prev_access = attributes.get("prev_used_at")
+        self.country = attributes.get("country")
+        self.country_code = attributes.get("country_code")
+        self.region = attributes.get("region")
+        self.city = attributes.get("city")
+        self.asn = attributes.get("asn")
+        self.org = attributes.get("org")
+        self.latitude = attributes.get("latitude")
+        self.longitude = attributes.get("longitude")
+        self.timezone = attributes.get("timezone")
+        self.currency = attributes.get("currency")
+        self.languages = attributes.get("languages")
+        self.postal = attributes.get("postal")
+        self.user_id = attributes.get("user_id")
+        self.hostname = attributes.get("hostname")
+        self.flags = attributes.get("flags") or []
+        self.enriched_at = attributes.get("enriched_at")
+        self.addresses = as_list(attributes.get("addresses"))
+
+
+class IPData:
+    # Slots, since one instance is held for every tracked IP.
+    __slots__ = (
+        "all_users",
+        "provider",
+        "geo_cache",
+        "lookup_error",
+        "retry_after",
+        "ip_address",
+        "last_used_at",
+        "prev_used_at",
+        "user_id",
+        "hostname",
+        "country",
+        "country_code",
+        "region",
+        "city",
+        "asn",
+        "org",
+        "latitude",
+        "longitude",
+        "timezone",
+        "currency",
+        "languages",
+        "postal",
+        "flags",
+        "enriched_at",
+        "addresses",
+        "new_ip",
+    )
+
+    def __init__(self, access_data, users, provider, new=True, geo_cache=None):
+        self.all_users = users
+        self.provider = provider
+        self.geo_cache = geo_cache
+        self.lookup_error = None
+        self.retry_after = None
+        self.ip_address = access_data.ipaddr
+        self.last_used_at = access_data.last_access
+        self.prev_used_at = access_data.prev_access
+        self.user_id = access_data.user_id
+        self.hostname = access_data.hostname
+        self.country = access_data.country
+        self.country_code = access_data.country_code
+        self.region = access_data.region
+        self.city = access_data.city
+        self.asn = access_data.asn
+        self.org = access_data.org
+        self.latitude = access_data.latitude
+        self.longitude = access_data.longitude
+        self.timezone = access_data.timezone
+        self.currency = access_data.currency
+        self.languages = access_data.languages
+        self.postal = access_data.postal
+        self.flags = access_data.flags
+        self.enriched_at = access_data.enriched_at
+        self.addresses = access_data.addresses
+        self.new_ip = new
+
+    def as_record(self):
+        """Return the outfile representation of this IP."""
+        return {
+            "user_id": self.user_id,
+            "username": self.username,
+            "last_used_at": self.last_used_at,
+            "prev_used_at": self.prev_used_at,
+            "country": self.country,
+            "country_code": self.country_code,
+            "region": self.region,
+            "city": self.city,
+            "asn": self.asn,
+            "org": self.org,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "timezone": self.timezone,
+            "currency": self.currency,
+            "languages": self.languages,
+            "postal": self.postal,
+            "hostname": self.hostname,
+            "flags": self.flags,
+            "enriched_at": self.enriched_at,
+            "addresses": self.addresses or None,
+        }
+
+    @property
+    def address(self):
+        """Return the most recently seen address of this IP or prefix."""
+        return self.addresses[-1] if self.addresses else self.ip_address
+
+    def add_address(self, address):
+        """Remember ``address`` as the latest one seen under a prefix key."""
+        if address == self.ip_address:
+            return
+        if address in self.addresses:
+            self.addresses.remove(address)
+        self.addresses.append(address)
+        del self.addresses[:-MAX_ADDRESSES]
+
+    @property
+    def username(self):
+        return self.all_users.get(self.user_id, "Unknown") if self.user_id else "Unknown"
+
+    def lookup(self, use_cache=True):
+        """Enrich this IP, returning False if the lookup should be retried."""
+        if use_cache and self.apply_cached():
+            return True
+        geo = PROVIDERS[self.provider](self.address)
+        geo.update_geo_info()
+        return self.apply_lookup(geo)
+
+    def apply_cached(self):
+        """Apply the shared geo cache entry for this IP, if there is one."""
+        if self.geo_cache is None:
+            return False
+        cached = self.geo_cache.get(self.ip_address)
+        if cached:
+            self.apply_geo(cached)
+            return True
+        return False
+
+    def apply_lookup(self, geo):
+        """Apply a finished provider lookup, returning False if it should be retried.
+
+        Returns None if the lookup was never sent.
+        """
+        self.lookup_error = geo.error
+        self.retry_after = geo.retry_after
+        if not geo.sent:
+            return None
+        if geo.failed:
+            return False
+        result = geo.computed_result
+        if result:
+            result["enriched_at"] = dt_util.utcnow().isoformat()
+            self.apply_geo(result)
+            if self.geo_cache is not None:
+                self.geo_cache.put(self.ip_address, result)
+        else:
+            # Nothing to enrich (e.g. reserved ranges); don't ask again soon.
+            self.enriched_at = dt_util.utcnow().isoformat()
+        return True
+
+    def apply_geo(self, result):
+        self.country = result.get("country")
+        self.country_code = result.get("country_code")
+        self.region = result.get("region")
+        self.city = result.get("city")
+        self.asn = result.get("asn")
+        self.org = result.get("org")
+        self.latitude = result.get("latitude")
+        self.longitude = result.get("longitude")
+        self.timezone = result.get("timezone")
+        self.currency = result.get("currency")
+        self.languages = result.get("languages")
+        self.postal = result.get("postal")
+        self.enriched_at = result.get("enriched_at") or dt_util.utcnow().isoformat()
+
+    def notify(self, hass):
+        message = f"**IP Address:** {self.address}\n"
+        if self.address != self.ip_address:
+            message += f"**Network:** {self.ip_address}\n"
+        message += f"**Username:** {self.username}\n"
+        for val, name in [
+            (self.country, "Country"),
+            (self.country_code, "Country Code"),
+            (self.region, "Region"),
+            (self.city, "City"),
+            (self.asn, "ASN"),
+            (self.org, "Organisation"),
+            (self.latitude, "Latitude"),
+            (self.longitude, "Longitude"),
+            (self.timezone, "Timezone"),
+            (self.currency, "Currency"),
+            (self.languages, "Languages"),
+            (self.postal, "Postal"),
+            (self.hostname, "Hostname"),
+            (", ".join(self.flags), "Flags"),
+        ]:
+            if val:
+                message += f"**{name}:** {val}\n"
+        if self.last_used_at:
+            message += f"**Login time:** {self.last_used_at[:19].replace('T', ' ')}\n"
+        async_create(hass, message, title="New successful login", notification_id=self.ip_address)
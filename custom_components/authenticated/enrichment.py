@@ -0,0 +1,76 @@
+"""Enrichment stages run after the geo lookup to tag IPs with flags."""
+
+import logging
+
+from .blocklist import BlocklistSet
+from .const import CONF_BLOCKLIST_DIR
+
+_LOGGER = logging.getLogger(__name__)
+
+ENRICHERS = {}
+
+
+def register_enricher(classname):
+    """Register enrichers when used as a decorator."""
+    ENRICHERS[classname.name] = classname
+    return classname
+
+
+def get_enrichers(config):
+    """Return an instance of every enricher enabled by ``config``."""
+    return [cls(config) for cls in ENRICHERS.values() if cls.is_enabled(config)]
+
+
+def apply_enrichers(enrichers, ipdata):
+    """Set ``ipdata.flags`` from every enricher in the pipeline."""
+    flags = set()
+    for enricher in enrichers:
+        flags.update(enricher.enrich(ipdata))
+    ipdata.flags = sorted(flags)
+
+
+class Enricher:
+    """Base class for enrichment stages."""
+
+    name = None
+
+    def __init__(self, config):
+        self.config = config
+
+    @classmethod
+    def is_enabled(cls, config):
+        """Return True if ``config`` turns this stage on."""
+        return False
+
+    def refresh(self):
+        """Reload backing data in an executor job, returning True on change."""
+        return False
+
+    def enrich(self, ipdata):
+        """Return the flags that apply to ``ipdata``; must not block."""
+        raise NotImplementedError
+
+
+@register_enricher
+class BlocklistEnricher(Enricher):
+    """Tag IPs found in local Tor, VPN/hosting or abuse list files.
+
+    Every list file in the configured directory contributes its file name
+    (without extension) as a flag, e.g. ``tor_exits.txt`` -> ``tor_exits``.
+    """
+
+    name = "blocklist"
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.blocklists = BlocklistSet(config[CONF_BLOCKLIST_DIR])
+
+    @classmethod
+    def is_enabled(cls, config):
+        return bool(config.get(CONF_BLOCKLIST_DIR))
+
+    def refresh(self):
+        return self.blocklists.refresh()
+
+    def enrich(self, ipdata):
+        return self.blocklists.match(ipdata.address)
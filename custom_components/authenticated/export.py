@@ -0,0 +1,312 @@
+"""Columnar export of tracked IP records and login history."""
+
+import csv
+import logging
+import os
+import shutil
+import threading
+from contextlib import suppress
+
+from homeassistant.exceptions import HomeAssistantError
+
+from .serialization import json_dumps, json_loads
+
+_LOGGER = logging.getLogger(__name__)
+
+# Rows are converted and written in batches of this size so neither the
+# Arrow nor the CSV writer ever holds more than one batch in memory.
+EXPORT_BATCH_SIZE = 4096
+
+# Bytes read per step when walking the history journal backwards.
+HISTORY_CHUNK_SIZE = 64 * 1024
+
+# Once the history journal grows past this, its oldest rows are dropped
+# until about half of it is left.
+MAX_HISTORY_BYTES = 50 * 1024 * 1024
+
+# Appends run in executor jobs; one trimming the journal must not lose rows
+# another appends meanwhile.
+_history_lock = threading.Lock()
+
+DATASET_RECORDS = "records"
+DATASET_HISTORY = "history"
+DATASET_NODES = "nodes"
+
+FORMAT_AUTO = "auto"
+FORMAT_ARROW = "arrow"
+FORMAT_PARQUET = "parquet"
+FORMAT_CSV = "csv"
+FORMATS = [FORMAT_AUTO, FORMAT_ARROW, FORMAT_PARQUET, FORMAT_CSV]
+
+EXTENSIONS = {
+    FORMAT_ARROW: "arrow",
+    FORMAT_PARQUET: "parquet",
+    FORMAT_CSV: "csv",
+}
+
+RECORD_COLUMNS = (
+    ("ip", str),
+    ("user_id", str),
+    ("username", str),
+    ("last_used_at", str),
+    ("prev_used_at", str),
+    ("country", str),
+    ("country_code", str),
+    ("region", str),
+    ("city", str),
+    ("asn", str),
+    ("org", str),
+    ("latitude", float),
+    ("longitude", float),
+    ("timezone", str),
+    ("currency", str),
+    ("languages", str),
+    ("postal", str),
+    ("hostname", str),
+    ("flags", str),
+    ("enriched_at", str),
+    ("addresses", str),
+)
+
+HISTORY_COLUMNS = (
+    ("timestamp", str),
+    ("ip", str),
+    ("user_id", str),
+    ("username", str),
+    ("country", str),
+    ("country_code", str),
+    ("asn", str),
+    ("org", str),
+    ("hostname", str),
+    ("new_ip", bool),
+    ("flags", str),
+)
+
+NODE_COLUMNS = (("node", str),) + RECORD_COLUMNS
+
+COLUMNS = {
+    DATASET_RECORDS: RECORD_COLUMNS,
+    DATASET_HISTORY: HISTORY_COLUMNS,
+    DATASET_NODES: NODE_COLUMNS,
+}
+
+
+def have_pyarrow():
+    """Return True if pyarrow can be imported."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_format(fmt):
+    """Resolve ``auto`` to the best format available in this environment."""
+    if fmt == FORMAT_AUTO:
+        return FORMAT_ARROW if have_pyarrow() else FORMAT_CSV
+    if fmt in (FORMAT_ARROW, FORMAT_PARQUET) and not have_pyarrow():
+        raise HomeAssistantError(f"Export format '{fmt}' requires pyarrow")
+    return fmt
+
+
+def iter_records(records):
+    """Yield export rows from an ``{ip: attributes}`` mapping."""
+    for ip, attrs in records.items():
+        yield {"ip": ip, **(attrs or {})}
+
+
+def iter_history(path):
+    """Yield login history rows from the append-only journal at ``path``."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json_loads(line)
+            except ValueError:
+                _LOGGER.debug("Skipping malformed history line in %s", path)
+
+
+def iter_history_reverse(path, before=None, chunk_size=HISTORY_CHUNK_SIZE):
+    """Yield ``(offset, row)`` from the history journal, newest first.
+
+    ``offset`` is where the row's line starts in the file; pass it back as
+    ``before`` to continue with the rows written before it. The file is read
+    backwards in fixed-size chunks, so paging never loads the whole journal.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        position = f.seek(0, os.SEEK_END) if before is None else before
+        buffer = b""
+        while position > 0:
+            size = min(chunk_size, position)
+            position -= size
+            f.seek(position)
+            buffer = f.read(size) + buffer
+            lines = buffer.split(b"\n")
+            # Unless we reached the start, the first line may be cut short.
+            buffer = lines.pop(0) if position > 0 else b""
+            offset = position + len(buffer) + (1 if position > 0 else 0)
+            starts = []
+            for line in lines:
+                starts.append(offset)
+                offset += len(line) + 1
+            for start, line in zip(reversed(starts), reversed(lines)):
+                if not line.strip():
+                    continue
+                try:
+                    yield start, json_loads(line)
+                except ValueError:
+                    _LOGGER.debug("Skipping malformed history line in %s", path)
+
+
+def append_history(path, row, max_bytes=MAX_HISTORY_BYTES):
+    """Append one login to the history journal, trimming it past ``max_bytes``.
+
+    Trimming keeps the newest half, so it happens once per ``max_bytes / 2``
+    appended and each login still costs a constant amount of I/O on average.
+    """
+    with _history_lock:
+        with open(path, "ab") as f:
+            f.write(json_dumps(row) + b"\n")
+            size = f.tell()
+        if size > max_bytes:
+            _trim_history(path, size - max_bytes // 2)
+
+
+def _trim_history(path, start):
+    """Replace the journal with its rows from the line at or after ``start``."""
+    tmp_path = f"{path}.tmp"
+    with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+        # Skip the rest of the row ``start`` falls into.
+        src.seek(start - 1)
+        src.readline()
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, path)
+    _LOGGER.debug("Dropped the oldest %s bytes of login history from %s", start, path)
+
+
+def _coerce(value, kind):
+    if value is None:
+        return None
+    if kind is float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if kind is bool:
+        return bool(value)
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(item) for item in value)
+    return str(value)
+
+
+def _csv_value(value, kind):
+    value = _coerce(value, kind)
+    return "" if value is None else value
+
+
+def _batched(rows, size=EXPORT_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_csv(path, columns, rows):
+    count = 0
+    names = [name for name, _ in columns]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for row in rows:
+            writer.writerow([_csv_value(row.get(name), kind) for name, kind in columns])
+            count += 1
+    return count
+
+
+def _write_arrow(path, columns, rows, parquet=False):
+    import pyarrow as pa
+
+    types = {str: pa.string(), float: pa.float64(), bool: pa.bool_()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+
+    if parquet:
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+        sink = None
+    else:
+        sink = pa.OSFile(path, "wb")
+        writer = pa.ipc.new_file(sink, schema)
+
+    count = 0
+    try:
+        for batch in _batched(rows):
+            arrays = [
+                pa.array([_coerce(row.get(name), kind) for row in batch], type=types[kind])
+                for name, kind in columns
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(batch)
+    finally:
+        writer.close()
+        if sink is not None:
+            sink.close()
+    return count
+
+
+def write_export(path, fmt, columns, rows):
+    """Stream ``rows`` into ``path`` and return the number of rows written.
+
+    The file is written next to its destination and moved into place once
+    complete, so readers never see a partial export.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        if fmt == FORMAT_CSV:
+            count = _write_csv(tmp_path, columns, rows)
+        else:
+            count = _write_arrow(tmp_path, columns, rows, parquet=fmt == FORMAT_PARQUET)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+async def async_export(hass, dataset, fmt, path, records, history_file, nodes=None):
+    """Export ``dataset`` to ``path`` in an executor job.
+
+    ``records`` is the ``{ip: attributes}`` mapping as persisted to the
+    outfile; history is streamed straight from ``history_file``. ``nodes``
+    holds the merged multi-node rows when aggregation is enabled.
+    """
+    if dataset == DATASET_NODES and nodes is None:
+        raise HomeAssistantError("Node aggregation is not enabled")
+    fmt = resolve_format(fmt)
+    if path is None:
+        path = hass.config.path(f"authenticated_{dataset}.{EXTENSIONS[fmt]}")
+
+    def _export():
+        if dataset == DATASET_HISTORY:
+            rows = iter_history(history_file)
+        elif dataset == DATASET_NODES:
+            rows = nodes
+        else:
+            rows = iter_records(records)
+        return write_export(path, fmt, COLUMNS[dataset], rows)
+
+    count = await hass.async_add_executor_job(_export)
+    _LOGGER.debug("Exported %s %s rows to %s", count, dataset, path)
+    return {"path": path, "format": fmt, "rows": count}
@@ -0,0 +1,200 @@
+"""In-memory tracking of failed login attempts and brute-force detection.
+
+Home Assistant reports every request with invalid authentication through a
+warning on the ``homeassistant.components.http.ban`` logger, and logs again
+when an IP gets banned. :class:`BanLogHandler` turns those records into
+calls on the event loop, and :class:`FailedLoginTracker` keeps per-IP and
+per-username sliding-window counts. Nothing is written to disk per attempt.
+"""
+
+import heapq
+import logging
+import re
+import time
+from array import array
+from collections import OrderedDict
+
+from .const import DEFAULT_BRUTE_FORCE_THRESHOLD, DEFAULT_BRUTE_FORCE_WINDOW
+
+BAN_LOGGER = "homeassistant.components.http.ban"
+
+WINDOW_BUCKETS = 10
+MAX_KEYS = 10000
+
+KIND_IP = "ip"
+KIND_USERNAME = "username"
+
+_LOGIN_FAILED_RE = re.compile(
+    r"invalid authentication from (?P<host>\S+) \((?P<ip>[0-9A-Fa-f:.]+)\)"
+)
+_BANNED_RE = re.compile(r"Banned IP (?P<ip>[0-9A-Fa-f:.]+)")
+
+
+class SlidingWindowCounter:
+    """Event count over the last ``size`` time slots, in a fixed ring buffer."""
+
+    __slots__ = ("buckets", "slot", "total")
+
+    def __init__(self, size):
+        self.buckets = array("I", bytes(4 * size))
+        self.slot = 0
+        self.total = 0
+
+    def _advance(self, slot):
+        size = len(self.buckets)
+        if slot - self.slot >= size:
+            for index in range(size):
+                self.buckets[index] = 0
+            self.total = 0
+        else:
+            for expired in range(self.slot + 1, slot + 1):
+                index = expired % size
+                self.total -= self.buckets[index]
+                self.buckets[index] = 0
+        self.slot = slot
+
+    def add(self, slot, amount=1):
+        """Count ``amount`` events in ``slot`` and return the window total."""
+        if slot > self.slot:
+            self._advance(slot)
+        self.buckets[self.slot % len(self.buckets)] += amount
+        self.total += amount
+        return self.total
+
+    def count(self, slot):
+        """Return the number of events in the window ending at ``slot``."""
+        if slot > self.slot:
+            self._advance(slot)
+        return self.total
+
+
+class _CounterTable:
+    """Bounded map of key -> counter, evicting the least recently hit key."""
+
+    def __init__(self, size, max_keys):
+        self.size = size
+        self.max_keys = max_keys
+        self.counters = OrderedDict()
+
+    def add(self, key, slot):
+        counter = self.counters.get(key)
+        if counter is None:
+            if len(self.counters) >= self.max_keys:
+                self.counters.popitem(last=False)
+            counter = self.counters[key] = SlidingWindowCounter(self.size)
+            counter.slot = slot
+        else:
+            self.counters.move_to_end(key)
+        return counter.add(slot)
+
+    def count(self, key, slot):
+        counter = self.counters.get(key)
+        return counter.count(slot) if counter is not None else 0
+
+    def sweep(self, slot):
+        """Drop keys whose window is empty."""
+        for key in [key for key, c in self.counters.items() if not c.count(slot)]:
+            del self.counters[key]
+
+    def top(self, slot, limit):
+        return heapq.nlargest(
+            limit,
+            ((key, count) for key, c in self.counters.items() if (count := c.count(slot))),
+            key=lambda item: item[1],
+        )
+
+
+class FailedLoginTracker:
+    """Sliding-window failed-login counts with edge-triggered brute-force flags.
+
+    A key is flagged the first time its count within ``window`` seconds
+    reaches ``threshold`` and is re-armed once it drops below it again, so
+    a sustained attack raises one signal instead of one per attempt.
+    """
+
+    def __init__(
+        self,
+        window=DEFAULT_BRUTE_FORCE_WINDOW,
+        threshold=DEFAULT_BRUTE_FORCE_THRESHOLD,
+        buckets=WINDOW_BUCKETS,
+        max_keys=MAX_KEYS,
+    ):
+        self.window = window
+        self.threshold = threshold
+        self.bucket_seconds = window / buckets
+        self.total = SlidingWindowCounter(buckets)
+        self.tables = {
+            KIND_IP: _CounterTable(buckets, max_keys),
+            KIND_USERNAME: _CounterTable(buckets, max_keys),
+        }
+        self.flagged = {KIND_IP: {}, KIND_USERNAME: {}}
+        self.banned = set()
+
+    def _slot(self, now=None):
+        return int((time.monotonic() if now is None else now) / self.bucket_seconds)
+
+    def record(self, ip, username=None, now=None):
+        """Count one failed attempt and return newly flagged ``(kind, key, count)``."""
+        slot = self._slot(now)
+        self.total.add(slot)
+        triggered = []
+        for kind, key in ((KIND_IP, ip), (KIND_USERNAME, username)):
+            if not key:
+                continue
+            count = self.tables[kind].add(key, slot)
+            if count >= self.threshold and key not in self.flagged[kind]:
+                self.flagged[kind][key] = count
+                triggered.append((kind, key, count))
+        return triggered
+
+    def record_ban(self, ip):
+        self.banned.add(ip)
+
+    def sweep(self, now=None):
+        """Expire idle keys and re-arm keys that fell below the threshold."""
+        slot = self._slot(now)
+        for kind, table in self.tables.items():
+            table.sweep(slot)
+            flagged = self.flagged[kind]
+            for key in [k for k in flagged if table.count(k, slot) < self.threshold]:
+                del flagged[key]
+
+    def attempts(self, now=None):
+        """Return the number of failed attempts within the window."""
+        return self.total.count(self._slot(now))
+
+    def count(self, kind, key, now=None):
+        return self.tables[kind].count(key, self._slot(now))
+
+    def suspects(self, kind=KIND_IP, now=None):
+        """Return the currently flagged keys with their window counts."""
+        slot = self._slot(now)
+        return {key: self.tables[kind].count(key, slot) for key in self.flagged[kind]}
+
+    def top(self, kind, limit=5, now=None):
+        """Return the ``limit`` keys with the most attempts in the window."""
+        return dict(self.tables[kind].top(self._slot(now), limit))
+
+
+class BanLogHandler(logging.Handler):
+    """Forward failed-login and ban warnings from Home Assistant's http ban logger.
+
+    ``on_failure(ip)`` and ``on_ban(ip)`` are scheduled on ``loop``, since
+    records may be emitted from any thread.
+    """
+
+    def __init__(self, loop, on_failure, on_ban):
+        super().__init__(logging.WARNING)
+        self.loop = loop
+        self.on_failure = on_failure
+        self.on_ban = on_ban
+
+    def emit(self, record):
+        try:
+            message = record.getMessage()
+            if match := _LOGIN_FAILED_RE.search(message):
+                self.loop.call_soon_threadsafe(self.on_failure, match["ip"])
+            elif match := _BANNED_RE.search(message):
+                self.loop.call_soon_threadsafe(self.on_ban, match["ip"])
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,228 @@
+"""Hourly login counts pushed to the recorder's long-term statistics.
+
+Sensor history stores a full copy of the state attributes on every login.
+Long-term statistics keep one compact row per hour instead, so months of
+activity can be charted cheaply. Every finished hour is imported as
+external statistics:
+
+- ``authenticated:logins``: successful logins, as a running sum
+- ``authenticated:new_ips``: logins from an IP not seen before, as a running sum
+- ``authenticated:distinct_ips``: distinct IPs that logged in during the hour
+- ``authenticated:logins_<user>``: successful logins per user, as a running sum
+
+Counts for hours not imported yet and the running sums are persisted
+through a ``Store``. The first time this runs, past hours are seeded from
+the login history journal. Nothing is counted if the recorder is not loaded.
+"""
+
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+from .export import iter_history
+from .stats import HOUR, UNKNOWN, to_timestamp
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.long_term_stats"
+SAVE_DELAY = 30
+
+IMPORT_INTERVAL = timedelta(minutes=5)
+
+STATISTIC_LOGINS = f"{DOMAIN}:logins"
+STATISTIC_NEW_IPS = f"{DOMAIN}:new_ips"
+STATISTIC_DISTINCT_IPS = f"{DOMAIN}:distinct_ips"
+
+
+def user_statistic_id(user):
+    """Return the statistic id counting the logins of ``user``."""
+    return f"{DOMAIN}:logins_{slugify(user) or 'unknown'}"
+
+
+def _metadata(statistic_id, name, has_sum=True):
+    return {
+        "source": DOMAIN,
+        "statistic_id": statistic_id,
+        "name": name,
+        "unit_of_measurement": None,
+        "has_mean": not has_sum,
+        "has_sum": has_sum,
+    }
+
+
+class HourCounts:
+    """Logins, new IPs, distinct IPs and per-user logins for one hour."""
+
+    __slots__ = ("logins", "new_ips", "ips", "users")
+
+    def __init__(self):
+        self.logins = 0
+        self.new_ips = 0
+        self.ips = set()
+        self.users = Counter()
+
+    def add(self, ip, user, new_ip):
+        self.logins += 1
+        self.new_ips += bool(new_ip)
+        if ip:
+            self.ips.add(ip)
+        self.users[user] += 1
+
+    def as_dict(self):
+        return {
+            "logins": self.logins,
+            "new_ips": self.new_ips,
+            "ips": sorted(self.ips),
+            "users": dict(self.users),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        counts = cls()
+        counts.logins = data.get("logins", 0)
+        counts.new_ips = data.get("new_ips", 0)
+        counts.ips = set(data.get("ips", []))
+        counts.users.update(data.get("users", {}))
+        return counts
+
+
+class LongTermStats:
+    """Collects logins per hour and imports finished hours into the recorder."""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.pending = {}
+        self.sums = {}
+        self.loaded = False
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._early = []
+
+    @property
+    def enabled(self):
+        return "recorder" in self.hass.config.components
+
+    async def async_load(self, history_file):
+        """Load pending hours and sums, or seed them from the history journal.
+
+        Logins recorded before loading finished are added on top.
+        """
+        if self.loaded or not self.enabled:
+            return
+        data = await self._store.async_load()
+        count = 0
+        seeded_until = None
+        if data is not None:
+            self.sums = dict(data.get("sums", {}))
+            pending = {
+                int(index): HourCounts.from_dict(counts)
+                for index, counts in data.get("pending", {}).items()
+            }
+        else:
+            pending, count, seeded_until = await self.hass.async_add_executor_job(
+                self._seed, history_file
+            )
+            if count:
+                _LOGGER.debug("Seeded long-term statistics from %s history rows", count)
+        for entry in self._early:
+            # The seed already counted the logins it read from the journal.
+            if seeded_until is None or entry[0] > seeded_until:
+                self._add(*entry, pending=pending)
+        self.pending = pending
+        self.loaded = True
+        if count or self._early:
+            self._async_schedule_save()
+        self._early = []
+        self.async_import()
+
+    def _seed(self, history_file):
+        """Return hours built from the journal, the row count and the last timestamp."""
+        pending = {}
+        count = 0
+        latest = None
+        for row in iter_history(history_file):
+            try:
+                timestamp = to_timestamp(row["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            latest = timestamp if latest is None else max(latest, timestamp)
+            self._add(timestamp, row.get("ip"), row.get("username"), row.get("new_ip"), pending)
+            count += 1
+        return pending, count, latest
+
+    def _data_to_save(self):
+        return {
+            "sums": self.sums,
+            "pending": {index: counts.as_dict() for index, counts in self.pending.items()},
+        }
+
+    def _async_schedule_save(self):
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_save(self):
+        """Write pending changes now instead of after the save delay."""
+        if self.loaded:
+            await self._store.async_save(self._data_to_save())
+
+    def _add(self, timestamp, ip, user, new_ip, pending=None):
+        pending = self.pending if pending is None else pending
+        index = int(timestamp // HOUR)
+        counts = pending.get(index)
+        if counts is None:
+            counts = pending[index] = HourCounts()
+        counts.add(ip, user or UNKNOWN, new_ip)
+
+    def record(self, timestamp, ip, user, new_ip):
+        """Count one login at ``timestamp`` (epoch, datetime or ISO string)."""
+        if not self.enabled:
+            return
+        entry = (to_timestamp(timestamp), ip, user, new_ip)
+        self._add(*entry)
+        if self.loaded:
+            self._async_schedule_save()
+        else:
+            # Saving before the stored hours are merged in would overwrite them.
+            self._early.append(entry)
+
+    @callback
+    def async_import(self, now=None):
+        """Import every finished hour; returns how many hours were imported."""
+        if not self.loaded:
+            return 0
+        current = int((time.time() if now is None else to_timestamp(now)) // HOUR)
+        finished = sorted(index for index in self.pending if index < current)
+        if not finished:
+            return 0
+
+        statistics = {}
+
+        def _add_sum(statistic_id, name, start, count):
+            total = self.sums.get(statistic_id, 0) + count
+            self.sums[statistic_id] = total
+            rows = statistics.setdefault(statistic_id, (_metadata(statistic_id, name), []))[1]
+            rows.append({"start": start, "state": count, "sum": total})
+
+        for index in finished:
+            counts = self.pending.pop(index)
+            start = datetime.fromtimestamp(index * HOUR, timezone.utc)
+            _add_sum(STATISTIC_LOGINS, "Logins", start, counts.logins)
+            _add_sum(STATISTIC_NEW_IPS, "Logins from new IPs", start, counts.new_ips)
+            distinct = len(counts.ips)
+            statistics.setdefault(
+                STATISTIC_DISTINCT_IPS,
+                (_metadata(STATISTIC_DISTINCT_IPS, "Distinct login IPs", has_sum=False), []),
+            )[1].append({"start": start, "mean": distinct, "min": distinct, "max": distinct})
+            for user, logins in counts.users.items():
+                _add_sum(user_statistic_id(user), f"Logins by {user}", start, logins)
+
+        for metadata, rows in statistics.values():
+            async_add_external_statistics(self.hass, metadata, rows)
+        self._async_schedule_save()
+        return len(finished)
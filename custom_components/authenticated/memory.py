@@ -0,0 +1,333 @@
+"""Keep the tracked IP index within a configurable memory budget.
+
+Every tracked IP is held twice: as an ``IPData`` in the coordinator's index
+and as its outfile record. With a budget configured, the coordinator
+estimates what both take after every outfile write. Over the budget, the
+shared geo cache is dropped first, then the least recently used records
+are spilled to a SQLite file until usage is back under the low-water mark.
+Spilled records are still written to the outfile, and are read back when
+their IP shows up again.
+
+Usage is estimated from a sample of entries rather than measured, so the
+budget bounds the index, not the whole process.
+"""
+
+import itertools
+import sqlite3
+import sys
+import threading
+from collections.abc import Mapping
+
+from .serialization import json_dumps, json_loads, yaml_record
+
+MIB = 1024 * 1024
+LOW_WATER = 0.8
+SAMPLE_SIZE = 64
+BATCH_SIZE = 500
+
+# Record fields with few distinct values; loaded records share them.
+SHARED_FIELDS = frozenset(
+    {
+        "user_id",
+        "username",
+        "country",
+        "country_code",
+        "region",
+        "city",
+        "asn",
+        "org",
+        "timezone",
+        "currency",
+        "languages",
+        "postal",
+    }
+)
+
+
+def compact_record(record):
+    """Return ``record`` with its field names and common values interned."""
+    if not isinstance(record, dict):
+        return record
+    compact = {}
+    for field, value in record.items():
+        if isinstance(field, str):
+            field = sys.intern(field)
+            if field in SHARED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+        compact[field] = value
+    return compact
+
+
+def deep_size(obj, shared=()):
+    """Return the size of ``obj`` and everything it references, in bytes.
+
+    Objects in ``shared`` are not counted, and neither are the string keys
+    of dicts, which are field names every record shares.
+    """
+    seen = {id(item) for item in shared}
+    size = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if item is None or item is True or item is False or id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.values())
+            stack.extend(key for key in item if not isinstance(key, str))
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif not isinstance(item, (str, bytes, int, float, type)):
+            for cls in type(item).__mro__:
+                for name in getattr(cls, "__slots__", ()):
+                    stack.append(getattr(item, name, None))
+            stack.extend(getattr(item, "__dict__", {}).values())
+    return size
+
+
+def _average(sample, shared=()):
+    """Return the average size of the entries in ``sample``."""
+    if not sample:
+        return 0
+    return (deep_size(sample, shared) - sys.getsizeof(sample)) // len(sample)
+
+
+class MemoryBudget:
+    """Estimates what the index holds and picks records to spill."""
+
+    def __init__(self, limit_mib):
+        self.limit = int(limit_mib * MIB)
+        self.low_water = int(self.limit * LOW_WATER)
+        self.entry_cost = 0
+        self.record_cost = 0
+        self.usage = 0
+
+    def estimate(self, ips, records, cached=0):
+        """Return the estimated bytes held by the index.
+
+        ``ips`` maps keys to ``IPData``, ``records`` keys to outfile
+        records, and ``cached`` is the number of geo cache entries, each
+        costed like a record.
+        """
+        keys = list(itertools.islice(ips, SAMPLE_SIZE))
+        shared = ()
+        if keys:
+            sample = ips[keys[0]]
+            shared = (sample.all_users, sample.geo_cache, sample.provider)
+        # Sized together, so values shared between entries count once per
+        # sample rather than once per entry, and an IP and its record, which
+        # share most of their values, count as one entry.
+        self.entry_cost = _average(
+            [(ips[key], records.get(key)) for key in keys], shared
+        )
+        self.record_cost = _average(list(itertools.islice(records.values(), SAMPLE_SIZE)))
+        record_only = max(len(records) - len(ips), 0) + cached
+        self.usage = (
+            len(ips) * self.entry_cost
+            + record_only * self.record_cost
+            + sys.getsizeof(ips)
+            + sys.getsizeof(records)
+        )
+        return self.usage
+
+    def select(self, ips, records, keep=()):
+        """Return the coldest keys to spill to get back under the low-water mark.
+
+        Call after :meth:`estimate`. Keys in ``keep`` are never picked.
+        """
+        excess = self.usage - self.low_water
+        if excess <= 0:
+            return []
+        by_last_use = sorted(
+            (key for key in records if key not in keep),
+            key=lambda key: (records[key] or {}).get("last_used_at") or "",
+        )
+        keys = []
+        for key in by_last_use:
+            if excess <= 0:
+                break
+            excess -= self.entry_cost if key in ips else self.record_cost
+            keys.append(key)
+        return keys
+
+
+def _batches(keys):
+    keys = list(keys)
+    for start in range(0, len(keys), BATCH_SIZE):
+        yield keys[start : start + BATCH_SIZE]
+
+
+class RecordSpill:
+    """Outfile records moved out of memory, in a SQLite file.
+
+    Each row keeps the record as JSON and as its rendered outfile fragment,
+    so the outfile is rewritten without parsing spilled records. Rows are
+    replaced when a record is spilled again and only removed by
+    :meth:`clear`; a record in memory always wins over its row. Methods do
+    blocking I/O and are called from executor threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "key TEXT PRIMARY KEY, last_used_at TEXT, data BLOB, yaml TEXT);"
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value BLOB);"
+            )
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def put_many(self, records):
+        """Store ``(key, record)`` pairs, replacing rows for the same keys."""
+        count = 0
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for batch in _batches(records):
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+                        [
+                            (
+                                key,
+                                (record or {}).get("last_used_at"),
+                                json_dumps(record),
+                                yaml_record(key, record),
+                            )
+                            for key, record in batch
+                        ],
+                    )
+                    count += len(batch)
+        return count
+
+    def _select(self, column, keys):
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            for batch in _batches(keys):
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    conn.execute(
+                        f"SELECT key, {column} FROM records WHERE key IN ({placeholders})",
+                        batch,
+                    )
+                )
+        return found
+
+    def last_used(self, keys):
+        """Return ``{key: last_used_at}`` for the ``keys`` that were spilled."""
+        return self._select("last_used_at", keys)
+
+    def get_many(self, keys):
+        """Return ``{key: record}`` for the ``keys`` that were spilled."""
+        return {
+            key: compact_record(json_loads(data))
+            for key, data in self._select("data", keys).items()
+        }
+
+    def _rows(self, column, skip):
+        after = ""
+        while True:
+            # Not holding the lock between batches lets writers interleave.
+            with self._lock:
+                batch = (
+                    self._connect()
+                    .execute(
+                        f"SELECT key, {column} FROM records WHERE key > ? ORDER BY key LIMIT ?",
+                        (after, BATCH_SIZE),
+                    )
+                    .fetchall()
+                )
+            if not batch:
+                return
+            after = batch[-1][0]
+            for key, value in batch:
+                if key not in skip:
+                    yield key, value
+
+    def items(self, skip=()):
+        """Yield ``(key, record)`` for every spilled key not in ``skip``."""
+        for key, data in self._rows("data", skip):
+            yield key, compact_record(json_loads(data))
+
+    def write_yaml(self, stream, skip=()):
+        """Write the outfile fragments of keys not in ``skip`` to a binary stream."""
+        count = 0
+        for _, fragment in self._rows("yaml", skip):
+            stream.write(fragment.encode())
+            count += 1
+        return count
+
+    def count(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def clear(self):
+        """Drop every spilled record and the metadata."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM records")
+                conn.execute("DELETE FROM meta")
+
+    def get_meta(self, name):
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT value FROM meta WHERE name = ?", (name,))
+                .fetchone()
+            )
+        return json_loads(row[0]) if row else None
+
+    def set_meta(self, name, value):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, json_dumps(value))
+                )
+
+
+class RecordsView(Mapping):
+    """Read-only ``{ip: record}`` over the records in memory and those spilled.
+
+    Lookups and iteration read the spill, so use it from executor jobs.
+    :meth:`items` streams spilled records in batches instead of loading
+    them all.
+    """
+
+    def __init__(self, records, spill):
+        self._records = records
+        self._spill = spill
+
+    def __getitem__(self, key):
+        if key in self._records:
+            return self._records[key]
+        found = self._spill.get_many([key])
+        if key not in found:
+            raise KeyError(key)
+        return found[key]
+
+    def __iter__(self):
+        yield from self._records
+        for key, _ in self._spill._rows("key", self._records):
+            yield key
+
+    def __len__(self):
+        overlap = len(self._spill.last_used(self._records))
+        return len(self._records) + self._spill.count() - overlap
+
+    def items(self):
+        yield from self._records.items()
+        yield from self._spill.items(skip=self._records)
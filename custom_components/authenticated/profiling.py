@@ -0,0 +1,256 @@
+"""On-demand CPU and memory profiling of the integration's own code.
+
+``sample`` mode polls the stacks of every thread at a fixed interval and
+keeps the ones running this integration's code. That covers coroutines on
+the event loop and lookups, file reads and writes in executor threads, at
+a low cost. ``deterministic`` mode runs ``cProfile`` on the event loop
+thread for exact call counts. Both write a ``.pstats`` file, loadable with
+``pstats`` or snakeviz, and a text summary limited to this integration.
+With ``memory``, a tracemalloc diff of allocations made from the
+integration's code over the same window is written as well.
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_PROFILE = f"{DOMAIN}_profile"
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODE_SAMPLE = "sample"
+MODE_DETERMINISTIC = "deterministic"
+MODES = [MODE_SAMPLE, MODE_DETERMINISTIC]
+
+SAMPLE_INTERVAL = 0.005
+TRACEMALLOC_FRAMES = 25
+TOP_ENTRIES = 50
+
+
+def in_package(filename):
+    """Return True if ``filename`` belongs to this integration."""
+    return filename.startswith(PACKAGE_DIR)
+
+
+class _Stats:
+    """Adapter handing a prepared stats dict to :class:`pstats.Stats`."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class StackSampler:
+    """Samples the stacks of threads running this integration's code.
+
+    A stack is kept from its outermost integration frame down to the leaf,
+    so time spent in libraries called from the integration is included
+    while the event loop and executor machinery above it is not.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"{DOMAIN}_sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip=own)
+
+    def sample(self, skip=None):
+        """Record the current stack of every thread inside the integration."""
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            stack = []
+            outermost = 0
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                if in_package(code.co_filename):
+                    outermost = len(stack)
+                frame = frame.f_back
+            if outermost:
+                self.samples[tuple(reversed(stack[:outermost]))] += 1
+
+    def stats(self):
+        """Return the samples as a ``pstats`` stats dict, in seconds."""
+        stats = {}
+        for stack, count in self.samples.items():
+            elapsed = count * self.interval
+            seen = set()
+            for depth, func in enumerate(stack):
+                leaf = depth == len(stack) - 1
+                # Count recursive frames once towards cumulative time.
+                first = func not in seen
+                seen.add(func)
+                cc, nc, tt, ct, callers = stats.get(func, (0, 0, 0.0, 0.0, {}))
+                stats[func] = (
+                    cc + (count if first else 0),
+                    nc + count,
+                    tt + (elapsed if leaf else 0.0),
+                    ct + (elapsed if first else 0.0),
+                    callers,
+                )
+                if depth:
+                    caller = stack[depth - 1]
+                    ccc, cnc, ctt, cct = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (
+                        ccc + count,
+                        cnc + count,
+                        ctt + (elapsed if leaf else 0.0),
+                        cct + elapsed,
+                    )
+        return stats
+
+
+class ProfileSession:
+    """One profiling window; started and stopped from the event loop."""
+
+    def __init__(self, mode=MODE_SAMPLE, memory=True):
+        self.mode = mode
+        self.memory = memory
+        self._profile = None
+        self._sampler = None
+        self._started_tracing = False
+        self._snapshot = None
+
+    def start(self):
+        """Start profiling; call from the event loop thread."""
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracing = True
+        if self.mode == MODE_DETERMINISTIC:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler()
+            self._sampler.start()
+
+    def take_start_snapshot(self):
+        if self.memory:
+            self._snapshot = tracemalloc.take_snapshot()
+
+    def stop_profiler(self):
+        """Stop the CPU profiler; call from the event loop thread."""
+        if self._profile is not None:
+            self._profile.disable()
+
+    def stop(self):
+        """Stop everything :meth:`start` turned on; safe to call again."""
+        self.stop_profiler()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self._stop_tracing()
+
+    def _stop_tracing(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def finish(self, directory, stamp):
+        """Stop sampling, write the reports and return their paths."""
+        paths = {}
+        if self._sampler is not None:
+            self._sampler.stop()
+            sampled = self._sampler.stats()
+            # pstats refuses an empty dict; an idle window is still a result.
+            stats = pstats.Stats(_Stats(sampled)) if sampled else pstats.Stats()
+        else:
+            stats = pstats.Stats(self._profile)
+        paths["pstats"] = os.path.join(directory, f"{DOMAIN}_profile_{stamp}.pstats")
+        stats.dump_stats(paths["pstats"])
+        paths["summary"] = os.path.join(directory, f"{DOMAIN}_profile_{stamp}.txt")
+        with open(paths["summary"], "w") as f:
+            f.write(self._summary(stats))
+
+        if self.memory:
+            paths["memory"] = os.path.join(directory, f"{DOMAIN}_memory_{stamp}.txt")
+            with open(paths["memory"], "w") as f:
+                f.write(self._memory_report())
+        return paths
+
+    def _summary(self, stats):
+        out = io.StringIO()
+        stats.stream = out
+        out.write(f"Mode: {self.mode}\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(re.escape(PACKAGE_DIR), TOP_ENTRIES)
+        stats.print_callers(re.escape(PACKAGE_DIR), TOP_ENTRIES)
+        return out.getvalue()
+
+    def _memory_report(self):
+        snapshot = tracemalloc.take_snapshot()
+        self._stop_tracing()
+        scope = [tracemalloc.Filter(True, os.path.join(PACKAGE_DIR, "*"), all_frames=True)]
+        snapshot = snapshot.filter_traces(scope)
+        lines = [
+            "Memory allocated from the integration's code, by line",
+            f"Total now: {sum(stat.size for stat in snapshot.statistics('filename')) / 1024:.1f} KiB",
+            "",
+        ]
+        if self._snapshot is not None:
+            lines.append("Growth over the profiling window:")
+            start = self._snapshot.filter_traces(scope)
+            for stat in snapshot.compare_to(start, "lineno")[:TOP_ENTRIES]:
+                lines.append(str(stat))
+            lines.append("")
+        lines.append("Largest allocations by traceback:")
+        for stat in snapshot.statistics("traceback")[:10]:
+            lines.append(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks")
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+        return "\n".join(lines) + "\n"
+
+
+async def async_profile(hass, duration, mode=MODE_SAMPLE, memory=True):
+    """Profile the integration for ``duration`` seconds and write the reports.
+
+    Returns the paths of the files written to the config directory.
+    """
+    if hass.data.get(DATA_PROFILE):
+        raise HomeAssistantError("A profiling session is already running")
+    session = ProfileSession(mode, memory)
+    hass.data[DATA_PROFILE] = session
+    try:
+        session.start()
+        await hass.async_add_executor_job(session.take_start_snapshot)
+        _LOGGER.info("Profiling %s for %ss (%s)", DOMAIN, duration, mode)
+        await asyncio.sleep(duration)
+        session.stop_profiler()
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        paths = await hass.async_add_executor_job(
+            session.finish, hass.config.path(), stamp
+        )
+    finally:
+        # A cancelled or failed session must not leave tracing running.
+        session.stop()
+        hass.data.pop(DATA_PROFILE, None)
+    _LOGGER.info("Wrote profile reports: %s", ", ".join(paths.values()))
+    return paths
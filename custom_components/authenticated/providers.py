@@ -1,14 +1,105 @@
 """Providers."""
 
 import logging
+import threading
+
 import aiohttp
-import requests
+
 from . import AuthenticatedBaseException
 
 _LOGGER = logging.getLogger(__name__)
 
 PROVIDERS = {}
 
+# Keep-alive connections kept per provider for executor lookups.
+POOL_SIZE = 10
+# IPs sent per request to a batch endpoint.
+BATCH_SIZE = 100
+
+COMPUTED_FIELDS = (
+    "country",
+    "region",
+    "city",
+    "asn",
+    "org",
+    "latitude",
+    "longitude",
+    "timezone",
+    "currency",
+    "languages",
+    "postal",
+    "country_code",
+)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class RateLimited(AuthenticatedBaseException):
+    """Raised when a provider rejects a lookup because of its rate limit."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds from a Retry-After header, if numeric."""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_mapping(value):
+    """Return ``value`` as a dict, parsing ``"key=value, key=value"`` strings."""
+    if isinstance(value, dict):
+        return {str(key): str(item) for key, item in value.items()}
+    mapping = {}
+    for item in (value or "").split(","):
+        key, sep, item = item.partition("=")
+        if sep and key.strip():
+            mapping[key.strip()] = item.strip()
+    return mapping
+
+
+def get_path(data, path):
+    """Return the value at the dotted ``path`` in ``data``, or None."""
+    for part in path.split("."):
+        if isinstance(data, dict):
+            data = data.get(part)
+        elif isinstance(data, list) and part.isdigit() and int(part) < len(data):
+            data = data[int(part)]
+        else:
+            return None
+    return data
+
+
+def get_session(name):
+    """Return the pooled ``requests`` session for provider ``name``.
+
+    Lookups run in executor threads; sharing one session per provider keeps
+    connections alive between them instead of opening one per lookup.
+    """
+    import requests
+
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = _sessions[name] = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        return session
+
+
+def close_session(name):
+    """Close the pooled session for provider ``name``, if one was opened."""
+    with _sessions_lock:
+        session = _sessions.pop(name, None)
+    if session is not None:
+        session.close()
+
 
 def register_provider(classname):
     """Register providers when used as a decorator."""
@@ -20,41 +111,88 @@ class GeoProvider:
     """Base class for Geo Providers."""
 
     url = None
+    name = None
+    headers = {}
+    api_key = None
+    timeout = 5
+    # Free-tier request quotas; None means unlimited.
+    daily_quota = None
+    monthly_quota = None
 
     def __init__(self, ipaddr):
         self.ipaddr = ipaddr
         self.result = {}
+        self.error = None
+        self.retry_after = None
+        # False when a batch lookup backed off before sending this IP.
+        self.sent = True
+
+    @property
+    def failed(self):
+        """Return True if the last lookup failed and should be retried."""
+        return self.error is not None
+
+    def api_url(self):
+        """Return the lookup URL for this IP."""
+        return self.url.format(self.ipaddr, ip=self.ipaddr, api_key=self.api_key or "")
 
     def update_geo_info(self):
         """Fetch and parse geo information synchronously (legacy/executor)."""
+        # requests is only needed on the executor lookup path, keep it off
+        # the integration import path.
+        import requests
+
         self.result = {}
+        self.error = None
+        self.retry_after = None
         try:
-            api = self.url.format(self.ipaddr)
-            data = requests.get(api, timeout=5).json()
+            response = get_session(self.name).get(
+                self.api_url(), headers=self.headers, timeout=self.timeout
+            )
+            if response.status_code == 429:
+                raise RateLimited(
+                    f"Rate limited by {self.name}",
+                    parse_retry_after(response.headers.get("Retry-After")),
+                )
+            data = response.json()
             _LOGGER.debug("Geo data for %s: %s", self.ipaddr, data)
             self._process_response(data)
         except AuthenticatedBaseException as exception:
             _LOGGER.error(exception)
-        except requests.exceptions.RequestException as e:
+            self.error = exception
+            self.retry_after = getattr(exception, "retry_after", None)
+        except (requests.exceptions.RequestException, ValueError) as e:
             _LOGGER.error("Request failed for %s: %s", self.ipaddr, e)
+            self.error = e
 
     async def async_update_geo_info(self, session=None):
         """Fetch and parse geo information asynchronously."""
         self.result = {}
+        self.error = None
+        self.retry_after = None
         close_session = False
         if session is None:
             session = aiohttp.ClientSession()
             close_session = True
         try:
-            api = self.url.format(self.ipaddr)
-            async with session.get(api, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+            async with session.get(
+                self.api_url(), headers=self.headers, timeout=aiohttp.ClientTimeout(total=10)
+            ) as resp:
+                if resp.status == 429:
+                    raise RateLimited(
+                        f"Rate limited by {self.name}",
+                        parse_retry_after(resp.headers.get("Retry-After")),
+                    )
                 data = await resp.json(content_type=None)
             _LOGGER.debug("Geo data for %s: %s", self.ipaddr, data)
             self._process_response(data)
         except AuthenticatedBaseException as exception:
             _LOGGER.error(exception)
-        except (aiohttp.ClientError, TimeoutError) as e:
+            self.error = exception
+            self.retry_after = getattr(exception, "retry_after", None)
+        except (aiohttp.ClientError, TimeoutError, ValueError) as e:
             _LOGGER.error("Async request failed for %s: %s", self.ipaddr, e)
+            self.error = e
         finally:
             if close_session:
                 await session.close()
@@ -63,9 +201,8 @@ class GeoProvider:
         """Process API response data."""
         if data.get("error"):
             if data.get("reason") == "RateLimited":
-                raise AuthenticatedBaseException(
-                    "RatelimitError, try a different provider."
-                )
+                raise RateLimited("RatelimitError, try a different provider.")
+            return
         elif data.get("status", "success") in ["error", "fail"] or data.get("reserved"):
             return
         self.result = data
@@ -146,6 +283,8 @@ class IPApi(GeoProvider):
 
     url = "https://ipapi.co/{}/json"
     name = "ipapi"
+    daily_quota = 1000
+    monthly_quota = 30000
 
 
 @register_provider
@@ -154,6 +293,7 @@ class IPInfo(GeoProvider):
 
     url = "https://ipinfo.io/{}/json"
     name = "ipinfo"
+    monthly_quota = 50000
 
     @property
     def asn(self):
@@ -167,3 +307,93 @@ class IPInfo(GeoProvider):
             return None
         parts = org.split(" ", 1)
         return parts[1] if len(parts) > 1 else None
+
+
+@register_provider
+class SelfHostedProvider(GeoProvider):
+    """A geolocation service of your own, described by configuration.
+
+    ``url`` may use ``{ip}`` and ``{api_key}``; ``fields`` maps each
+    ``computed_result`` key to a dotted path in the JSON response and
+    defaults to the key itself. With a ``batch_url``, several IPs are looked
+    up with one POST of a JSON list; the response is a list in the same
+    order or an object keyed by IP.
+    """
+
+    name = "self_hosted"
+    batch_url = None
+    fields = {key: key for key in COMPUTED_FIELDS}
+
+    @classmethod
+    def configure(cls, url, batch_url=None, api_key=None, headers=None, fields=None):
+        """Point the provider at a service; replaces any previous settings."""
+        api_key = api_key or ""
+        headers = parse_mapping(headers)
+        if api_key and not headers:
+            headers = {"Authorization": "Bearer {api_key}"}
+        fields = parse_mapping(fields)
+        for key in set(fields) - set(COMPUTED_FIELDS):
+            _LOGGER.warning("Ignoring unknown field %s in the provider field mapping", key)
+        cls.url = url or None
+        cls.batch_url = batch_url or None
+        cls.api_key = api_key
+        cls.headers = {name: value.replace("{api_key}", api_key) for name, value in headers.items()}
+        cls.fields = {key: fields.get(key, key) for key in COMPUTED_FIELDS}
+        close_session(cls.name)
+
+    def api_url(self):
+        if not self.url:
+            raise ValueError("No URL configured for the self-hosted provider")
+        return super().api_url()
+
+    @classmethod
+    def lookup_batch(cls, ips):
+        """Look up ``ips`` with one POST per chunk; returns one provider per IP."""
+        import requests
+
+        providers = [cls(ip) for ip in ips]
+        for start in range(0, len(providers), BATCH_SIZE):
+            chunk = providers[start : start + BATCH_SIZE]
+            processed = 0
+            try:
+                response = get_session(cls.name).post(
+                    cls.batch_url,
+                    json=[provider.ipaddr for provider in chunk],
+                    headers=cls.headers,
+                    timeout=cls.timeout,
+                )
+                if response.status_code == 429:
+                    raise RateLimited(
+                        f"Rate limited by {cls.name}",
+                        parse_retry_after(response.headers.get("Retry-After")),
+                    )
+                response.raise_for_status()
+                data = response.json()
+                if isinstance(data, dict):
+                    data = [data.get(provider.ipaddr) for provider in chunk]
+                if not isinstance(data, list) or len(data) != len(chunk):
+                    raise ValueError(f"Expected {len(chunk)} results, got {data!r:.200}")
+                for provider, item in zip(chunk, data):
+                    if isinstance(item, dict):
+                        provider._process_response(item)
+                    processed += 1
+            except AuthenticatedBaseException as exception:
+                _LOGGER.error(exception)
+                # Leave the unprocessed part of this chunk and everything after
+                # it to the retry queue; the chunks after it were never sent.
+                for index, provider in enumerate(providers[start + processed :], processed):
+                    provider.error = exception
+                    provider.retry_after = getattr(exception, "retry_after", None)
+                    provider.sent = index < len(chunk)
+                break
+            except (requests.exceptions.RequestException, ValueError) as e:
+                _LOGGER.error("Batch request failed for %s IPs: %s", len(chunk), e)
+                for provider in chunk:
+                    provider.error = e
+        return providers
+
+    @property
+    def computed_result(self):
+        if self.result:
+            return {key: get_path(self.result, path) for key, path in self.fields.items()}
+        return None
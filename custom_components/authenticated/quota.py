@@ -0,0 +1,191 @@
+"""Daily and monthly request budgets for geo providers.
+
+Every request sent to a provider is counted against its free-tier quota,
+and the counts are persisted so a restart does not reset them. Lookups are
+granted by priority: live logins may use the whole budget, retries must
+leave a share for live logins, and backfill must leave a larger one. A
+lookup that is not granted is left for later, not sent.
+
+With a shared directory, the counts of every node are added up in a
+:class:`~.aggregation.SharedQuota` and the budget applies to the fleet.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .providers import PROVIDERS
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.quota"
+SAVE_DELAY = 30
+
+PRIORITY_LIVE = 0
+PRIORITY_RETRY = 1
+PRIORITY_BACKFILL = 2
+
+# Share of each quota a priority must leave unused for the ones above it.
+RESERVES = {
+    PRIORITY_LIVE: 0.0,
+    PRIORITY_RETRY: 0.1,
+    PRIORITY_BACKFILL: 0.5,
+}
+
+PERIOD_DAILY = "daily"
+PERIOD_MONTHLY = "monthly"
+
+
+def period_keys(now):
+    """Return the UTC day and month ``now`` (epoch seconds) falls in."""
+    moment = datetime.fromtimestamp(now, timezone.utc)
+    return {PERIOD_DAILY: moment.strftime("%Y-%m-%d"), PERIOD_MONTHLY: moment.strftime("%Y-%m")}
+
+
+def period_end(period, now):
+    """Return the epoch time the current UTC day or month ends."""
+    moment = datetime.fromtimestamp(now, timezone.utc)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == PERIOD_DAILY:
+        return (start + timedelta(days=1)).timestamp()
+    start = start.replace(day=1)
+    return (start + timedelta(days=32)).replace(day=1).timestamp()
+
+
+class QuotaTracker:
+    """Per-provider request counts for the current UTC day and month.
+
+    Limits come from the provider class (``daily_quota``/``monthly_quota``)
+    unless overridden; an override of 0 means unlimited. With ``shared``,
+    requests are also counted there and limits apply to the shared counts.
+    """
+
+    def __init__(self, hass, daily=None, monthly=None, shared=None):
+        self.hass = hass
+        self.overrides = {PERIOD_DAILY: daily, PERIOD_MONTHLY: monthly}
+        self.shared = shared
+        self.usage = {}
+        self.loaded = False
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+
+    async def async_load(self):
+        """Load persisted counts, adding any made before loading finished."""
+        if self.loaded:
+            return
+        data = await self._store.async_load() or {}
+        for provider, stored in data.get("usage", {}).items():
+            usage = self._usage(provider)
+            for period in (PERIOD_DAILY, PERIOD_MONTHLY):
+                entry = stored.get(period) or {}
+                if entry.get("key") == usage[period]["key"]:
+                    usage[period]["used"] += entry.get("used", 0)
+        self.loaded = True
+        if self.usage:
+            self._async_schedule_save()
+
+    def _data_to_save(self):
+        return {"usage": self.usage}
+
+    def _async_schedule_save(self):
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_save(self):
+        """Write pending changes now instead of after the save delay."""
+        if self.loaded:
+            await self._store.async_save(self._data_to_save())
+
+    def _usage(self, provider, now=None):
+        """Return the counts for ``provider``, starting new periods as they roll over."""
+        keys = period_keys(time.time() if now is None else now)
+        usage = self.usage.setdefault(provider, {})
+        for period, key in keys.items():
+            if usage.get(period, {}).get("key") != key:
+                usage[period] = {"key": key, "used": 0}
+        return usage
+
+    def _used(self, provider, usage, period):
+        if self.shared is not None:
+            return self.shared.used(provider, period, usage[period]["key"])
+        return usage[period]["used"]
+
+    def limit(self, provider, period):
+        """Return the quota of ``provider`` for ``period``, or None if unlimited."""
+        override = self.overrides[period]
+        if override is not None:
+            return override or None
+        return getattr(PROVIDERS.get(provider), f"{period}_quota", None)
+
+    def available(self, provider, priority=PRIORITY_LIVE, now=None):
+        """Return how many requests ``priority`` may still send, or None if unlimited."""
+        usage = self._usage(provider, now)
+        allowed = None
+        for period in (PERIOD_DAILY, PERIOD_MONTHLY):
+            limit = self.limit(provider, period)
+            if limit is None:
+                continue
+            left = int(limit * (1 - RESERVES[priority])) - self._used(provider, usage, period)
+            allowed = left if allowed is None else min(allowed, left)
+        return None if allowed is None else max(allowed, 0)
+
+    def acquire(self, provider, priority=PRIORITY_LIVE, count=1, now=None):
+        """Count up to ``count`` requests if the budget allows; returns how many."""
+        available = self.available(provider, priority, now)
+        granted = count if available is None else min(count, available)
+        if granted < count:
+            _LOGGER.debug(
+                "Deferring %s %s lookups at priority %s, quota is low",
+                count - granted,
+                provider,
+                priority,
+            )
+        if granted:
+            self._add(provider, granted, now)
+        return granted
+
+    def release(self, provider, count, now=None):
+        """Give back requests that were granted but never sent."""
+        self._add(provider, -count, now)
+
+    def _add(self, provider, count, now=None):
+        usage = self._usage(provider, now)
+        for period in (PERIOD_DAILY, PERIOD_MONTHLY):
+            usage[period]["used"] = max(usage[period]["used"] + count, 0)
+        if self.shared is not None:
+            self.shared.add(
+                provider, {period: entry["key"] for period, entry in usage.items()}, count
+            )
+        # Saving before the stored counts are merged in would overwrite them.
+        if self.loaded:
+            self._async_schedule_save()
+
+    def seconds_until_available(self, provider, priority=PRIORITY_LIVE, now=None):
+        """Return how long until ``priority`` gets budget again, 0 if it has some."""
+        now = time.time() if now is None else now
+        if self.available(provider, priority, now) != 0:
+            return 0
+        usage = self._usage(provider, now)
+        wait = 0
+        for period in (PERIOD_DAILY, PERIOD_MONTHLY):
+            limit = self.limit(provider, period)
+            used = self._used(provider, usage, period)
+            if limit is not None and used >= int(limit * (1 - RESERVES[priority])):
+                wait = max(wait, period_end(period, now) - now)
+        return wait
+
+    def state(self, provider, now=None):
+        """Return limit, used and remaining requests per period for ``provider``."""
+        usage = self._usage(provider, now)
+        state = {}
+        for period in (PERIOD_DAILY, PERIOD_MONTHLY):
+            limit = self.limit(provider, period)
+            used = self._used(provider, usage, period)
+            state[period] = {
+                "limit": limit,
+                "used": used,
+                "remaining": None if limit is None else max(limit - used, 0),
+            }
+        return state
@@ -0,0 +1,99 @@
+"""Persistent retry queue for failed or rate-limited geo lookups."""
+
+import logging
+import random
+import time
+
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.retry_queue"
+SAVE_DELAY = 10
+
+BASE_DELAY = 60
+MAX_DELAY = 6 * 60 * 60
+BATCH_SIZE = 10
+
+
+def backoff_delay(attempts, base=BASE_DELAY, maximum=MAX_DELAY):
+    """Return the exponential backoff for ``attempts`` with equal jitter."""
+    delay = min(maximum, base * 2 ** max(attempts - 1, 0))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RetryQueue:
+    """IPs whose enrichment failed, keyed by IP with their next due time.
+
+    The queue is persisted through a Home Assistant ``Store`` so pending
+    retries survive restarts. A Retry-After hint from the provider pauses
+    the whole queue, since every queued lookup would hit the same limit.
+    """
+
+    def __init__(self, hass, batch_size=BATCH_SIZE):
+        self.hass = hass
+        self.batch_size = batch_size
+        self.entries = {}
+        self.paused_until = 0.0
+        self.loaded = False
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+
+    async def async_load(self):
+        """Load pending retries from storage."""
+        if self.loaded:
+            return
+        data = await self._store.async_load() or {}
+        self.entries = data.get("entries", {})
+        self.paused_until = data.get("paused_until", 0.0)
+        self.loaded = True
+
+    def _data_to_save(self):
+        return {"entries": self.entries, "paused_until": self.paused_until}
+
+    def _async_schedule_save(self):
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_save(self):
+        """Write pending changes now instead of after the save delay."""
+        if self.loaded:
+            await self._store.async_save(self._data_to_save())
+
+    def __contains__(self, ip):
+        return ip in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def schedule(self, ip, retry_after=None, error=None):
+        """Queue ``ip`` for another attempt after an exponential backoff."""
+        now = time.time()
+        entry = self.entries.get(ip, {"attempts": 0})
+        attempts = entry["attempts"] + 1
+        delay = backoff_delay(attempts)
+        if retry_after:
+            delay = max(delay, retry_after)
+            self.paused_until = max(self.paused_until, now + retry_after)
+        self.entries[ip] = {
+            "attempts": attempts,
+            "due": now + delay,
+            "error": str(error) if error else None,
+        }
+        _LOGGER.debug("Retrying lookup for %s in %.0fs (attempt %s)", ip, delay, attempts)
+        self._async_schedule_save()
+
+    def discard(self, ip):
+        """Drop ``ip`` from the queue."""
+        if self.entries.pop(ip, None) is not None:
+            self._async_schedule_save()
+
+    def due(self, now=None):
+        """Return up to ``batch_size`` IPs whose retry is due, oldest first."""
+        now = time.time() if now is None else now
+        if now < self.paused_until:
+            return []
+        ready = [ip for ip, entry in self.entries.items() if entry["due"] <= now]
+        ready.sort(key=lambda ip: self.entries[ip]["due"])
+        return ready[: self.batch_size]
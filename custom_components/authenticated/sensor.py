@@ -1,42 +1,68 @@
 """Authenticated login sensor - async, event-driven, extended."""
 
 import logging
-import os
-import socket
-from ipaddress import ip_address, ip_network
-from datetime import timedelta
-from contextlib import suppress
 
 import voluptuous as vol
 import homeassistant.helpers.config_validation as cv
 from homeassistant.components.sensor import PLATFORM_SCHEMA, SensorEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.components.persistent_notification import async_create
-from homeassistant.util import dt as dt_util
+from homeassistant.helpers.restore_state import RestoreEntity
 
 from .const import (
+    CONF_AGGREGATE,
+    CONF_BLOCKLIST_DIR,
+    CONF_BRUTE_FORCE_THRESHOLD,
+    CONF_BRUTE_FORCE_WINDOW,
+    CONF_DAILY_QUOTA,
+    CONF_DETECT_BLOCKING,
     CONF_EXCLUDE,
     CONF_EXCLUDE_CLIENTS,
+    CONF_GEO_MAX_AGE,
+    CONF_IPV6_PREFIX,
+    CONF_MEMORY_BUDGET,
     CONF_LOG_LOCATION,
+    CONF_MONTHLY_QUOTA,
+    CONF_NODE_ID,
     CONF_NOTIFY,
     CONF_NOTIFY_EXCLUDE_ASN,
     CONF_NOTIFY_EXCLUDE_HOSTNAMES,
     CONF_PROVIDER,
+    CONF_PROVIDER_API_KEY,
+    CONF_PROVIDER_BATCH_URL,
+    CONF_PROVIDER_FIELDS,
+    CONF_PROVIDER_HEADERS,
+    CONF_PROVIDER_URL,
+    CONF_SHARED_DIR,
+    DEFAULT_BRUTE_FORCE_THRESHOLD,
+    DEFAULT_BRUTE_FORCE_WINDOW,
+    DEFAULT_GEO_MAX_AGE,
+    DEFAULT_IPV6_PREFIX,
     DOMAIN,
-    OUTFILE,
     STARTUP,
 )
-from .providers import PROVIDERS
+from .coordinator import async_get_coordinator, async_release_coordinator
+from .failed_logins import KIND_IP, KIND_USERNAME
+from .stats import PERIOD_DAY, PERIOD_WEEK
+from .providers import COMPUTED_FIELDS, PROVIDERS
 
 _LOGGER = logging.getLogger(__name__)
-SCAN_INTERVAL = timedelta(minutes=1)
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
         vol.Optional(CONF_PROVIDER, default="ipapi"): vol.In(list(PROVIDERS.keys())),
+        vol.Optional(CONF_PROVIDER_URL): cv.string,
+        vol.Optional(CONF_PROVIDER_BATCH_URL): cv.string,
+        vol.Optional(CONF_PROVIDER_API_KEY): cv.string,
+        vol.Optional(CONF_PROVIDER_HEADERS, default={}): {cv.string: cv.string},
+        vol.Optional(CONF_PROVIDER_FIELDS, default={}): {
+            vol.In(COMPUTED_FIELDS): cv.string
+        },
         vol.Optional(CONF_LOG_LOCATION, default=""): cv.string,
+        vol.Optional(CONF_DAILY_QUOTA): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        vol.Optional(CONF_MONTHLY_QUOTA): vol.All(vol.Coerce(int), vol.Range(min=0)),
         vol.Optional(CONF_NOTIFY, default=True): cv.boolean,
         vol.Optional(CONF_NOTIFY_EXCLUDE_ASN, default=[]): vol.All(
             cv.ensure_list, [cv.string]
@@ -48,59 +74,25 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
         vol.Optional(CONF_EXCLUDE_CLIENTS, default=[]): vol.All(
             cv.ensure_list, [cv.string]
         ),
+        vol.Optional(CONF_NODE_ID, default=""): cv.string,
+        vol.Optional(CONF_SHARED_DIR, default=""): cv.string,
+        vol.Optional(CONF_AGGREGATE, default=False): cv.boolean,
+        vol.Optional(CONF_BLOCKLIST_DIR, default=""): cv.string,
+        vol.Optional(CONF_BRUTE_FORCE_THRESHOLD, default=DEFAULT_BRUTE_FORCE_THRESHOLD): cv.positive_int,
+        vol.Optional(CONF_BRUTE_FORCE_WINDOW, default=DEFAULT_BRUTE_FORCE_WINDOW): cv.positive_int,
+        vol.Optional(CONF_GEO_MAX_AGE, default=DEFAULT_GEO_MAX_AGE): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_IPV6_PREFIX, default=DEFAULT_IPV6_PREFIX): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=128)
+        ),
+        vol.Optional(CONF_MEMORY_BUDGET): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
+        vol.Optional(CONF_DETECT_BLOCKING, default=False): cv.boolean,
     }
 )
 
-# ------------------------
-# Helper functions
-# ------------------------
-def humanize_time(timestring):
-    from datetime import datetime
-    return datetime.strptime(timestring[:19], "%Y-%m-%dT%H:%M:%S")
-
-
-def is_public(ip):
-    try:
-        ip_obj = ip_address(ip)
-        return not (ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_reserved)
-    except Exception:
-        return False
-
-
-def get_hostname(ip):
-    if ip.startswith("127.") or ip == "::1":
-        return "localhost"
-    with suppress(Exception):
-        hostname = socket.getfqdn(ip)
-        if hostname and hostname != ip:
-            return hostname
-    return "unknown"
-
-
-# ------------------------
-# Async File I/O
-# ------------------------
-async def async_get_outfile_content(hass, file):
-    import yaml
-
-    def _read():
-        if not os.path.exists(file):
-            return {}
-        with open(file) as f:
-            return yaml.safe_load(f) or {}
-
-    return await hass.async_add_executor_job(_read)
-
-
-async def async_write_outfile(hass, file, data):
-    import yaml
-
-    def _write():
-        with open(file, "w") as f:
-            yaml.dump(data, f, default_flow_style=False, explicit_start=True)
-
-    await hass.async_add_executor_job(_write)
-
 
 # ------------------------
 # Config entry setup
@@ -113,35 +105,18 @@ async def async_setup_entry(
     """Set up the Authenticated sensor from a config entry."""
     _LOGGER.info(STARTUP)
 
-    data = entry.data
-    notify = data.get(CONF_NOTIFY, True)
-    notify_exclude_asn = data.get(CONF_NOTIFY_EXCLUDE_ASN, [])
-    notify_exclude_hostnames = data.get(CONF_NOTIFY_EXCLUDE_HOSTNAMES, [])
-    exclude = data.get(CONF_EXCLUDE, [])
-    exclude_clients = data.get(CONF_EXCLUDE_CLIENTS, [])
-    provider = data.get(CONF_PROVIDER, "ipapi")
-
-    hass.data.setdefault("authenticated_ips", {})
-    out_file = hass.config.path(OUTFILE)
-
-    sensor = AuthenticatedSensor(
-        hass,
-        notify,
-        out_file,
-        exclude,
-        exclude_clients,
-        notify_exclude_asn,
-        notify_exclude_hostnames,
-        provider,
-        entry.entry_id,
-    )
-
-    await sensor.async_initial_run()
-    async_add_entities([sensor], True)
-
-    hass.bus.async_listen(
-        "homeassistant_auth",
-        lambda event: hass.async_create_task(sensor.async_handle_auth_event(event)),
+    # The coordinator refreshes in the background, so the entity is
+    # registered straight away with its restored state.
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    async_add_entities(
+        [
+            AuthenticatedSensor(coordinator, entry.entry_id),
+            FailedLoginsSensor(coordinator, entry.entry_id),
+            BruteForceSensor(coordinator, entry.entry_id),
+            LoginStatsSensor(coordinator, PERIOD_DAY, entry.entry_id),
+            LoginStatsSensor(coordinator, PERIOD_WEEK, entry.entry_id),
+            QuotaSensor(coordinator, entry.entry_id),
+        ]
     )
 
 
@@ -152,310 +127,266 @@ async def async_setup_platform(hass: HomeAssistant, config, async_add_entities,
     """Set up the Authenticated sensor from YAML (legacy)."""
     _LOGGER.info(STARTUP)
 
-    notify = config.get(CONF_NOTIFY)
-    notify_exclude_asn = config.get(CONF_NOTIFY_EXCLUDE_ASN)
-    notify_exclude_hostnames = config.get(CONF_NOTIFY_EXCLUDE_HOSTNAMES)
-    exclude = config.get(CONF_EXCLUDE)
-    exclude_clients = config.get(CONF_EXCLUDE_CLIENTS)
-    provider = config.get(CONF_PROVIDER)
-
-    hass.data.setdefault("authenticated_ips", {})
-    out_file = hass.config.path(OUTFILE)
-
-    sensor = AuthenticatedSensor(
-        hass,
-        notify,
-        out_file,
-        exclude,
-        exclude_clients,
-        notify_exclude_asn,
-        notify_exclude_hostnames,
-        provider,
-    )
-
-    await sensor.async_initial_run()
-    async_add_entities([sensor], True)
-
-    hass.bus.async_listen(
-        "homeassistant_auth",
-        lambda event: hass.async_create_task(sensor.async_handle_auth_event(event)),
+    coordinator = async_get_coordinator(hass, config, "yaml")
+    async_add_entities(
+        [
+            AuthenticatedSensor(coordinator, release_on_remove=True),
+            FailedLoginsSensor(coordinator),
+            BruteForceSensor(coordinator),
+            LoginStatsSensor(coordinator, PERIOD_DAY),
+            LoginStatsSensor(coordinator, PERIOD_WEEK),
+            QuotaSensor(coordinator),
+        ]
     )
 
 
 # ------------------------
 # Sensor Entity
 # ------------------------
-class AuthenticatedSensor(SensorEntity):
+class AuthenticatedSensor(RestoreEntity, SensorEntity):
     _attr_icon = "mdi:lock-alert"
     _attr_has_entity_name = True
     _attr_name = "Last successful authentication"
+    _attr_should_poll = False
+    # A full copy on every login adds up in the recorder; login counts are
+    # kept as long-term statistics instead.
+    _unrecorded_attributes = frozenset(
+        {
+            "hostname",
+            "country",
+            "country_code",
+            "region",
+            "city",
+            "asn",
+            "org",
+            "latitude",
+            "longitude",
+            "timezone",
+            "currency",
+            "languages",
+            "postal",
+            "flags",
+            "addresses",
+            "username",
+            "new_ip",
+            "last_authenticated_time",
+            "previous_authenticated_time",
+        }
+    )
 
-    def __init__(
-        self,
-        hass,
-        notify,
-        out,
-        exclude,
-        exclude_clients,
-        notify_exclude_asn,
-        notify_exclude_hostnames,
-        provider,
-        entry_id=None,
-    ):
-        self.hass = hass
-        self.provider = provider
-        self.stored = {}
-        self.last_ip = None
-        self.exclude = exclude
-        self.exclude_clients = exclude_clients
-        self.notify = notify
-        self.notify_exclude_asn = notify_exclude_asn
-        self.notify_exclude_hostnames = notify_exclude_hostnames
-        self.out = out
+    def __init__(self, coordinator, entry_id=None, release_on_remove=False):
+        self.coordinator = coordinator
+        self._release_on_remove = release_on_remove
         self._attr_native_value = None
         self._attr_unique_id = f"{DOMAIN}_last_auth_{entry_id or 'yaml'}"
-        self.all_users = {}
+        self._restored_attributes = None
+
+    async def async_will_remove_from_hass(self):
+        """Release the coordinator held by the legacy YAML platform."""
+        if self._release_on_remove:
+            await async_release_coordinator(self.hass, "yaml")
+        await super().async_will_remove_from_hass()
+
+    async def async_added_to_hass(self):
+        """Subscribe to the coordinator and restore the last known login."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_listener(self._handle_coordinator_update)
+        )
+        if self.coordinator.last_ip is not None:
+            self._handle_coordinator_update()
+            return
+        last_state = await self.async_get_last_state()
+        if last_state is None or last_state.state in (STATE_UNKNOWN, STATE_UNAVAILABLE):
+            return
+        self._attr_native_value = last_state.state
+        self._restored_attributes = dict(last_state.attributes)
+
+    @callback
+    def _handle_coordinator_update(self):
+        last_ip = self.coordinator.last_ip
+        if last_ip is not None:
+            self._attr_native_value = last_ip.address
+        if self.entity_id is not None:
+            self.async_write_ha_state()
 
-    async def async_initial_run(self):
-        self.all_users, tokens = await async_load_authentications(
-            self.hass, ".storage/auth", self.exclude, self.exclude_clients
+    @property
+    def extra_state_attributes(self):
+        last_ip = self.coordinator.last_ip
+        if last_ip is None:
+            return self._restored_attributes
+        return {
+            "hostname": last_ip.hostname,
+            "country": last_ip.country,
+            "country_code": last_ip.country_code,
+            "region": last_ip.region,
+            "city": last_ip.city,
+            "asn": last_ip.asn,
+            "org": last_ip.org,
+            "latitude": last_ip.latitude,
+            "longitude": last_ip.longitude,
+            "timezone": last_ip.timezone,
+            "currency": last_ip.currency,
+            "languages": last_ip.languages,
+            "postal": last_ip.postal,
+            "flags": last_ip.flags,
+            "addresses": last_ip.addresses,
+            "username": last_ip.username,
+            "new_ip": last_ip.new_ip,
+            "last_authenticated_time": last_ip.last_used_at,
+            "previous_authenticated_time": last_ip.prev_used_at,
+        }
+
+
+class FailedLoginsSensor(SensorEntity):
+    """Failed login attempts within the brute-force window."""
+
+    _attr_icon = "mdi:lock-remove"
+    _attr_has_entity_name = True
+    _attr_name = "Failed logins"
+    _attr_native_unit_of_measurement = "attempts"
+    _attr_should_poll = False
+
+    def __init__(self, coordinator, entry_id=None):
+        self.coordinator = coordinator
+        self._attr_native_value = 0
+        self._attr_unique_id = f"{DOMAIN}_failed_logins_{entry_id or 'yaml'}"
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_listener(self._handle_coordinator_update)
         )
+        self._handle_coordinator_update()
 
-        self.stored = await async_get_outfile_content(self.hass, self.out)
-
-        for ip, attrs in tokens.items():
-            if not is_public(ip):
-                continue
-            access_data = AuthenticatedData(ip, attrs)
-            ipdata = IPData(access_data, self.all_users, self.provider, new=False)
-            if ip not in self.stored:
-                await self.hass.async_add_executor_job(ipdata.lookup)
-            self.hass.data["authenticated_ips"][ip] = ipdata
-
-        await self.async_write_to_file()
-
-        if self.hass.data["authenticated_ips"]:
-            last_ip = max(
-                self.hass.data["authenticated_ips"].values(),
-                key=lambda x: x.last_used_at or "",
-            )
-            self.last_ip = last_ip
-            self._attr_native_value = last_ip.ip_address
-
-    async def async_handle_auth_event(self, event):
-        data = event.data
-        ip = data.get("ip_address")
-        user_id = data.get("user_id")
-        if not ip or not is_public(ip):
-            return
+    @callback
+    def _handle_coordinator_update(self):
+        self._attr_native_value = self.coordinator.failed_logins.attempts()
+        if self.entity_id is not None:
+            self.async_write_ha_state()
 
-        now_iso = dt_util.utcnow().isoformat()
-
-        if ip in self.hass.data["authenticated_ips"]:
-            ipdata = self.hass.data["authenticated_ips"][ip]
-            ipdata.prev_used_at = ipdata.last_used_at
-            ipdata.last_used_at = now_iso
-        else:
-            access_data = AuthenticatedData(
-                ip,
-                {
-                    "user_id": user_id,
-                    "last_used_at": now_iso,
-                    "prev_used_at": None,
-                },
-            )
-            ipdata = IPData(access_data, self.all_users, self.provider)
-            await self.hass.async_add_executor_job(ipdata.lookup)
-            self.hass.data["authenticated_ips"][ip] = ipdata
-
-        ipdata.hostname = await self.hass.async_add_executor_job(get_hostname, ip)
-        self.last_ip = ipdata
-        self._attr_native_value = ipdata.ip_address
-
-        if self.notify:
-            if ipdata.asn not in (self.notify_exclude_asn or []) and ipdata.hostname not in (self.notify_exclude_hostnames or []):
-                ipdata.notify(self.hass)
-            ipdata.new_ip = False
-
-        await self.async_write_to_file()
-        self.async_write_ha_state()
-
-    async def async_update(self):
-        await self.async_initial_run()
+    @property
+    def extra_state_attributes(self):
+        tracker = self.coordinator.failed_logins
+        return {
+            "window": tracker.window,
+            "top_ips": tracker.top(KIND_IP),
+            "top_usernames": tracker.top(KIND_USERNAME),
+        }
+
+
+class BruteForceSensor(FailedLoginsSensor):
+    """Number of IPs and usernames currently over the brute-force threshold."""
+
+    _attr_icon = "mdi:shield-alert"
+    _attr_name = "Brute force suspects"
+    _attr_native_unit_of_measurement = None
+
+    def __init__(self, coordinator, entry_id=None):
+        super().__init__(coordinator, entry_id)
+        self._attr_unique_id = f"{DOMAIN}_brute_force_{entry_id or 'yaml'}"
+
+    @callback
+    def _handle_coordinator_update(self):
+        tracker = self.coordinator.failed_logins
+        self._attr_native_value = sum(len(keys) for keys in tracker.flagged.values())
+        if self.entity_id is not None:
+            self.async_write_ha_state()
 
     @property
     def extra_state_attributes(self):
-        if self.last_ip is None:
+        tracker = self.coordinator.failed_logins
+        return {
+            "threshold": tracker.threshold,
+            "window": tracker.window,
+            "ips": tracker.suspects(KIND_IP),
+            "usernames": tracker.suspects(KIND_USERNAME),
+            "banned_ips": sorted(tracker.banned),
+        }
+
+
+class LoginStatsSensor(SensorEntity):
+    """Successful logins over the last day or week, broken down for dashboards."""
+
+    _attr_icon = "mdi:chart-bar"
+    _attr_has_entity_name = True
+    _attr_native_unit_of_measurement = "logins"
+    _attr_should_poll = False
+
+    NAMES = {PERIOD_DAY: "Logins last 24 hours", PERIOD_WEEK: "Logins last 7 days"}
+    TOP = 10
+
+    def __init__(self, coordinator, period, entry_id=None):
+        self.coordinator = coordinator
+        self.period = period
+        self._stats = None
+        self._attr_name = self.NAMES[period]
+        self._attr_unique_id = f"{DOMAIN}_logins_{period}_{entry_id or 'yaml'}"
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_listener(self._handle_coordinator_update)
+        )
+        self._handle_coordinator_update()
+
+    @callback
+    def _handle_coordinator_update(self):
+        self._stats = self.coordinator.stats.query(self.period, limit=self.TOP)
+        self._attr_native_value = self._stats["logins"]
+        if self.entity_id is not None:
+            self.async_write_ha_state()
+
+    @property
+    def extra_state_attributes(self):
+        if self._stats is None:
             return None
         return {
-            "hostname": self.last_ip.hostname,
-            "country": self.last_ip.country,
-            "country_code": self.last_ip.country_code,
-            "region": self.last_ip.region,
-            "city": self.last_ip.city,
-            "asn": self.last_ip.asn,
-            "org": self.last_ip.org,
-            "latitude": self.last_ip.latitude,
-            "longitude": self.last_ip.longitude,
-            "timezone": self.last_ip.timezone,
-            "currency": self.last_ip.currency,
-            "languages": self.last_ip.languages,
-            "postal": self.last_ip.postal,
-            "username": self.last_ip.username,
-            "new_ip": self.last_ip.new_ip,
-            "last_authenticated_time": self.last_ip.last_used_at,
-            "previous_authenticated_time": self.last_ip.prev_used_at,
+            "countries": self._stats["countries"],
+            "asns": self._stats["asns"],
+            "users": self._stats["users"],
+            "distinct_asns_per_user": self._stats["distinct_asns_per_user"],
         }
 
-    async def async_write_to_file(self):
-        info = await async_get_outfile_content(self.hass, self.out)
-        for ip, data in self.hass.data["authenticated_ips"].items():
-            info[ip] = {
-                "user_id": data.user_id,
-                "username": data.username,
-                "last_used_at": data.last_used_at,
-                "prev_used_at": data.prev_used_at,
-                "country": data.country,
-                "country_code": data.country_code,
-                "region": data.region,
-                "city": data.city,
-                "asn": data.asn,
-                "org": data.org,
-                "latitude": data.latitude,
-                "longitude": data.longitude,
-                "timezone": data.timezone,
-                "currency": data.currency,
-                "languages": data.languages,
-                "postal": data.postal,
-                "hostname": data.hostname,
-            }
-        await async_write_outfile(self.hass, self.out, info)
 
+class QuotaSensor(SensorEntity):
+    """Geo lookups left before the provider's daily or monthly quota runs out."""
 
-# ------------------------
-# Auth / IPData classes
-# ------------------------
-async def async_load_authentications(hass, authfile_path, exclude, exclude_clients):
-    import json
-
-    file_path = hass.config.path(authfile_path)
-    if not os.path.exists(file_path):
-        _LOGGER.critical("Auth file missing: %s", file_path)
-        return {}, {}
-
-    def _load_file():
-        with open(file_path) as f:
-            return json.load(f)
-
-    auth = await hass.async_add_executor_job(_load_file)
-
-    users = {u["id"]: u["name"] for u in auth["data"]["users"]}
-    tokens_cleaned = {}
-    for t in auth["data"]["refresh_tokens"]:
-        try:
-            ip = t.get("last_used_ip")
-            if ip is None or not is_public(ip):
-                continue
-            if any(ip_address(ip) in ip_network(net, strict=False) for net in exclude):
-                continue
-            if t.get("client_id") in exclude_clients:
-                continue
-            if ip in tokens_cleaned:
-                if t["last_used_at"] > tokens_cleaned[ip]["last_used_at"]:
-                    tokens_cleaned[ip]["last_used_at"] = t["last_used_at"]
-                    tokens_cleaned[ip]["user_id"] = t["user_id"]
-            else:
-                tokens_cleaned[ip] = {"last_used_at": t["last_used_at"], "user_id": t["user_id"]}
-        except Exception:
-            continue
-    return users, tokens_cleaned
-
-
-class AuthenticatedData:
-    def __init__(self, ipaddr, attributes):
-        self.ipaddr = ipaddr
-        self.attributes = attributes
-        self.last_access = attributes.get("last_used_at")
-        self.prev_access = attributes.get("prev_used_at")
-        self.country = attributes.get("country")
-        self.country_code = attributes.get("country_code")
-        self.region = attributes.get("region")
-        self.city = attributes.get("city")
-        self.asn = attributes.get("asn")
-        self.org = attributes.get("org")
-        self.latitude = attributes.get("latitude")
-        self.longitude = attributes.get("longitude")
-        self.timezone = attributes.get("timezone")
-        self.currency = attributes.get("currency")
-        self.languages = attributes.get("languages")
-        self.postal = attributes.get("postal")
-        self.user_id = attributes.get("user_id")
-        self.hostname = attributes.get("hostname")
-
-
-class IPData:
-    def __init__(self, access_data, users, provider, new=True):
-        self.all_users = users
-        self.provider = provider
-        self.ip_address = access_data.ipaddr
-        self.last_used_at = access_data.last_access
-        self.prev_used_at = access_data.prev_access
-        self.user_id = access_data.user_id
-        self.hostname = access_data.hostname
-        self.country = access_data.country
-        self.country_code = access_data.country_code
-        self.region = access_data.region
-        self.city = access_data.city
-        self.asn = access_data.asn
-        self.org = access_data.org
-        self.latitude = access_data.latitude
-        self.longitude = access_data.longitude
-        self.timezone = access_data.timezone
-        self.currency = access_data.currency
-        self.languages = access_data.languages
-        self.postal = access_data.postal
-        self.new_ip = new
+    _attr_icon = "mdi:counter"
+    _attr_has_entity_name = True
+    _attr_name = "Geo lookup quota remaining"
+    _attr_native_unit_of_measurement = "requests"
+    _attr_should_poll = False
+
+    def __init__(self, coordinator, entry_id=None):
+        self.coordinator = coordinator
+        self._quota = None
+        self._attr_unique_id = f"{DOMAIN}_quota_{entry_id or 'yaml'}"
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_listener(self._handle_coordinator_update)
+        )
+        self._handle_coordinator_update()
+
+    @callback
+    def _handle_coordinator_update(self):
+        self._quota = self.coordinator.quota.state(self.coordinator.provider)
+        remaining = [
+            period["remaining"] for period in self._quota.values() if period["remaining"] is not None
+        ]
+        # Unlimited providers have no remaining count to report.
+        self._attr_native_value = min(remaining) if remaining else None
+        if self.entity_id is not None:
+            self.async_write_ha_state()
 
     @property
-    def username(self):
-        return self.all_users.get(self.user_id, "Unknown") if self.user_id else "Unknown"
-
-    def lookup(self):
-        geo = PROVIDERS[self.provider](self.ip_address)
-        geo.update_geo_info()
-        if geo.computed_result:
-            self.country = geo.computed_result.get("country")
-            self.country_code = geo.computed_result.get("country_code")
-            self.region = geo.computed_result.get("region")
-            self.city = geo.computed_result.get("city")
-            self.asn = geo.computed_result.get("asn")
-            self.org = geo.computed_result.get("org")
-            self.latitude = geo.computed_result.get("latitude")
-            self.longitude = geo.computed_result.get("longitude")
-            self.timezone = geo.computed_result.get("timezone")
-            self.currency = geo.computed_result.get("currency")
-            self.languages = geo.computed_result.get("languages")
-            self.postal = geo.computed_result.get("postal")
-
-    def notify(self, hass):
-        message = f"**IP Address:** {self.ip_address}\n**Username:** {self.username}\n"
-        for val, name in [
-            (self.country, "Country"),
-            (self.country_code, "Country Code"),
-            (self.region, "Region"),
-            (self.city, "City"),
-            (self.asn, "ASN"),
-            (self.org, "Organisation"),
-            (self.latitude, "Latitude"),
-            (self.longitude, "Longitude"),
-            (self.timezone, "Timezone"),
-            (self.currency, "Currency"),
-            (self.languages, "Languages"),
-            (self.postal, "Postal"),
-            (self.hostname, "Hostname"),
-        ]:
-            if val:
-                message += f"**{name}:** {val}\n"
-        if self.last_used_at:
-            message += f"**Login time:** {self.last_used_at[:19].replace('T', ' ')}\n"
-        async_create(hass, message, title="New successful login", notification_id=self.ip_address)
+    def extra_state_attributes(self):
+        if self._quota is None:
+            return None
+        attributes = {"provider": self.coordinator.provider}
+        for period, values in self._quota.items():
+            for name, value in values.items():
+                attributes[f"{period}_{name}"] = value
+        return attributes
@@ -0,0 +1,214 @@
+"""JSON and YAML codecs for the auth file, the outfile and the history journal.
+
+The fastest implementation available is picked once at import: ``orjson``
+for JSON and PyYAML's libyaml bindings for YAML, falling back to the
+standard library and pure-Python PyYAML. Every codec produces the same
+data: JSON is written compact with non-ASCII characters kept as UTF-8, and
+YAML is loaded and dumped with the safe loader and dumper in either case.
+"""
+
+import json
+import logging
+import math
+import re
+from json.encoder import encode_basestring
+
+import yaml
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class JsonCodec:
+    """A JSON implementation; ``dumps`` returns compact UTF-8 bytes."""
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def load_file(self, path):
+        with open(path, "rb") as f:
+            return self.loads(f.read())
+
+
+class YamlCodec:
+    """A YAML implementation built on a safe loader and dumper pair."""
+
+    def __init__(self, name, loader, dumper):
+        self.name = name
+        self.loader = loader
+        self.dumper = dumper
+
+    def load(self, stream):
+        return yaml.load(stream, Loader=self.loader)
+
+    def dump(self, data, stream=None, explicit_start=True):
+        return yaml.dump(
+            data,
+            stream,
+            Dumper=self.dumper,
+            default_flow_style=False,
+            explicit_start=explicit_start,
+        )
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+JSON_CODECS = {"json": JsonCodec("json", json.loads, _stdlib_dumps)}
+
+try:
+    import orjson
+except ImportError:
+    pass
+else:
+
+    def _orjson_loads(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # The stdlib also accepts NaN and Infinity; keep its behaviour.
+            return json.loads(data)
+
+    def _orjson_dumps(obj):
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # Non-string keys and integers beyond 64 bits.
+            return _stdlib_dumps(obj)
+
+    JSON_CODECS["orjson"] = JsonCodec("orjson", _orjson_loads, _orjson_dumps)
+
+YAML_CODECS = {"python": YamlCodec("python", yaml.SafeLoader, yaml.SafeDumper)}
+
+if getattr(yaml, "__with_libyaml__", False):
+    YAML_CODECS["libyaml"] = YamlCodec("libyaml", yaml.CSafeLoader, yaml.CSafeDumper)
+
+JSON = JSON_CODECS.get("orjson") or JSON_CODECS["json"]
+YAML = YAML_CODECS.get("libyaml") or YAML_CODECS["python"]
+
+_LOGGER.debug("Using %s for JSON and %s for YAML", JSON.name, YAML.name)
+
+
+def json_loads(data):
+    """Parse JSON from ``str`` or ``bytes``."""
+    return JSON.loads(data)
+
+
+def json_dumps(obj):
+    """Serialize ``obj`` to compact JSON bytes."""
+    return JSON.dumps(obj)
+
+
+def load_json_file(path):
+    """Read and parse the JSON file at ``path``."""
+    return JSON.load_file(path)
+
+
+def yaml_load_chunks(stream, size=200):
+    """Yield a block-style YAML mapping from a text stream, ``size`` keys at a time.
+
+    The parsers build a node for everything in a document before
+    constructing any of it, so one mapping parsed whole peaks at many times
+    its final size. Every top-level key written by the dumpers and by
+    :func:`yaml_record` starts a line with everything under it indented or
+    behind ``- ``, so the document is split there instead.
+    """
+    lines = []
+    keys = 0
+    for line in stream:
+        if line[:1] not in _NESTED_LINE and not line.startswith(("---", "...")):
+            if keys == size:
+                yield YAML.load("".join(lines)) or {}
+                lines = []
+                keys = 0
+            keys += 1
+        lines.append(line)
+    if lines:
+        yield YAML.load("".join(lines)) or {}
+
+
+def yaml_dump(data, stream=None, explicit_start=True):
+    """Write ``data`` as block-style YAML, returning a string if no stream is given."""
+    return YAML.dump(data, stream, explicit_start=explicit_start)
+
+
+# Characters a double-quoted YAML scalar cannot hold as they are; strings
+# containing one are left to the YAML dumper, which escapes them.
+_YAML_UNSAFE = re.compile("[\x7f-\x9f\u2028\u2029\ud800-\udfff\ufeff\ufffe\uffff]")
+_PLAIN_KEY = re.compile(r"[a-z_][a-z0-9_]*\Z")
+# Plain words YAML 1.1 reads as booleans or null.
+_RESERVED_WORDS = frozenset({"y", "n", "yes", "no", "on", "off", "true", "false", "null"})
+_field_keys = {}
+_NESTED_LINE = frozenset({"", " ", "\t", "\r", "\n", "-", "#"})
+
+
+class _Unrenderable(Exception):
+    """A value :func:`yaml_record` leaves to the YAML dumper."""
+
+
+def _yaml_string(value):
+    if _YAML_UNSAFE.search(value):
+        raise _Unrenderable
+    return encode_basestring(value)
+
+
+def _yaml_scalar(value):
+    if isinstance(value, str):
+        return _yaml_string(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if type(value) is int:
+        return str(value)
+    if type(value) is float:
+        if math.isnan(value):
+            return ".nan"
+        if math.isinf(value):
+            return ".inf" if value > 0 else "-.inf"
+        text = repr(value)
+        mantissa, _, exponent = text.partition("e")
+        if exponent and "." not in mantissa:
+            # YAML 1.1 only reads exponents after a decimal point as floats.
+            text = f"{mantissa}.0e{exponent}"
+        return text
+    raise _Unrenderable
+
+
+def _yaml_field_key(key):
+    rendered = _field_keys.get(key)
+    if rendered is None:
+        if not isinstance(key, str):
+            raise _Unrenderable
+        plain = _PLAIN_KEY.match(key) and key not in _RESERVED_WORDS
+        rendered = _field_keys[key] = key if plain else _yaml_string(key)
+    return rendered
+
+
+def _yaml_value(value):
+    if isinstance(value, list):
+        return f"[{', '.join(_yaml_scalar(item) for item in value)}]"
+    return _yaml_scalar(value)
+
+
+def yaml_record(key, record):
+    """Render ``{key: record}`` as a block YAML fragment, without a header.
+
+    Flat records are rendered directly, which is an order of magnitude
+    faster than the dumpers; anything else goes through the YAML codec.
+    Fragments for distinct keys can be concatenated into one document.
+    """
+    try:
+        if not isinstance(record, dict) or not record:
+            raise _Unrenderable
+        lines = [f"{_yaml_string(key)}:"]
+        for field in sorted(record):
+            lines.append(f"  {_yaml_field_key(field)}: {_yaml_value(record[field])}")
+    except (_Unrenderable, TypeError):
+        return YAML.dump({key: record}, explicit_start=False)
+    lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+"""Services for the authenticated integration."""
+
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+from homeassistant.core import SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.service import async_register_admin_service
+
+from .blocking import guarded
+from .const import (
+    ATTR_DATASET,
+    ATTR_DURATION,
+    ATTR_FORMAT,
+    ATTR_LIMIT,
+    ATTR_MEMORY,
+    ATTR_MODE,
+    ATTR_PATH,
+    ATTR_PERIOD,
+    DATA_COORDINATOR,
+    DOMAIN,
+    SERVICE_EXPORT,
+    SERVICE_PROFILE,
+    SERVICE_STATS,
+)
+from .export import (
+    DATASET_HISTORY,
+    DATASET_NODES,
+    DATASET_RECORDS,
+    FORMAT_AUTO,
+    FORMATS,
+    async_export,
+)
+from .profiling import MODE_SAMPLE, MODES, async_profile
+from .stats import PERIOD_DAY, PERIODS
+
+EXPORT_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DATASET, default=DATASET_RECORDS): vol.In(
+            [DATASET_RECORDS, DATASET_HISTORY, DATASET_NODES]
+        ),
+        vol.Optional(ATTR_FORMAT, default=FORMAT_AUTO): vol.In(FORMATS),
+        vol.Optional(ATTR_PATH): cv.string,
+    }
+)
+
+STATS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_PERIOD, default=PERIOD_DAY): vol.In(list(PERIODS)),
+        vol.Optional(ATTR_LIMIT): cv.positive_int,
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        ),
+        vol.Optional(ATTR_MODE, default=MODE_SAMPLE): vol.In(MODES),
+        vol.Optional(ATTR_MEMORY, default=True): cv.boolean,
+    }
+)
+
+
+def _get_coordinator(hass):
+    coordinator = hass.data.get(DATA_COORDINATOR)
+    if coordinator is None:
+        raise HomeAssistantError("Authenticated is not set up")
+    return coordinator
+
+
+def async_setup_services(hass):
+    """Register the integration's services."""
+
+    @guarded
+    async def _async_export(call):
+        coordinator = _get_coordinator(hass)
+        path = call.data.get(ATTR_PATH)
+        if path is not None and not hass.config.is_allowed_path(path):
+            raise HomeAssistantError(f"Cannot write to {path}, path is not allowed")
+        aggregator = coordinator.aggregator
+        return await async_export(
+            hass,
+            call.data[ATTR_DATASET],
+            call.data[ATTR_FORMAT],
+            path,
+            coordinator.all_records,
+            coordinator.history_file,
+            aggregator.merged_rows() if aggregator and aggregator.aggregate else None,
+        )
+
+    # Export and profile write files to the config directory, and profile
+    # turns on tracing for the whole process.
+    async_register_admin_service(
+        hass,
+        DOMAIN,
+        SERVICE_EXPORT,
+        _async_export,
+        schema=EXPORT_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    @guarded
+    async def _async_stats(call):
+        coordinator = _get_coordinator(hass)
+        return coordinator.stats.query(call.data[ATTR_PERIOD], limit=call.data.get(ATTR_LIMIT))
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_STATS,
+        _async_stats,
+        schema=STATS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_profile(call):
+        return await async_profile(
+            hass, call.data[ATTR_DURATION], call.data[ATTR_MODE], call.data[ATTR_MEMORY]
+        )
+
+    async_register_admin_service(
+        hass,
+        DOMAIN,
+        SERVICE_PROFILE,
+        _async_profile,
+        schema=PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,221 @@
+"""Login counts by country, ASN and user in hourly and daily buckets.
+
+Every ingested login increments one hourly and one daily bucket, so a
+query merges at most a few dozen buckets instead of walking every record.
+Buckets are persisted through a ``Store`` and seeded from the login history
+journal the first time the integration runs with this feature.
+"""
+
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .export import iter_history
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.stats"
+SAVE_DELAY = 30
+
+HOUR = 3600
+DAY = 86400
+HOURS_KEPT = 48
+DAYS_KEPT = 31
+
+PERIOD_HOUR = "hour"
+PERIOD_DAY = "day"
+PERIOD_WEEK = "week"
+PERIOD_MONTH = "month"
+
+# period -> (bucket width, number of buckets)
+PERIODS = {
+    PERIOD_HOUR: (HOUR, 1),
+    PERIOD_DAY: (HOUR, 24),
+    PERIOD_WEEK: (DAY, 7),
+    PERIOD_MONTH: (DAY, 30),
+}
+
+UNKNOWN = "Unknown"
+
+
+class StatsBucket:
+    """Counters for one hour or day."""
+
+    __slots__ = ("logins", "countries", "asns", "users", "user_asns")
+
+    def __init__(self):
+        self.logins = 0
+        self.countries = Counter()
+        self.asns = Counter()
+        self.users = Counter()
+        self.user_asns = {}
+
+    def add(self, country, asn, user):
+        self.logins += 1
+        self.countries[country] += 1
+        self.asns[asn] += 1
+        self.users[user] += 1
+        self.user_asns.setdefault(user, set()).add(asn)
+
+    def as_dict(self):
+        return {
+            "logins": self.logins,
+            "countries": dict(self.countries),
+            "asns": dict(self.asns),
+            "users": dict(self.users),
+            "user_asns": {user: sorted(asns) for user, asns in self.user_asns.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bucket = cls()
+        bucket.logins = data.get("logins", 0)
+        bucket.countries.update(data.get("countries", {}))
+        bucket.asns.update(data.get("asns", {}))
+        bucket.users.update(data.get("users", {}))
+        bucket.user_asns = {user: set(asns) for user, asns in data.get("user_asns", {}).items()}
+        return bucket
+
+
+def to_timestamp(value):
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+class LoginStats:
+    """Hourly and daily login aggregates, maintained incrementally."""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.tables = {HOUR: {}, DAY: {}}
+        self.loaded = False
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._early = []
+
+    async def async_load(self, history_file):
+        """Load buckets from storage, or seed them from the history journal.
+
+        Logins recorded before loading finished are added on top.
+        """
+        if self.loaded:
+            return
+        data = await self._store.async_load()
+        count = 0
+        seeded_until = None
+        if data is not None:
+            tables = {
+                width: {
+                    int(index): StatsBucket.from_dict(bucket)
+                    for index, bucket in data.get(key, {}).items()
+                }
+                for width, key in ((HOUR, "hours"), (DAY, "days"))
+            }
+        else:
+            tables, count, seeded_until = await self.hass.async_add_executor_job(
+                self._seed, history_file
+            )
+            if count:
+                _LOGGER.debug("Seeded login statistics from %s history rows", count)
+        for entry in self._early:
+            # The seed already counted the logins it read from the journal.
+            if seeded_until is None or entry[0] > seeded_until:
+                self._add(*entry, tables=tables)
+        self.tables = tables
+        self.loaded = True
+        if count or self._early:
+            self._async_schedule_save()
+        self._early = []
+
+    def _seed(self, history_file):
+        """Return buckets built from the journal, the row count and the last timestamp."""
+        cutoff = time.time() - DAYS_KEPT * DAY
+        tables = {HOUR: {}, DAY: {}}
+        count = 0
+        latest = None
+        for row in iter_history(history_file):
+            try:
+                timestamp = to_timestamp(row["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            latest = timestamp if latest is None else max(latest, timestamp)
+            if timestamp < cutoff:
+                continue
+            self._add(
+                timestamp, row.get("country"), row.get("asn"), row.get("username"), tables
+            )
+            count += 1
+        return tables, count, latest
+
+    def _data_to_save(self):
+        return {
+            "hours": {index: b.as_dict() for index, b in self.tables[HOUR].items()},
+            "days": {index: b.as_dict() for index, b in self.tables[DAY].items()},
+        }
+
+    def _async_schedule_save(self):
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_save(self):
+        """Write pending changes now instead of after the save delay."""
+        if self.loaded:
+            await self._store.async_save(self._data_to_save())
+
+    def _add(self, timestamp, country, asn, user, tables=None):
+        country, asn, user = country or UNKNOWN, asn or UNKNOWN, user or UNKNOWN
+        tables = self.tables if tables is None else tables
+        for width, kept in ((HOUR, HOURS_KEPT), (DAY, DAYS_KEPT)):
+            table = tables[width]
+            index = int(timestamp // width)
+            bucket = table.get(index)
+            if bucket is None:
+                bucket = table[index] = StatsBucket()
+                for old in [i for i in table if i <= index - kept]:
+                    del table[old]
+            bucket.add(country, asn, user)
+
+    def record(self, timestamp, country, asn, user):
+        """Count one login at ``timestamp`` (epoch, datetime or ISO string)."""
+        entry = (to_timestamp(timestamp), country, asn, user)
+        self._add(*entry)
+        if self.loaded:
+            self._async_schedule_save()
+        else:
+            # Saving before the stored buckets are merged in would overwrite them.
+            self._early.append(entry)
+
+    def query(self, period=PERIOD_DAY, now=None, limit=None):
+        """Return the rollup of the buckets covering ``period`` up to ``now``."""
+        width, count = PERIODS[period]
+        now = time.time() if now is None else to_timestamp(now)
+        current = int(now // width)
+        table = self.tables[width]
+        total = StatsBucket()
+        for index in range(current - count + 1, current + 1):
+            bucket = table.get(index)
+            if bucket is None:
+                continue
+            total.logins += bucket.logins
+            total.countries.update(bucket.countries)
+            total.asns.update(bucket.asns)
+            total.users.update(bucket.users)
+            for user, asns in bucket.user_asns.items():
+                total.user_asns.setdefault(user, set()).update(asns)
+        return {
+            "period": period,
+            "start": datetime.fromtimestamp((current - count + 1) * width, timezone.utc).isoformat(),
+            "logins": total.logins,
+            "countries": dict(total.countries.most_common(limit)),
+            "asns": dict(total.asns.most_common(limit)),
+            "users": dict(total.users.most_common(limit)),
+            "distinct_asns_per_user": {
+                user: len(asns) for user, asns in sorted(total.user_asns.items())
+            },
+        }
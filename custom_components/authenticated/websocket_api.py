@@ -0,0 +1,248 @@
+"""Websocket commands for browsing logins from the frontend.
+
+``authenticated/logins/subscribe`` streams every enriched login as it
+happens. ``authenticated/ips/list`` and ``authenticated/history/list`` page
+through the tracked IPs and the login history with an opaque cursor, so a
+card can browse a large history one page at a time. Filtering happens on
+the server, and each page only serializes the rows it returns.
+"""
+
+import base64
+import heapq
+import json
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+import homeassistant.helpers.config_validation as cv
+from homeassistant.core import callback
+from homeassistant.util import dt as dt_util
+
+from .blocking import guarded
+from .const import DATA_COORDINATOR
+from .export import iter_history_reverse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# History rows examined per page, so a filter that matches nothing cannot
+# walk the whole journal in one request. The cursor resumes where it stopped.
+MAX_SCAN = 50000
+
+FILTER_SCHEMA = {
+    vol.Optional("user"): cv.string,
+    vol.Optional("country"): cv.string,
+    vol.Optional("asn"): cv.string,
+    vol.Optional("since"): cv.datetime,
+    vol.Optional("until"): cv.datetime,
+}
+
+PAGE_SCHEMA = {
+    **FILTER_SCHEMA,
+    vol.Optional("cursor"): cv.string,
+    vol.Optional("limit", default=DEFAULT_PAGE_SIZE): vol.All(
+        vol.Coerce(int), vol.Range(min=1, max=MAX_PAGE_SIZE)
+    ),
+}
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by this API."""
+
+
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as err:
+        raise InvalidCursor(cursor) from err
+
+
+def _filters(msg):
+    """Normalize the filter fields of ``msg`` for :func:`matches`."""
+    filters = {}
+    for name in ("user", "country", "asn"):
+        if msg.get(name):
+            filters[name] = msg[name].lower()
+    for name in ("since", "until"):
+        value = msg.get(name)
+        if value is not None:
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=dt_util.UTC)
+            filters[name] = dt_util.as_utc(value).isoformat()
+    return filters
+
+
+def matches(row, filters, time_field):
+    """Return True if ``row`` passes every filter in ``filters``.
+
+    ``user`` matches the user id or name, ``country`` the name or code.
+    Times are compared as UTC ISO strings, the format rows are stored in.
+    """
+    if not filters:
+        return True
+    if "user" in filters and filters["user"] not in (
+        str(row.get("user_id") or "").lower(),
+        str(row.get("username") or "").lower(),
+    ):
+        return False
+    if "country" in filters and filters["country"] not in (
+        str(row.get("country") or "").lower(),
+        str(row.get("country_code") or "").lower(),
+    ):
+        return False
+    if "asn" in filters and filters["asn"] != str(row.get("asn") or "").lower():
+        return False
+    timestamp = row.get(time_field) or ""
+    if "since" in filters and timestamp < filters["since"]:
+        return False
+    if "until" in filters and timestamp > filters["until"]:
+        return False
+    return True
+
+
+def page_records(records, filters, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one page of ``{ip: attributes}`` records, most recently used first.
+
+    Records are ordered by ``(last_used_at, ip)`` descending; the cursor is
+    the position of the last record returned, so pages stay stable while
+    new logins arrive. Selecting a page is a single pass over the records.
+    """
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if not (
+            isinstance(after, list)
+            and len(after) == 2
+            and all(isinstance(part, str) for part in after)
+        ):
+            raise InvalidCursor(cursor)
+        after = tuple(after)
+    candidates = (
+        (attrs.get("last_used_at") or "", ip, attrs)
+        for ip, attrs in records.items()
+        if (after is None or (attrs.get("last_used_at") or "", ip) < after)
+        and matches(attrs, filters, "last_used_at")
+    )
+    page = heapq.nlargest(limit + 1, candidates, key=lambda item: item[:2])
+    next_cursor = encode_cursor(page[limit - 1][:2]) if len(page) > limit else None
+    return {
+        "items": [{"ip": ip, **attrs} for _, ip, attrs in page[:limit]],
+        "next_cursor": next_cursor,
+    }
+
+
+def page_history(path, filters, cursor=None, limit=DEFAULT_PAGE_SIZE, max_scan=MAX_SCAN):
+    """Return one page of login history, newest first.
+
+    The cursor is the byte offset of the last row returned, so each page
+    reads only its own part of the journal. A page may be short if
+    ``max_scan`` rows were examined without filling it.
+    """
+    before = decode_cursor(cursor) if cursor else None
+    if before is not None and (
+        isinstance(before, bool) or not isinstance(before, int) or before < 0
+    ):
+        raise InvalidCursor(cursor)
+    since = filters.get("since")
+    items = []
+    scanned = 0
+    for offset, row in iter_history_reverse(path, before):
+        if since is not None and (row.get("timestamp") or "") < since:
+            # The journal is append-only, everything below is older.
+            return {"items": items, "next_cursor": None}
+        if len(items) == limit or scanned == max_scan:
+            return {"items": items, "next_cursor": encode_cursor(before)}
+        scanned += 1
+        before = offset
+        if matches(row, filters, "timestamp"):
+            items.append(row)
+    return {"items": items, "next_cursor": None}
+
+
+def _get_coordinator(hass, connection, msg):
+    coordinator = hass.data.get(DATA_COORDINATOR)
+    if coordinator is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Authenticated is not set up")
+    return coordinator
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): "authenticated/logins/subscribe", **FILTER_SCHEMA}
+)
+@websocket_api.require_admin
+@callback
+def ws_subscribe_logins(hass, connection, msg):
+    """Stream enriched logins matching the filters until unsubscribed."""
+    coordinator = _get_coordinator(hass, connection, msg)
+    if coordinator is None:
+        return
+    filters = _filters(msg)
+
+    @callback
+    def _forward(row):
+        if matches(row, filters, "timestamp"):
+            connection.send_message(websocket_api.event_message(msg["id"], row))
+
+    connection.subscriptions[msg["id"]] = coordinator.async_subscribe_logins(_forward)
+    connection.send_result(msg["id"])
+
+
+@websocket_api.websocket_command({vol.Required("type"): "authenticated/ips/list", **PAGE_SCHEMA})
+@websocket_api.require_admin
+@websocket_api.async_response
+@guarded
+async def ws_list_ips(hass, connection, msg):
+    """Return one page of tracked IPs."""
+    coordinator = _get_coordinator(hass, connection, msg)
+    if coordinator is None:
+        return
+    try:
+        # The outfile writer replaces ``stored`` rather than mutating it,
+        # so the executor can walk it while new logins come in.
+        page = await hass.async_add_executor_job(
+            page_records,
+            coordinator.all_records,
+            _filters(msg),
+            msg.get("cursor"),
+            msg.get("limit", DEFAULT_PAGE_SIZE),
+        )
+    except InvalidCursor:
+        connection.send_error(msg["id"], websocket_api.ERR_INVALID_FORMAT, "Invalid cursor")
+        return
+    connection.send_result(msg["id"], page)
+
+
+@websocket_api.websocket_command(
+    {vol.Required("type"): "authenticated/history/list", **PAGE_SCHEMA}
+)
+@websocket_api.require_admin
+@websocket_api.async_response
+@guarded
+async def ws_list_history(hass, connection, msg):
+    """Return one page of login history."""
+    coordinator = _get_coordinator(hass, connection, msg)
+    if coordinator is None:
+        return
+    try:
+        page = await hass.async_add_executor_job(
+            page_history,
+            coordinator.history_file,
+            _filters(msg),
+            msg.get("cursor"),
+            msg.get("limit", DEFAULT_PAGE_SIZE),
+        )
+    except InvalidCursor:
+        connection.send_error(msg["id"], websocket_api.ERR_INVALID_FORMAT, "Invalid cursor")
+        return
+    connection.send_result(msg["id"], page)
+
+
+@callback
+def async_setup_websocket_api(hass):
+    """Register the integration's websocket commands."""
+    websocket_api.async_register_command(hass, ws_subscribe_logins)
+    websocket_api.async_register_command(hass, ws_list_ips)
+    websocket_api.async_register_command(hass, ws_list_history)
@@ -0,0 +1,178 @@
+"""Serialization benchmarks for the authenticated integration's file formats.
+
+Generates a Home Assistant auth file, an outfile and a history journal of a
+given size, then times every available codec parsing and writing them the
+way the integration does. Reports the best of several runs and the speedup
+of each codec over the pure-Python baseline.
+
+Usage::
+
+    python tests/benchmark.py --records 20000 --repeat 5
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: E402,F401  (mocks homeassistant)
+
+from custom_components.authenticated.serialization import (  # noqa: E402
+    JSON_CODECS,
+    YAML_CODECS,
+)
+
+BASELINES = {"json": "json", "yaml": "python"}
+
+
+def make_auth(count, rng):
+    """Return an auth store with ``count`` refresh tokens."""
+    users = [{"id": f"user{i}", "name": f"User {i}"} for i in range(10)]
+    tokens = [
+        {
+            "id": f"{i:032x}",
+            "user_id": f"user{i % 10}",
+            "client_id": "https://home-assistant.io/iOS",
+            "client_name": None,
+            "token_type": "normal",
+            "created_at": "2024-01-01T00:00:00.000000+00:00",
+            "access_token_expiration": 1800.0,
+            "token": f"{rng.getrandbits(256):064x}",
+            "jwt_key": f"{rng.getrandbits(256):064x}",
+            "last_used_at": f"2024-01-{1 + i % 28:02d}T12:00:00.{i % 1000000:06d}+00:00",
+            "last_used_ip": f"{rng.randint(1, 223)}.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            "credential_id": None,
+            "version": "2024.1.0",
+        }
+        for i in range(count)
+    ]
+    return {
+        "version": 1,
+        "minor_version": 1,
+        "key": "auth",
+        "data": {"users": users, "refresh_tokens": tokens},
+    }
+
+
+def make_records(count, rng):
+    """Return ``count`` outfile records shaped like ``IPData.as_record``."""
+    return {
+        f"{rng.randint(1, 223)}.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}": {
+            "user_id": f"user{i % 10}",
+            "username": f"User {i % 10}",
+            "last_used_at": f"2024-01-{1 + i % 28:02d}T12:00:00+00:00",
+            "prev_used_at": None,
+            "country": "Norway",
+            "country_code": "NO",
+            "region": "Oslo",
+            "city": "Oslo",
+            "asn": f"AS{rng.randint(1, 65000)}",
+            "org": "Example Telecom",
+            "latitude": rng.uniform(-90, 90),
+            "longitude": rng.uniform(-180, 180),
+            "timezone": "Europe/Oslo",
+            "currency": "NOK",
+            "languages": "nb,nn,no",
+            "postal": "0150",
+            "hostname": f"host{i}.example.net",
+            "flags": ["tor"] if i % 50 == 0 else [],
+            "enriched_at": "2024-01-01T00:00:00+00:00",
+            "addresses": None,
+        }
+        for i in range(count)
+    }
+
+
+def make_history(count, rng):
+    """Return ``count`` history journal rows."""
+    return [
+        {
+            "timestamp": f"2024-01-{1 + i % 28:02d}T12:00:00+00:00",
+            "ip": f"{rng.randint(1, 223)}.0.{i // 256 % 256}.{i % 256}",
+            "user_id": f"user{i % 10}",
+            "username": f"Üser {i % 10}",
+            "country": "Norway",
+            "country_code": "NO",
+            "asn": "AS2119",
+            "org": "Telenor Norge AS",
+            "hostname": "unknown",
+            "new_ip": i % 7 == 0,
+            "flags": [],
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(func, repeat):
+    """Return the fastest of ``repeat`` timed calls of ``func``, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks(records=20000, repeat=3, seed=1):
+    """Time each codec on generated files; returns ``{case: {codec: seconds}}``."""
+    rng = random.Random(seed)
+    auth = make_auth(records, rng)
+    outfile = make_records(records, rng)
+    history = make_history(records, rng)
+
+    auth_bytes = JSON_CODECS["json"].dumps(auth)
+    outfile_text = YAML_CODECS["python"].dump(outfile)
+    history_lines = [JSON_CODECS["json"].dumps(row) for row in history]
+
+    results = {}
+    for name, codec in JSON_CODECS.items():
+        results.setdefault("auth_load", {})[name] = best_of(
+            lambda codec=codec: codec.loads(auth_bytes), repeat
+        )
+        results.setdefault("history_load", {})[name] = best_of(
+            lambda codec=codec: [codec.loads(line) for line in history_lines], repeat
+        )
+        results.setdefault("history_dump", {})[name] = best_of(
+            lambda codec=codec: [codec.dumps(row) for row in history], repeat
+        )
+    for name, codec in YAML_CODECS.items():
+        results.setdefault("outfile_load", {})[name] = best_of(
+            lambda codec=codec: codec.load(outfile_text), repeat
+        )
+        results.setdefault("outfile_dump", {})[name] = best_of(
+            lambda codec=codec: codec.dump(outfile, io.StringIO()), repeat
+        )
+    return results
+
+
+def speedups(results):
+    """Return ``{case: {codec: speedup}}`` relative to the pure-Python codec."""
+    table = {}
+    for case, timings in results.items():
+        baseline = timings[BASELINES["yaml" if case.startswith("outfile") else "json"]]
+        table[case] = {name: baseline / seconds for name, seconds in timings.items()}
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.records, args.repeat, args.seed)
+    ratios = speedups(results)
+    print(f"{'case':<14} {'codec':<8} {'seconds':>10} {'speedup':>8}")
+    for case, timings in results.items():
+        for name, seconds in timings.items():
+            print(f"{case:<14} {name:<8} {seconds:>10.4f} {ratios[case][name]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
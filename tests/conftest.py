@@ -1,20 +1,38 @@
 """Mock homeassistant before any integration code is imported."""
 
+import asyncio
+import importlib
+import json
+import os
+import re
 import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
 from unittest.mock import MagicMock
 
+import pytest
+
 # These must be injected before pytest collects test files that
 # transitively import the integration package (__init__.py -> homeassistant).
 _HA_MODS = [
     "homeassistant",
     "homeassistant.config_entries",
+    "homeassistant.const",
     "homeassistant.core",
+    "homeassistant.exceptions",
     "homeassistant.helpers",
     "homeassistant.helpers.config_validation",
     "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.event",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.restore_state",
+    "homeassistant.helpers.service",
     "homeassistant.components",
     "homeassistant.components.sensor",
     "homeassistant.components.persistent_notification",
+    "homeassistant.components.websocket_api",
+    "homeassistant.components.recorder",
+    "homeassistant.components.recorder.statistics",
     "homeassistant.util",
     "homeassistant.util.dt",
     "homeassistant.loader",
@@ -25,3 +43,408 @@ _HA_MODS = [
 
 for _mod in _HA_MODS:
     sys.modules.setdefault(_mod, MagicMock())
+
+
+# ---------------------------------------------------------------------------
+# Minimal real stand-ins for the HA classes and helpers the integration
+# subclasses or calls, so entity behaviour can be exercised under test.
+# ---------------------------------------------------------------------------
+
+class _Entity:
+    entity_id = None
+    hass = None
+    _attr_native_value = None
+
+    @property
+    def native_value(self):
+        return self._attr_native_value
+
+    async def async_added_to_hass(self):
+        pass
+
+    async def async_will_remove_from_hass(self):
+        pass
+
+    def async_on_remove(self, func):
+        self.__dict__.setdefault("_on_remove", []).append(func)
+
+    async def async_remove(self):
+        await self.async_will_remove_from_hass()
+        for func in self.__dict__.pop("_on_remove", []):
+            func()
+        if self.hass is not None:
+            self.hass.states.pop(self.entity_id, None)
+
+    @property
+    def extra_state_attributes(self):
+        return None
+
+    def async_write_ha_state(self):
+        self.hass.states[self.entity_id] = SimpleNamespace(
+            state=self.native_value, attributes=self.extra_state_attributes
+        )
+
+
+class _RestoreEntity(_Entity):
+    async def async_get_last_state(self):
+        return None
+
+
+class _Store:
+    """Store persisting JSON under the fake config directory's .storage.
+
+    As in Home Assistant, file I/O runs in the executor and a delayed save
+    is only what this instance's next load returns until it is written;
+    other instances of the same key see the file.
+    """
+
+    def __init__(self, hass, version, key):
+        self.hass = hass
+        self.path = hass.config.path(".storage", key)
+        self._pending = None
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _write(self, data):
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+    async def async_load(self):
+        if self._pending is not None:
+            return json.loads(json.dumps(self._pending()))
+        return await self.hass.async_add_executor_job(self._read)
+
+    async def async_save(self, data):
+        self._pending = None
+        await self.hass.async_add_executor_job(self._write, data)
+
+    def async_delay_save(self, data_func, delay=0):
+        self._pending = data_func
+
+
+def _async_track_time_interval(hass, action, interval):
+    timer = (action, interval)
+    hass.timers.append(timer)
+    return lambda: hass.timers.remove(timer)
+
+
+def _websocket_command(schema):
+    # voluptuous is mocked, so the command type is the only string value.
+    command = next(value for value in schema.values() if isinstance(value, str))
+
+    def _decorator(handler):
+        handler._ws_command = command
+        return handler
+
+    return _decorator
+
+
+def _require_admin(handler):
+    def _handler(hass, connection, msg):
+        if not connection.user.is_admin:
+            connection.send_error(msg["id"], "unauthorized", "Unauthorized")
+            return None
+        return handler(hass, connection, msg)
+
+    return _handler
+
+
+def _async_register_command(hass, handler):
+    hass.websocket_commands[handler._ws_command] = handler
+
+
+def _async_register_admin_service(
+    hass, domain, service, service_func, schema=None, supports_response=None
+):
+    async def _handler(call):
+        if call.context.user_id:
+            user = await hass.auth.async_get_user(call.context.user_id)
+            if user is None or not user.is_admin:
+                raise _Unauthorized(call.context.user_id)
+        return await service_func(call)
+
+    hass.services.async_register(domain, service, _handler, schema, supports_response)
+
+
+sys.modules["homeassistant.components.sensor"].SensorEntity = _Entity
+sys.modules["homeassistant.helpers.restore_state"].RestoreEntity = _RestoreEntity
+sys.modules["homeassistant.helpers.storage"].Store = _Store
+sys.modules["homeassistant.helpers.event"].async_track_time_interval = (
+    _async_track_time_interval
+)
+sys.modules["homeassistant.exceptions"].HomeAssistantError = type(
+    "HomeAssistantError", (Exception,), {}
+)
+_Unauthorized = type(
+    "Unauthorized", (sys.modules["homeassistant.exceptions"].HomeAssistantError,), {}
+)
+sys.modules["homeassistant.exceptions"].Unauthorized = _Unauthorized
+sys.modules["homeassistant.helpers.service"].async_register_admin_service = (
+    _async_register_admin_service
+)
+sys.modules["homeassistant.const"].STATE_UNKNOWN = "unknown"
+sys.modules["homeassistant.const"].STATE_UNAVAILABLE = "unavailable"
+sys.modules["homeassistant.core"].callback = lambda func: func
+_websocket_api = sys.modules["homeassistant.components.websocket_api"]
+_websocket_api.websocket_command = _websocket_command
+_websocket_api.async_response = lambda handler: handler
+_websocket_api.require_admin = _require_admin
+_websocket_api.async_register_command = _async_register_command
+_websocket_api.event_message = lambda msg_id, event: {"id": msg_id, "type": "event", "event": event}
+_websocket_api.ERR_INVALID_FORMAT = "invalid_format"
+_websocket_api.ERR_NOT_FOUND = "not_found"
+sys.modules["homeassistant.components"].websocket_api = _websocket_api
+sys.modules["homeassistant.components.recorder.statistics"].async_add_external_statistics = (
+    lambda hass, metadata, statistics: hass.recorder_statistics.append((metadata, statistics))
+)
+sys.modules["homeassistant.util"].dt = sys.modules["homeassistant.util.dt"]
+sys.modules["homeassistant.util"].slugify = lambda text: re.sub(
+    r"[^a-z0-9]+", "_", text.lower()
+).strip("_")
+sys.modules["homeassistant.util.dt"].utcnow = lambda: datetime.now(timezone.utc)
+sys.modules["homeassistant.util.dt"].UTC = timezone.utc
+sys.modules["homeassistant.util.dt"].as_utc = lambda value: value.astimezone(timezone.utc)
+
+
+class FakeBus:
+    """Event bus that dispatches synchronously to registered listeners."""
+
+    def __init__(self):
+        self.listeners = {}
+
+    def async_listen(self, event_type, listener):
+        self.listeners.setdefault(event_type, []).append(listener)
+
+        def _remove():
+            self.listeners[event_type].remove(listener)
+
+        return _remove
+
+    def async_fire(self, event_type, data=None):
+        event = SimpleNamespace(event_type=event_type, data=data or {})
+        for listener in list(self.listeners.get(event_type, [])):
+            listener(event)
+
+
+class FakeServices:
+    """Service registry that records registrations and calls handlers directly."""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def async_register(self, domain, service, handler, schema=None, supports_response=None):
+        self.handlers[(domain, service)] = handler
+
+    def async_remove(self, domain, service):
+        self.handlers.pop((domain, service), None)
+
+    def has_service(self, domain, service):
+        return (domain, service) in self.handlers
+
+    async def async_call(self, domain, service, data=None, return_response=False, context=None):
+        call = SimpleNamespace(
+            domain=domain,
+            service=service,
+            data=data or {},
+            context=context or SimpleNamespace(user_id=None),
+        )
+        return await self.handlers[(domain, service)](call)
+
+
+class FakeAuth:
+    """User registry for admin checks; users are added by the tests."""
+
+    def __init__(self):
+        self.users = {}
+
+    async def async_get_user(self, user_id):
+        return self.users.get(user_id)
+
+
+class FakeConnection:
+    """Websocket connection that records the messages sent to the client."""
+
+    def __init__(self, is_admin=True):
+        self.messages = []
+        self.subscriptions = {}
+        self.user = SimpleNamespace(is_admin=is_admin)
+
+    def send_message(self, message):
+        self.messages.append(message)
+
+    def send_result(self, msg_id, result=None):
+        self.messages.append({"id": msg_id, "type": "result", "success": True, "result": result})
+
+    def send_error(self, msg_id, code, message):
+        self.messages.append(
+            {
+                "id": msg_id,
+                "type": "result",
+                "success": False,
+                "error": {"code": code, "message": message},
+            }
+        )
+
+
+class FakeWebSocketClient:
+    """Sends commands to the registered websocket handlers."""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.connection = FakeConnection()
+        self._id = 0
+
+    async def send(self, msg):
+        """Run the command in ``msg`` and return its result message."""
+        self._id += 1
+        msg = {"id": self._id, **msg}
+        handler = self.hass.websocket_commands[msg["type"]]
+        result = handler(self.hass, self.connection, msg)
+        if asyncio.iscoroutine(result):
+            await result
+        return next(
+            m for m in reversed(self.connection.messages)
+            if m["id"] == msg["id"] and m["type"] == "result"
+        )
+
+    def events(self, msg_id):
+        return [m["event"] for m in self.connection.messages if m["id"] == msg_id and m["type"] == "event"]
+
+
+class FakeConfigEntries:
+    """Forwards config entries to platform modules and tracks their entities."""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.entities = {}
+
+    async def async_forward_entry_setups(self, entry, platforms):
+        for platform in platforms:
+            module = importlib.import_module(f"custom_components.authenticated.{platform}")
+            added = self.entities.setdefault(entry.entry_id, [])
+            await module.async_setup_entry(
+                self.hass,
+                entry,
+                lambda entities, platform=platform: self.hass.async_add_entities(
+                    platform, entities, added
+                ),
+            )
+
+    async def async_unload_platforms(self, entry, platforms):
+        for entity in self.entities.pop(entry.entry_id, []):
+            await entity.async_remove()
+        return True
+
+
+class FakeHass:
+    """Just enough of HomeAssistant to run the integration's coroutines."""
+
+    def __init__(self, config_dir):
+        self.data = {}
+        self.config = SimpleNamespace(
+            config_dir=config_dir,
+            location_name="Home",
+            path=lambda *parts: os.path.join(config_dir, *parts),
+            is_allowed_path=lambda path: path.startswith(config_dir),
+            components={"recorder"},
+        )
+        self.recorder_statistics = []
+        self.bus = FakeBus()
+        self.services = FakeServices()
+        self.auth = FakeAuth()
+        self.websocket_commands = {}
+        self.config_entries = FakeConfigEntries(self)
+        self.states = {}
+        self.tasks = set()
+        self.timers = []
+
+    @property
+    def loop(self):
+        return asyncio.get_running_loop()
+
+    def async_add_executor_job(self, target, *args):
+        return self.loop.run_in_executor(None, target, *args)
+
+    def async_create_task(self, target, name=None):
+        task = self.loop.create_task(target, name=name)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def async_create_background_task(self, target, name):
+        return self.async_create_task(target, name)
+
+    def async_add_entities(self, platform, entities, added=None):
+        """Add entities the way an entity platform would."""
+        for entity in entities:
+            entity.hass = self
+            entity.entity_id = f"{platform}.{entity._attr_unique_id}"
+            if added is not None:
+                added.append(entity)
+            self.async_create_task(entity.async_added_to_hass())
+
+    async def async_block_till_done(self):
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks))
+
+
+class FakeConfigEntry:
+    def __init__(self, data, entry_id="test_entry"):
+        self.data = data
+        self.entry_id = entry_id
+
+    def async_create_background_task(self, hass, target, name):
+        return hass.async_create_background_task(target, name)
+
+
+@pytest.fixture
+def hass(tmp_path):
+    """Return a fake hass rooted at a temporary config directory."""
+    (tmp_path / ".storage").mkdir()
+    return FakeHass(str(tmp_path))
+
+
+@pytest.fixture
+def blocking_detector():
+    """Report blocking calls made on the event loop by the integration."""
+    from custom_components.authenticated.blocking import BlockingDetector
+
+    # Generous, so slow CI machines don't trip it; calls are what matter.
+    detector = BlockingDetector(threshold=0.5)
+    detector.enable()
+    yield detector
+    detector.disable()
+
+
+@pytest.fixture
+def ws_client(hass):
+    """Return a websocket client bound to the fake hass."""
+    return FakeWebSocketClient(hass)
+
+
+@pytest.fixture
+def config_entry():
+    """Return a config entry carrying the default options."""
+    return FakeConfigEntry({})
+
+
+@pytest.fixture
+def setup_integration(hass, config_entry):
+    """Return a coroutine that sets up the integration from ``config_entry``.
+
+    It resolves to the entities added for the entry once the initial
+    refresh has finished.
+    """
+    from custom_components import authenticated
+
+    async def _setup(entry=config_entry):
+        await authenticated.async_setup(hass, {})
+        await authenticated.async_setup_entry(hass, entry)
+        await hass.async_block_till_done()
+        return hass.config_entries.entities[entry.entry_id]
+
+    return _setup
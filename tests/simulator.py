@@ -0,0 +1,370 @@
+"""Login-storm simulator for the authenticated integration.
+
+Runs the real integration against the fake ``hass`` from ``conftest`` and a
+local stub geo HTTP server, fires ``homeassistant_auth`` events at a given
+rate and IP distribution, and reports event-to-state latency percentiles,
+provider lookups issued, file writes and peak traced memory.
+
+Usage::
+
+    python tests/simulator.py --scenario mixed --events 2000 --rate 500
+
+A rate of 0 fires every event at once, like a credential-stuffing burst.
+Geo lookups go through the provider's ``requests`` path, so ``requests``
+must be installed. Reverse DNS is skipped unless ``--resolve-hostnames``
+is given, since resolving thousands of random addresses measures the
+resolver rather than the integration.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ipaddress import IPv4Address, IPv6Address
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import FakeConfigEntry, FakeHass  # noqa: E402
+
+from custom_components import authenticated  # noqa: E402
+from custom_components.authenticated import coordinator as coordinator_mod  # noqa: E402
+from custom_components.authenticated.const import DATA_COORDINATOR  # noqa: E402
+from custom_components.authenticated.providers import PROVIDERS  # noqa: E402
+
+HOT_IPS = 20
+HOT_SHARE = 0.9
+IPV6_PREFIXES = 8
+
+
+# ------------------------
+# Stub geo provider
+# ------------------------
+class StubGeoServer:
+    """ipapi-compatible geo API served from a local thread.
+
+    ``latency`` delays every response; every ``rate_limit_every``-th request
+    is answered with HTTP 429 and a Retry-After header.
+    """
+
+    def __init__(self, latency=0.0, rate_limit_every=0):
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{{}}/json"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    count = stub.requests
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub.rate_limit_every and count % stub.rate_limit_every == 0:
+                    self._send(429, {"error": True}, {"Retry-After": "1"})
+                    return
+                ip = self.path.strip("/").split("/", 1)[0]
+                self._send(200, stub.payload(ip))
+
+            def _send(self, status, body, headers=None):
+                raw = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @staticmethod
+    def payload(ip):
+        """Return a deterministic geo record for ``ip``."""
+        bucket = sum(ip.encode()) % 50
+        return {
+            "ip": ip,
+            "country_name": f"Country {bucket}",
+            "country_code": f"C{bucket:02d}",
+            "region": "Region",
+            "city": "City",
+            "asn": f"AS{64500 + bucket}",
+            "org": f"Org {bucket}",
+            "latitude": 0.0,
+            "longitude": 0.0,
+        }
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ------------------------
+# IP distributions
+# ------------------------
+def _public_ipv4(rng):
+    while True:
+        address = IPv4Address(rng.getrandbits(32))
+        if address.is_global:
+            return str(address)
+
+
+def new_ips(rng):
+    """Every login comes from an address never seen before."""
+    while True:
+        yield _public_ipv4(rng)
+
+
+def hot_ips(rng):
+    """Most logins repeat a small pool of addresses, the rest are new."""
+    pool = [_public_ipv4(rng) for _ in range(HOT_IPS)]
+    while True:
+        yield rng.choice(pool) if rng.random() < HOT_SHARE else _public_ipv4(rng)
+
+
+def ipv6_churn(rng):
+    """Privacy addresses rotating inside a handful of /64 prefixes."""
+    prefixes = [
+        (0x2001_0DB9 << 96 | rng.getrandbits(32) << 64) for _ in range(IPV6_PREFIXES)
+    ]
+    while True:
+        yield str(IPv6Address(rng.choice(prefixes) | rng.getrandbits(64)))
+
+
+def mixed(rng):
+    """Interleave the other distributions."""
+    sources = [new_ips(rng), hot_ips(rng), ipv6_churn(rng)]
+    while True:
+        yield next(rng.choice(sources))
+
+
+SCENARIOS = {
+    "new_ips": new_ips,
+    "hot_ips": hot_ips,
+    "ipv6_churn": ipv6_churn,
+    "mixed": mixed,
+}
+
+
+# ------------------------
+# Measurement helpers
+# ------------------------
+def percentiles(samples, points=(50, 90, 99)):
+    """Return nearest-rank percentiles of ``samples`` plus the maximum."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {
+        f"p{point}": ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))]
+        for point in points
+    }
+    result["max"] = ordered[-1]
+    return result
+
+
+class WriteCounter:
+    """Count files opened for writing below ``root`` via an audit hook.
+
+    Audit hooks cannot be removed, so a single hook is installed for the
+    process and only counts while a counter is active.
+    """
+
+    _active = None
+    _installed = False
+
+    def __init__(self, root):
+        self.root = root
+        self.by_file = {}
+
+    @classmethod
+    def _hook(cls, event, args):
+        counter = cls._active
+        if counter is None or event != "open":
+            return
+        path, mode = args[0], args[1]
+        if not isinstance(path, str) or not path.startswith(counter.root):
+            return
+        if mode is None or not any(flag in mode for flag in "wax+"):
+            return
+        name = os.path.relpath(path, counter.root)
+        counter.by_file[name] = counter.by_file.get(name, 0) + 1
+
+    @property
+    def total(self):
+        return sum(self.by_file.values())
+
+    def __enter__(self):
+        if not WriteCounter._installed:
+            sys.addaudithook(WriteCounter._hook)
+            WriteCounter._installed = True
+        WriteCounter._active = self
+        return self
+
+    def __exit__(self, *exc):
+        WriteCounter._active = None
+
+
+# ------------------------
+# Simulation
+# ------------------------
+def _write_auth(config_dir):
+    os.makedirs(os.path.join(config_dir, ".storage"), exist_ok=True)
+    with open(os.path.join(config_dir, ".storage", "auth"), "w") as f:
+        json.dump({"data": {"users": [{"id": "u1", "name": "Alice"}], "refresh_tokens": []}}, f)
+
+
+async def _simulate(hass, addresses, events, rate, server):
+    entry = FakeConfigEntry({})
+    await authenticated.async_setup(hass, {})
+    await authenticated.async_setup_entry(hass, entry)
+    await hass.async_block_till_done()
+
+    coordinator = hass.data[DATA_COORDINATOR]
+    handle = coordinator.async_handle_auth_event
+    latencies = []
+
+    async def _timed(event):
+        await handle(event)
+        latencies.append(time.perf_counter() - event.fired)
+
+    coordinator.async_handle_auth_event = _timed
+    listeners = hass.bus.listeners["homeassistant_auth"]
+    lookups_before = server.requests
+    interval = 1 / rate if rate else 0
+    start = time.perf_counter()
+    for sent in range(events):
+        # Dispatch directly so the event carries the time it was fired.
+        event = SimpleNamespace(
+            event_type="homeassistant_auth",
+            data={"ip_address": next(addresses), "user_id": "u1"},
+            fired=time.perf_counter(),
+        )
+        for listener in list(listeners):
+            listener(event)
+        if interval:
+            delay = start + (sent + 1) * interval - time.perf_counter()
+            await asyncio.sleep(max(delay, 0))
+    await hass.async_block_till_done()
+    duration = time.perf_counter() - start
+    await authenticated.async_unload_entry(hass, entry)
+    return {
+        "events": events,
+        "duration_s": round(duration, 3),
+        "throughput_eps": round(events / duration, 1) if duration else None,
+        "latency_ms": {
+            key: round(value * 1000, 2) for key, value in percentiles(latencies).items()
+        },
+        "lookups": server.requests - lookups_before,
+        "tracked_ips": len(coordinator.ips),
+        "retry_queue": len(coordinator.retry_queue),
+    }
+
+
+def run_simulation(
+    scenario="mixed",
+    events=1000,
+    rate=0,
+    seed=0,
+    provider="ipapi",
+    latency=0.0,
+    rate_limit_every=0,
+    resolve_hostnames=False,
+    trace_memory=True,
+    config_dir=None,
+):
+    """Run one login storm and return its report as a dict."""
+    rng = random.Random(seed)
+    addresses = SCENARIOS[scenario](rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        config_dir = os.path.realpath(config_dir or tmp)
+        _write_auth(config_dir)
+        hass = FakeHass(config_dir)
+        with StubGeoServer(latency, rate_limit_every) as server, patch.object(
+            PROVIDERS[provider], "url", server.url
+        ), WriteCounter(config_dir) as writes:
+            hostname_patch = (
+                nullcontext()
+                if resolve_hostnames
+                else patch.object(coordinator_mod, "get_hostname", lambda ip: "unknown")
+            )
+            if trace_memory:
+                tracemalloc.start()
+            try:
+                with hostname_patch:
+                    report = asyncio.run(_simulate(hass, addresses, events, rate, server))
+                peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+            finally:
+                tracemalloc.stop()
+        report.update(
+            scenario=scenario,
+            rate=rate,
+            file_writes=writes.total,
+            file_writes_by_file=dict(sorted(writes.by_file.items())),
+            peak_memory_kb=round(peak / 1024, 1) if peak is not None else None,
+        )
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=0, help="events per second, 0 = burst")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--provider", choices=sorted(PROVIDERS), default="ipapi")
+    parser.add_argument("--latency", type=float, default=0.0, help="stub response delay (s)")
+    parser.add_argument(
+        "--rate-limit-every", type=int, default=0, help="answer every Nth lookup with 429"
+    )
+    parser.add_argument("--resolve-hostnames", action="store_true")
+    parser.add_argument(
+        "--no-trace-memory",
+        action="store_true",
+        help="skip tracemalloc, which slows the run and inflates latencies",
+    )
+    args = parser.parse_args(argv)
+    report = run_simulation(
+        scenario=args.scenario,
+        events=args.events,
+        rate=args.rate,
+        seed=args.seed,
+        provider=args.provider,
+        latency=args.latency,
+        rate_limit_every=args.rate_limit_every,
+        resolve_hostnames=args.resolve_hostnames,
+        trace_memory=not args.no_trace_memory,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Tests for multi-node journal aggregation and the shared geo cache."""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.aggregation import NodeAggregator, SharedGeoCache, SharedQuota
+from custom_components.authenticated.quota import QuotaTracker
+
+
+def _record(last_used_at, country=None):
+    return {"user_id": "u1", "last_used_at": last_used_at, "country": country}
+
+
+def test_merge_is_last_writer_wins_per_node_ip_user(tmp_path):
+    shared = str(tmp_path)
+    cabin = NodeAggregator(shared, "cabin")
+    office = NodeAggregator(shared, "office")
+    main = NodeAggregator(shared, "main", aggregate=True)
+
+    cabin.sync({"8.8.8.8": _record("2024-01-02T00:00:00", "US")})
+    office.sync({"8.8.8.8": _record("2024-01-01T00:00:00")})
+    main.sync({})
+
+    rows = {(r["node"], r["ip"]): r for r in main.merged_rows()}
+    assert set(rows) == {("cabin", "8.8.8.8"), ("office", "8.8.8.8")}
+    assert rows[("cabin", "8.8.8.8")]["country"] == "US"
+
+    # An older journal entry for the same key never replaces a newer one.
+    main.merge_row("cabin", {"ip": "8.8.8.8", **_record("2023-12-31T00:00:00", "XX")})
+    assert rows[("cabin", "8.8.8.8")]["country"] == "US"
+
+    # Unchanged journals are skipped on the next ingest.
+    assert main.ingest() == 0
+    office.sync({"8.8.8.8": _record("2024-01-03T00:00:00", "DE")})
+    assert main.ingest() == 1
+    rows = {(r["node"], r["ip"]): r for r in main.merged_rows()}
+    assert rows[("office", "8.8.8.8")]["country"] == "DE"
+
+
+def test_geo_cache_is_shared_between_nodes(tmp_path):
+    """A lookup done by one node is reused by another without a provider call."""
+    shared = str(tmp_path)
+    cabin = NodeAggregator(shared, "cabin")
+    main = NodeAggregator(shared, "main")
+    calls = []
+
+    class _Provider:
+        error = retry_after = None
+        failed = False
+        sent = True
+
+        def __init__(self, ip):
+            self.computed_result = {"country": "Testland"}
+            calls.append(ip)
+
+        def update_geo_info(self):
+            pass
+
+    def _ipdata(geo_cache):
+        access = coordinator_mod.AuthenticatedData("8.8.8.8", {"user_id": "u1"})
+        return coordinator_mod.IPData(access, {}, "stub", geo_cache=geo_cache)
+
+    with patch.dict(coordinator_mod.PROVIDERS, {"stub": _Provider}):
+        first = _ipdata(cabin.geo_cache)
+        first.lookup()
+        cabin.sync({})
+
+        main.sync({})
+        second = _ipdata(main.geo_cache)
+        second.lookup()
+
+    assert calls == ["8.8.8.8"]
+    assert second.country == "Testland"
+    assert os.path.exists(os.path.join(shared, "geo_cache.json"))
+
+
+def test_provider_quota_is_shared_between_nodes(hass, tmp_path):
+    """Requests counted by any node come out of one fleet-wide budget."""
+    shared = str(tmp_path / "shared")
+    noon = datetime(2024, 5, 31, 12, tzinfo=timezone.utc).timestamp()
+    cabin = NodeAggregator(shared, "cabin")
+    main = NodeAggregator(shared, "main")
+    cabin_quota = QuotaTracker(hass, daily=10, shared=cabin.quota)
+    main_quota = QuotaTracker(hass, daily=10, shared=main.quota)
+
+    assert cabin_quota.acquire("ipapi", count=4, now=noon) == 4
+    cabin.sync({})
+    main.sync({})
+    assert main_quota.available("ipapi", now=noon) == 6
+
+    # Counts made by both nodes between syncs are added, not overwritten.
+    assert main_quota.acquire("ipapi", count=3, now=noon) == 3
+    assert cabin_quota.acquire("ipapi", count=2, now=noon) == 2
+    main_quota.release("ipapi", 1, now=noon)
+    main.sync({})
+    cabin.sync({})
+    main.sync({})
+    assert main_quota.state("ipapi", now=noon)["daily"]["used"] == 8
+    assert cabin_quota.available("ipapi", now=noon) == 2
+
+    with open(os.path.join(shared, "quota.json")) as f:
+        assert json.load(f)["ipapi"]["daily"] == {"key": "2024-05-31", "used": 8}
+
+
+def test_concurrent_flushes_do_not_lose_counts(tmp_path):
+    """Nodes flushing at the same time each add to the file under the lock."""
+    path = str(tmp_path / "quota.json")
+    keys = {"daily": "2024-05-31"}
+
+    def _node():
+        quota = SharedQuota(path)
+        for _ in range(50):
+            quota.add("ipapi", keys, 1)
+            quota.flush()
+
+    threads = [threading.Thread(target=_node) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path) as f:
+        assert json.load(f)["ipapi"]["daily"] == {"key": "2024-05-31", "used": 200}
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_geo_cache_keeps_the_most_recent_results(tmp_path):
+    path = str(tmp_path / "geo_cache.json")
+    cache = SharedGeoCache(path, max_entries=3)
+    for index in range(5):
+        cache.put(f"8.8.8.{index}", {"country": "Testland"})
+        cache.flush()
+    # Storing a result again makes it the newest.
+    cache.put("8.8.8.2", {"country": "Norway"})
+    cache.flush()
+
+    other = SharedGeoCache(path, max_entries=3)
+    other.refresh()
+    assert other.get("8.8.8.0") is None
+    assert other.get("8.8.8.1") is None
+    assert other.get("8.8.8.2") == {"country": "Norway"}
+    with open(path) as f:
+        assert list(json.load(f)) == ["8.8.8.3", "8.8.8.4", "8.8.8.2"]
@@ -0,0 +1,106 @@
+"""Tests for background re-enrichment of stale geo data."""
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.backfill import BackfillScheduler
+
+FRESH = datetime.now(timezone.utc).isoformat()
+STALE = (datetime.now(timezone.utc) - timedelta(days=90)).isoformat()
+
+
+def _coordinator(hass, records):
+    coordinator = coordinator_mod.AuthenticatedCoordinator(hass, {})
+    coordinator.last_update_success = True
+    coordinator.retry_queue.loaded = True
+    for ip, (last_used_at, enriched_at) in records.items():
+        data = coordinator_mod.AuthenticatedData(
+            ip,
+            {"last_used_at": last_used_at, "enriched_at": enriched_at, "country": "Oldland"},
+        )
+        coordinator.ips[ip] = coordinator_mod.IPData(data, {}, "ipapi", new=False)
+    return coordinator
+
+
+RECORDS = {
+    "8.8.8.8": ("2024-01-03T00:00:00+00:00", STALE),
+    "8.8.4.4": ("2024-01-01T00:00:00+00:00", None),
+    "1.1.1.1": ("2024-01-02T00:00:00+00:00", STALE),
+    "9.9.9.9": ("2024-01-04T00:00:00+00:00", FRESH),
+}
+
+
+def test_candidates_are_stale_and_most_recent_first(hass):
+    coordinator = _coordinator(hass, RECORDS)
+    scheduler = BackfillScheduler(coordinator, 30, batch_size=2)
+
+    assert [d.ip_address for d in scheduler.candidates()] == ["8.8.8.8", "1.1.1.1"]
+
+    scheduler.batch_size = 10
+    coordinator.retry_queue.entries["1.1.1.1"] = {"attempts": 1, "due": time.time() + 60}
+    assert [d.ip_address for d in scheduler.candidates()] == ["8.8.8.8", "8.8.4.4"]
+
+
+def test_backfill_waits_for_idle_and_retries(hass):
+    coordinator = _coordinator(hass, RECORDS)
+    scheduler = BackfillScheduler(coordinator, 30)
+    now = time.time()
+    assert scheduler.is_idle(now)
+
+    coordinator.last_activity = now - 10
+    assert not scheduler.is_idle(now)
+    coordinator.last_activity = 0
+
+    coordinator.retry_queue.entries["5.5.5.5"] = {"attempts": 1, "due": now - 1}
+    assert not scheduler.is_idle(now)
+    coordinator.retry_queue.entries.clear()
+
+    coordinator.retry_queue.paused_until = now + 60
+    assert not scheduler.is_idle(now)
+
+
+def test_backfill_refreshes_batch_and_writes_once(hass):
+    coordinator = _coordinator(hass, RECORDS)
+    scheduler = BackfillScheduler(coordinator, 30, batch_size=2)
+    calls = []
+    writes = []
+
+    def _lookup(self, use_cache=True):
+        calls.append((self.ip_address, use_cache))
+        self.apply_geo({"country": "Newland"})
+        return True
+
+    async def _write():
+        writes.append(True)
+
+    coordinator.async_write_to_file = _write
+    with patch.object(coordinator_mod.IPData, "lookup", _lookup):
+        asyncio.run(scheduler.async_run())
+
+    assert calls == [("8.8.8.8", False), ("1.1.1.1", False)]
+    assert writes == [True]
+    assert coordinator.ips["8.8.8.8"].country == "Newland"
+    assert coordinator.ips["8.8.8.8"].enriched_at > STALE
+    assert coordinator.ips["8.8.4.4"].country == "Oldland"
+
+
+def test_rate_limit_pauses_backfill(hass):
+    coordinator = _coordinator(hass, RECORDS)
+    scheduler = BackfillScheduler(coordinator, 30)
+    calls = []
+
+    def _lookup(self, use_cache=True):
+        calls.append(self.ip_address)
+        self.retry_after = 600
+        return False
+
+    with patch.object(coordinator_mod.IPData, "lookup", _lookup):
+        asyncio.run(scheduler.async_run())
+        asyncio.run(scheduler.async_run())
+
+    assert calls == ["8.8.8.8"]
+    assert scheduler.paused_until > time.time() + 500
+    assert coordinator.ips["8.8.8.8"].country == "Oldland"
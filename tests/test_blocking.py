@@ -0,0 +1,164 @@
+"""Tests for the event loop blocking detector.
+
+The end-to-end test runs the integration's main paths with the detector
+enabled, so a blocking call added to any of them fails it.
+"""
+
+import asyncio
+import json
+import os
+import time
+from unittest.mock import patch
+
+from conftest import FakeConfigEntry
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.blocking import (
+    KIND_CALL,
+    KIND_SLOW,
+    BlockingDetector,
+    get_detector,
+    guarded,
+)
+from custom_components.authenticated.const import CONF_DETECT_BLOCKING, DATA_COORDINATOR
+
+
+def test_reports_blocking_calls_on_the_loop(tmp_path, blocking_detector):
+    path = str(tmp_path / "file.txt")
+
+    @guarded
+    async def _blocking():
+        os.path.exists(path)
+        with open(path, "w"):
+            pass
+        time.sleep(0)
+        await asyncio.sleep(0)
+
+    @guarded
+    async def _in_executor():
+        await asyncio.get_running_loop().run_in_executor(None, os.path.exists, path)
+
+    async def _warm_up():
+        # Starting the default executor imports modules, which reads files.
+        await asyncio.get_running_loop().run_in_executor(None, int)
+
+    asyncio.run(_warm_up())
+    asyncio.run(_blocking())
+    asyncio.run(_in_executor())
+
+    reports = list(blocking_detector.reports)
+    assert [report["kind"] for report in reports] == [KIND_CALL] * 3
+    assert [report["detail"].split("(")[0] for report in reports] == ["os.stat", "open", "time.sleep"]
+    assert all(report["name"].endswith("_blocking") for report in reports)
+
+
+def test_reports_slow_slices(blocking_detector):
+    blocking_detector.threshold = 0.02
+
+    def _spin(seconds):
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+
+    @guarded
+    async def _slow():
+        _spin(0.05)
+
+    @guarded
+    async def _yielding():
+        for _ in range(5):
+            _spin(0.005)
+            await asyncio.sleep(0)
+
+    @guarded
+    def _slow_callback():
+        _spin(0.05)
+
+    asyncio.run(_slow())
+    asyncio.run(_yielding())
+    _slow_callback()
+
+    reports = list(blocking_detector.reports)
+    assert [report["kind"] for report in reports] == [KIND_SLOW, KIND_SLOW]
+    assert [report["name"].rsplit(".", 1)[-1] for report in reports] == ["_slow", "_slow_callback"]
+
+
+def test_disabled_detector_unpatches_os():
+    original = os.stat
+    detector = BlockingDetector()
+    detector.enable()
+    assert get_detector() is detector and os.stat is not original
+    detector.disable()
+    assert get_detector() is None and os.stat is original
+
+
+def test_detector_is_opt_in(hass, setup_integration):
+    original = os.stat
+
+    async def _run(entry):
+        asyncio.get_running_loop().set_debug(True)
+        await setup_integration(entry)
+        enabled = get_detector() is not None and os.stat is not original
+        await coordinator_mod.async_release_coordinator(hass, entry.entry_id)
+        return enabled
+
+    assert not asyncio.run(_run(FakeConfigEntry({})))
+    assert asyncio.run(_run(FakeConfigEntry({CONF_DETECT_BLOCKING: True})))
+    assert get_detector() is None and os.stat is original
+
+
+def test_integration_does_not_block_the_loop(hass, setup_integration, ws_client, blocking_detector):
+    auth = {
+        "data": {
+            "users": [{"id": "u1", "name": "Alice"}],
+            "refresh_tokens": [
+                {"last_used_ip": "8.8.8.8", "last_used_at": "2024-01-01T00:00:00", "user_id": "u1"}
+            ],
+        }
+    }
+    with open(hass.config.path(".storage/auth"), "w") as f:
+        json.dump(auth, f)
+    calls = []
+
+    def _lookup(self, use_cache=True):
+        calls.append(self.ip_address)
+        if self.ip_address == "9.9.9.9" and calls.count("9.9.9.9") == 1:
+            return False
+        self.country, self.asn = "Testland", "AS64500"
+        return True
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "unknown"
+        ):
+            await setup_integration()
+            coordinator = hass.data[DATA_COORDINATOR]
+            for ip in ("1.1.1.1", "9.9.9.9", "1.1.1.1"):
+                hass.bus.async_fire("homeassistant_auth", {"ip_address": ip, "user_id": "u1"})
+                await hass.async_block_till_done()
+            hass.bus.async_fire(
+                "authenticated_login_failed", {"ip_address": "192.0.2.1", "username": "bob"}
+            )
+            await hass.async_block_till_done()
+            coordinator.retry_queue.entries["9.9.9.9"]["due"] = 0
+            await coordinator.async_process_retries()
+            await coordinator.async_refresh()
+            await coordinator.backfill.async_run()
+            await ws_client.send({"id": 1, "type": "authenticated/ips/list"})
+            await ws_client.send({"id": 2, "type": "authenticated/history/list"})
+            await hass.services.async_call("authenticated", "stats", {"period": "day"})
+            await hass.services.async_call(
+                "authenticated", "export", {"dataset": "history", "format": "csv"}
+            )
+
+    asyncio.run(_run())
+
+    assert "9.9.9.9" in calls and "1.1.1.1" in calls
+    assert list(blocking_detector.reports) == []
+
+
+def test_missing_auth_file_is_checked_off_the_loop(hass, setup_integration, blocking_detector):
+    asyncio.run(setup_integration())
+
+    assert hass.data[DATA_COORDINATOR].last_update_success
+    assert list(blocking_detector.reports) == []
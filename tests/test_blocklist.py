@@ -0,0 +1,127 @@
+"""Tests for the blocklist range index and enrichment stage."""
+
+import os
+import random
+import tracemalloc
+from types import SimpleNamespace
+
+from custom_components.authenticated.blocklist import (
+    CHUNK_SIZE,
+    BlocklistSet,
+    RangeIndex,
+    SortedRuns,
+    parse_entry,
+)
+from custom_components.authenticated.enrichment import apply_enrichers, get_enrichers
+
+
+def test_parse_entry_forms():
+    assert parse_entry("198.51.100.7") == (4, 0xC6336407, 0xC6336407)
+    assert parse_entry("198.51.100.7/24") == (4, 0xC6336400, 0xC63364FF)
+    assert parse_entry("10.0.0.1-10.0.0.9")[1:] == (0x0A000001, 0x0A000009)
+    assert parse_entry("2001:db8::/32")[0] == 6
+    assert parse_entry("10.0.0.9-10.0.0.1") is None
+    assert parse_entry("not-an-ip") is None
+    assert parse_entry("1.2.3.4/33") is None
+
+
+def test_range_index_merges_overlaps():
+    index = RangeIndex("I", [(1, 5), (3, 8), (9, 10), (20, 30)])
+    assert list(index.starts) == [1, 20]
+    assert list(index.ends) == [10, 30]
+    assert 1 in index and 10 in index and 25 in index
+    assert 0 not in index and 11 not in index and 31 not in index
+
+
+def test_blocklist_set_tags_and_incremental_reload(tmp_path):
+    (tmp_path / "tor.txt").write_text("# Tor exits\n185.220.101.0/24\n2a0b:f4c2::1\n")
+    (tmp_path / "abuse.netset").write_text("203.0.113.5 ; spam\n185.220.101.9\n")
+    (tmp_path / "README.md").write_text("8.8.8.8\n")
+    lists = BlocklistSet(str(tmp_path))
+
+    assert lists.refresh() is True
+    assert lists.match("185.220.101.9") == ["abuse", "tor"]
+    assert lists.match("2a0b:f4c2::abcd") == ["tor"]
+    assert lists.match("8.8.8.8") == []
+
+    tor = lists.lists["tor"]
+    assert lists.refresh() is False
+    (tmp_path / "abuse.netset").write_text("8.8.8.8\n")
+    assert lists.refresh() is True
+    assert lists.lists["tor"] is tor
+    assert lists.match("8.8.8.8") == ["abuse"]
+
+    os.remove(tmp_path / "abuse.netset")
+    assert lists.refresh() is True
+    assert lists.match("8.8.8.8") == []
+
+
+def test_enricher_pipeline_sets_flags(tmp_path):
+    (tmp_path / "vpn.txt").write_text("8.8.8.0/24\n")
+    enrichers = get_enrichers({"blocklist_directory": str(tmp_path)})
+    for enricher in enrichers:
+        enricher.refresh()
+    ipdata = SimpleNamespace(ip_address="8.8.8.8", address="8.8.8.8", flags=[])
+
+    apply_enrichers(enrichers, ipdata)
+
+    assert ipdata.flags == ["vpn"]
+    assert get_enrichers({}) == []
+
+
+def test_large_list_memory_footprint(tmp_path):
+    """A large list keeps a few bytes per range and bounded load-time peak."""
+    count = 100_000
+    rng = random.Random(1)
+    path = tmp_path / "big.txt"
+    with open(path, "w") as f:
+        for _ in range(count):
+            f.write(".".join(str(rng.randrange(256)) for _ in range(4)) + "\n")
+    lists = BlocklistSet(str(tmp_path))
+
+    tracemalloc.start()
+    try:
+        lists.refresh()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    index = lists.lists["big"].v4
+    assert index.nbytes <= 8 * count
+    assert current < 12 * count
+    assert peak < 100 * count
+
+
+def test_sorted_runs_merge_chunks():
+    rng = random.Random(2)
+    values = [rng.getrandbits(128) for _ in range(CHUNK_SIZE * 2 + 5)]
+    runs = SortedRuns(words=2)
+    for value in values:
+        runs.append(value)
+    assert list(runs.values()) == sorted(values)
+    assert list(SortedRuns().values()) == []
+
+
+def test_load_peak_is_bounded_by_the_packed_ranges(tmp_path):
+    """Loading holds packed ranges and one chunk, not an object per entry."""
+    count = 200_000
+    rng = random.Random(3)
+    with open(tmp_path / "big.txt", "w") as f:
+        for i in range(count):
+            if i % 4:
+                f.write(".".join(str(rng.randrange(256)) for _ in range(4)) + "\n")
+            else:
+                f.write(f"2001:db8:{rng.randrange(65536):x}:{rng.randrange(65536):x}::/64\n")
+    lists = BlocklistSet(str(tmp_path))
+
+    tracemalloc.start()
+    try:
+        lists.refresh()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    blocklist = lists.lists["big"]
+    assert len(blocklist.v4) + len(blocklist.v6) > 0.99 * count
+    # The packed input runs and the finished index, plus one chunk of ints.
+    assert peak < 2.5 * current + 64 * CHUNK_SIZE
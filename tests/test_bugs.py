@@ -112,9 +112,9 @@ def test_ipinfo_org_empty():
 # ---------------------------------------------------------------------------
 
 def test_async_handle_auth_event_uses_executor_for_blocking_calls():
-    """sensor.py must wrap lookup() and get_hostname() in
+    """coordinator.py must wrap lookup() and get_hostname() in
     async_add_executor_job inside async_handle_auth_event."""
-    with open(os.path.join(SRC_DIR, "sensor.py")) as f:
+    with open(os.path.join(SRC_DIR, "coordinator.py")) as f:
         source = f.read()
 
     method_start = source.index("async def async_handle_auth_event")
@@ -0,0 +1,124 @@
+"""Tests for the shared coordinator's lifecycle."""
+
+import asyncio
+import os
+from unittest.mock import patch
+
+from conftest import FakeConfigEntry
+
+from custom_components import authenticated
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.coordinator import (
+    AuthenticatedCoordinator,
+    async_get_coordinator,
+    async_release_coordinator,
+)
+from custom_components.authenticated.const import DATA_COORDINATOR
+
+
+def test_entries_share_one_coordinator_and_auth_listener(hass, setup_integration):
+    """Several entries subscribe to a single coordinator and bus listener."""
+    second = FakeConfigEntry({}, entry_id="second_entry")
+
+    async def _run():
+        await setup_integration()
+        await setup_integration(second)
+
+    asyncio.run(_run())
+
+    coordinator = hass.data[DATA_COORDINATOR]
+    assert hass.data[authenticated.DOMAIN]["second_entry"] is coordinator
+    assert coordinator.consumers == {"test_entry", "second_entry"}
+    assert len(hass.bus.listeners["homeassistant_auth"]) == 1
+    entities = hass.config_entries.entities
+    assert len(coordinator._listeners) == sum(len(added) for added in entities.values())
+
+
+def test_unload_removes_listeners_and_timers(hass, config_entry, setup_integration):
+    """Reloading an entry leaves no stale listeners or timers behind."""
+
+    async def _run():
+        for _ in range(3):
+            await setup_integration()
+            assert len(hass.bus.listeners["homeassistant_auth"]) == 1
+            await authenticated.async_unload_entry(hass, config_entry)
+
+    asyncio.run(_run())
+
+    assert DATA_COORDINATOR not in hass.data
+    assert hass.bus.listeners["homeassistant_auth"] == []
+    assert hass.timers == []
+    assert hass.states == {}
+
+
+def test_coordinator_is_kept_until_last_consumer_releases(hass):
+    """The coordinator stops only once every consumer has released it."""
+
+    async def _run():
+        first = async_get_coordinator(hass, {}, "entry")
+        second = async_get_coordinator(hass, {}, "yaml")
+        await hass.async_block_till_done()
+        await async_release_coordinator(hass, "entry")
+        still_running = len(hass.bus.listeners["homeassistant_auth"])
+        await async_release_coordinator(hass, "yaml")
+        return first, second, still_running
+
+    first, second, still_running = asyncio.run(_run())
+
+    assert first is second
+    assert isinstance(first, AuthenticatedCoordinator)
+    assert still_running == 1
+    assert hass.bus.listeners["homeassistant_auth"] == []
+
+
+def test_reload_keeps_quota_and_retry_queue(hass, config_entry, setup_integration):
+    """Unloading saves the stores, so the reloaded coordinator sees the same data."""
+
+    async def _run():
+        await setup_integration()
+        await hass.async_block_till_done()
+        coordinator = hass.data[DATA_COORDINATOR]
+        coordinator.quota.acquire("ipapi", count=3)
+        coordinator.retry_queue.schedule("1.2.3.4", retry_after=3600)
+        await authenticated.async_unload_entry(hass, config_entry)
+
+        await setup_integration()
+        await hass.async_block_till_done()
+        return hass.data[DATA_COORDINATOR]
+
+    reloaded = asyncio.run(_run())
+
+    assert reloaded.quota.state("ipapi")["daily"]["used"] == 3
+    assert "1.2.3.4" in reloaded.retry_queue
+
+
+def test_login_burst_coalesces_outfile_writes(hass, setup_integration):
+    """A burst of logins is written in a few complete rewrites, not one each."""
+    count = 200
+
+    def _lookup(self, use_cache=True):
+        self.country = "Testland"
+        return True
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "unknown"
+        ):
+            await setup_integration()
+            with patch.object(
+                coordinator_mod, "write_outfile", wraps=coordinator_mod.write_outfile
+            ) as writes:
+                for i in range(count):
+                    hass.bus.async_fire(
+                        "homeassistant_auth",
+                        {"ip_address": f"8.8.{i // 256}.{i % 256}", "user_id": "u1"},
+                    )
+                await hass.async_block_till_done()
+        return hass.data[DATA_COORDINATOR], writes.call_count
+
+    coordinator, writes = asyncio.run(_run())
+
+    assert writes < 10
+    records = asyncio.run(coordinator_mod.async_get_outfile_content(hass, coordinator.out))
+    assert len(records) == count
+    assert not [name for name in os.listdir(hass.config.path()) if name.endswith(".tmp")]
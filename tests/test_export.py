@@ -0,0 +1,109 @@
+"""Tests for the columnar login data export."""
+
+import asyncio
+import csv
+import importlib.util
+import os
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.authenticated import coordinator as coordinator_mod, export
+
+
+def _rows(count):
+    for i in range(count):
+        yield {"ip": f"203.0.113.{i % 256}", "user_id": "u1", "latitude": "1.5"}
+
+
+def test_csv_export_streams_all_rows(tmp_path):
+    """The CSV writer consumes a generator and coerces typed columns."""
+    path = tmp_path / "records.csv"
+    count = export.write_export(
+        str(path), export.FORMAT_CSV, export.RECORD_COLUMNS, _rows(10000)
+    )
+
+    assert count == 10000
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        first = next(reader)
+        assert reader.fieldnames == [name for name, _ in export.RECORD_COLUMNS]
+        assert first["ip"] == "203.0.113.0"
+        assert first["latitude"] == "1.5"
+        assert first["country"] == ""
+        assert sum(1 for _ in reader) == 9999
+    assert not (tmp_path / "records.csv.tmp").exists()
+
+
+def test_history_skips_malformed_lines(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    export.append_history(path, {"ip": "198.51.100.1"})
+    with open(path, "a") as f:
+        f.write("{not json\n\n")
+    export.append_history(path, {"ip": "198.51.100.2"})
+
+    assert [row["ip"] for row in export.iter_history(path)] == [
+        "198.51.100.1",
+        "198.51.100.2",
+    ]
+
+
+def test_history_keeps_the_newest_rows_within_its_cap(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    for i in range(1000):
+        export.append_history(path, {"ip": f"198.51.100.{i % 256}", "seq": i}, max_bytes=4096)
+
+    rows = list(export.iter_history(path))
+    assert os.path.getsize(path) <= 4096
+    assert rows[-1]["seq"] == 999
+    assert [row["seq"] for row in rows] == list(range(1000 - len(rows), 1000))
+    assert len(rows) > 40
+    assert not os.path.exists(f"{path}.tmp")
+
+
+@pytest.mark.skipif(
+    importlib.util.find_spec("pyarrow") is None, reason="pyarrow not installed"
+)
+def test_arrow_export_round_trip(tmp_path):
+    import pyarrow as pa
+
+    path = tmp_path / "records.arrow"
+    count = export.write_export(
+        str(path), export.FORMAT_ARROW, export.RECORD_COLUMNS, _rows(10000)
+    )
+
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert count == table.num_rows == 10000
+    assert table.column("latitude").type == pa.float64()
+
+
+def test_export_service_writes_login_history(hass, setup_integration):
+    """Logins are journaled and exported through the export service."""
+
+    def _lookup(self):
+        self.country = "Testland"
+        return True
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "host.example"
+        ):
+            await setup_integration()
+            for ip in ("8.8.8.8", "8.8.4.4", "8.8.8.8"):
+                hass.bus.async_fire(
+                    "homeassistant_auth", {"ip_address": ip, "user_id": "u1"}
+                )
+                await hass.async_block_till_done()
+        return await hass.services.async_call(
+            "authenticated", "export", {"dataset": "history", "format": "csv"}
+        )
+
+    result = asyncio.run(_run())
+
+    assert result["rows"] == 3
+    with open(result["path"], newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["ip"] for row in rows] == ["8.8.8.8", "8.8.4.4", "8.8.8.8"]
+    assert rows[0]["country"] == "Testland"
+    assert [row["new_ip"] for row in rows] == ["True", "True", "False"]
@@ -0,0 +1,118 @@
+"""Tests for failed-login tracking and brute-force signals."""
+
+import asyncio
+import logging
+import os
+import time
+
+from custom_components.authenticated.const import DATA_COORDINATOR
+from custom_components.authenticated.failed_logins import (
+    BAN_LOGGER,
+    KIND_IP,
+    KIND_USERNAME,
+    FailedLoginTracker,
+    SlidingWindowCounter,
+)
+
+BAN_WARNING = (
+    "Login attempt or request with invalid authentication from %s (%s). "
+    "Requested URL: '/auth/login_flow/abc'. (Mozilla/5.0)"
+)
+
+
+def test_sliding_window_counter_expires_old_slots():
+    counter = SlidingWindowCounter(5)
+    for slot in range(10, 15):
+        counter.add(slot, 2)
+    assert counter.count(14) == 10
+    assert counter.count(16) == 6
+    assert counter.count(100) == 0
+    assert counter.add(100) == 1
+
+
+def test_tracker_flags_once_and_rearms():
+    tracker = FailedLoginTracker(window=60, threshold=3, buckets=6)
+
+    fired = [tracker.record("1.2.3.4", "admin", now=0) for _ in range(5)]
+
+    assert fired[:2] == [[], []]
+    assert fired[2] == [(KIND_IP, "1.2.3.4", 3), (KIND_USERNAME, "admin", 3)]
+    assert fired[3:] == [[], []]
+    assert tracker.suspects(KIND_IP, now=0) == {"1.2.3.4": 5}
+    assert tracker.top(KIND_USERNAME, now=0) == {"admin": 5}
+
+    tracker.sweep(now=120)
+    assert tracker.suspects(KIND_IP, now=120) == {}
+    assert tracker.attempts(now=120) == 0
+    assert tracker.tables[KIND_IP].counters == {}
+    assert tracker.record("1.2.3.4", now=120) == []
+
+
+def test_tracker_memory_is_bounded():
+    tracker = FailedLoginTracker(threshold=1000, max_keys=100)
+    for i in range(1000):
+        tracker.record(f"10.0.{i // 256}.{i % 256}", now=0)
+    assert len(tracker.tables[KIND_IP].counters) == 100
+    assert tracker.attempts(now=0) == 1000
+
+
+def test_tracker_keeps_up_with_attempt_bursts():
+    tracker = FailedLoginTracker(threshold=50)
+    start = time.perf_counter()
+    for i in range(20000):
+        tracker.record(f"203.0.113.{i % 200}", f"user{i % 50}")
+    elapsed = time.perf_counter() - start
+    assert elapsed < 2, f"20k attempts took {elapsed:.2f}s"
+    assert len(tracker.flagged[KIND_IP]) == 200
+
+
+def test_ban_log_feeds_sensors_and_events(hass, setup_integration):
+    """Ban-logger warnings are counted without disk I/O and raise one event."""
+    events = []
+    hass.bus.async_listen("authenticated_brute_force", events.append)
+    ban_logger = logging.getLogger(BAN_LOGGER)
+
+    async def _run():
+        entities = await setup_integration()
+        coordinator = hass.data[DATA_COORDINATOR]
+        files = sorted(os.listdir(hass.config.config_dir))
+        for _ in range(12):
+            ban_logger.warning(BAN_WARNING, "host.example", "198.51.100.7")
+        ban_logger.warning("Banned IP %s for too many login attempts", "198.51.100.7")
+        hass.bus.async_fire(
+            "authenticated_login_failed", {"ip_address": "192.0.2.1", "username": "bob"}
+        )
+        await asyncio.sleep(0)
+        assert sorted(os.listdir(hass.config.config_dir)) == files
+        coordinator._async_sweep_failed_logins()
+        return entities
+
+    entities = asyncio.run(_run())
+
+    assert [(e.data["kind"], e.data["key"], e.data["attempts"]) for e in events] == [
+        ("ip", "198.51.100.7", 10)
+    ]
+    states = {entity.entity_id: hass.states[entity.entity_id] for entity in entities}
+    failed = states["sensor.authenticated_failed_logins_test_entry"]
+    assert failed.state == 13
+    assert failed.attributes["top_ips"] == {"198.51.100.7": 12, "192.0.2.1": 1}
+    assert failed.attributes["top_usernames"] == {"bob": 1}
+    suspects = states["sensor.authenticated_brute_force_test_entry"]
+    assert suspects.state == 1
+    assert suspects.attributes["ips"] == {"198.51.100.7": 12}
+    assert suspects.attributes["banned_ips"] == ["198.51.100.7"]
+
+
+def test_ban_log_handler_is_removed_on_unload(hass, config_entry, setup_integration):
+    from custom_components import authenticated
+
+    ban_logger = logging.getLogger(BAN_LOGGER)
+    handlers = list(ban_logger.handlers)
+
+    async def _run():
+        await setup_integration()
+        assert len(ban_logger.handlers) == len(handlers) + 1
+        await authenticated.async_unload_entry(hass, config_entry)
+
+    asyncio.run(_run())
+    assert ban_logger.handlers == handlers
@@ -50,6 +50,17 @@ def test_config_flow_file_exists():
     assert os.path.isfile(os.path.join(SRC_DIR, "config_flow.py"))
 
 
+def test_config_flow_does_not_import_the_coordinator():
+    """The config flow is loaded before setup; it must not pull in the runtime modules."""
+    with open(os.path.join(SRC_DIR, "config_flow.py")) as f:
+        source = f.read()
+
+    for module in (".coordinator", ".backfill", ".failed_logins"):
+        assert f"from {module} import" not in source, (
+            f"config_flow.py should take defaults from const.py, not {module}"
+        )
+
+
 def test_strings_json_exists():
     """strings.json must exist for config flow UI."""
     assert os.path.isfile(os.path.join(SRC_DIR, "strings.json"))
@@ -72,6 +83,15 @@ def test_init_has_entry_lifecycle():
     )
 
 
+def test_init_with_async_setup_has_config_schema():
+    """hassfest rejects an async_setup without a CONFIG_SCHEMA."""
+    with open(os.path.join(SRC_DIR, "__init__.py")) as f:
+        source = f.read()
+
+    if "async def async_setup(" in source:
+        assert "CONFIG_SCHEMA = cv.platform_only_config_schema(DOMAIN)" in source
+
+
 def test_init_forwards_platforms():
     """__init__.py must forward platform setup via async_forward_entry_setups."""
     with open(os.path.join(SRC_DIR, "__init__.py")) as f:
@@ -111,15 +131,17 @@ def test_sensor_has_unique_id():
 
 
 def test_sensor_uses_dt_util_not_datetime_utcnow():
-    """sensor.py must use homeassistant.util.dt.utcnow(), not datetime.utcnow()."""
+    """Login handling must use homeassistant.util.dt.utcnow(), not datetime.utcnow()."""
     with open(os.path.join(SRC_DIR, "sensor.py")) as f:
         source = f.read()
+    with open(os.path.join(SRC_DIR, "coordinator.py")) as f:
+        source += f.read()
 
     assert "datetime.utcnow()" not in source, (
         "datetime.utcnow() is deprecated in Python 3.12+; use homeassistant.util.dt.utcnow()"
     )
     assert "dt_util" in source, (
-        "sensor.py should import homeassistant.util.dt as dt_util"
+        "coordinator.py should import homeassistant.util.dt as dt_util"
     )
 
 
@@ -0,0 +1,83 @@
+"""Tests for tracking IPv6 logins by prefix."""
+
+import asyncio
+from ipaddress import ip_address
+from unittest.mock import patch
+
+from conftest import FakeConfigEntry
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.const import DATA_COORDINATOR
+
+
+def test_tracking_key():
+    assert coordinator_mod.tracking_key("8.8.8.8", 64) == "8.8.8.8"
+    assert coordinator_mod.tracking_key("2001:db8:1:2::1", 128) == "2001:db8:1:2::1"
+    assert coordinator_mod.tracking_key("2001:db8:1:2:aaaa::1", 64) == "2001:db8:1:2::/64"
+    assert coordinator_mod.tracking_key("2001:db8:1:2:aaaa::1", 48) == "2001:db8:1::/48"
+
+
+def test_stored_records_are_folded_by_prefix():
+    records = {
+        "2001:db8::%x" % i: {"last_used_at": f"2024-01-01T00:00:{i:02d}", "country": "X"}
+        for i in range(20)
+    }
+    records["8.8.8.8"] = {"last_used_at": "2024-01-01T00:00:00"}
+
+    folded = coordinator_mod.aggregate_records(records, 64)
+
+    assert set(folded) == {"2001:db8::/64", "8.8.8.8"}
+    prefix = folded["2001:db8::/64"]
+    assert prefix["last_used_at"] == "2024-01-01T00:00:19"
+    assert len(prefix["addresses"]) == coordinator_mod.MAX_ADDRESSES
+    assert prefix["addresses"][-1] == "2001:db8::13"
+    assert coordinator_mod.aggregate_records(records, 128) is records
+
+
+def test_rotating_addresses_share_one_record(hass, setup_integration):
+    """Lookups, DNS queries and notifications happen once per /64."""
+    lookups = []
+    resolved = []
+
+    def _lookup(self, use_cache=True):
+        lookups.append(self.address)
+        self.country = "Testland"
+        return True
+
+    def _resolve(ip):
+        resolved.append(ip)
+        return "unknown"
+
+    notify = []
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", _resolve
+        ), patch.object(
+            coordinator_mod, "async_create", lambda *a, **kw: notify.append(kw["notification_id"])
+        ):
+            entities = await setup_integration(FakeConfigEntry({"ipv6_prefix": 64}))
+            # A burst before any lookup finishes must not fan out.
+            for i in range(1, 41):
+                hass.bus.async_fire(
+                    "homeassistant_auth",
+                    {
+                        "ip_address": str(ip_address(f"2600:1f00:0:{i % 2}::{i:x}")),
+                        "user_id": "u1",
+                    },
+                )
+            await hass.async_block_till_done()
+        return entities
+
+    entities = asyncio.run(_run())
+    coordinator = hass.data[DATA_COORDINATOR]
+
+    assert set(coordinator.ips) == {"2600:1f00::/64", "2600:1f00:0:1::/64"}
+    assert len(lookups) == 2
+    assert len(resolved) == 2
+    assert set(notify) == {"2600:1f00::/64", "2600:1f00:0:1::/64"}
+    record = coordinator.stored["2600:1f00:0:1::/64"]
+    assert len(record["addresses"]) == coordinator_mod.MAX_ADDRESSES
+    assert record["addresses"][-1] == "2600:1f00:0:1::27"
+    assert record["country"] == "Testland"
+    assert entities[0].native_value in ("2600:1f00::28", "2600:1f00:0:1::27")
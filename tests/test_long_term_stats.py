@@ -0,0 +1,181 @@
+"""Tests for the hourly long-term statistics imported into the recorder."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from conftest import FakeConfigEntry
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.const import CONF_NOTIFY
+from custom_components.authenticated.long_term_stats import (
+    STATISTIC_DISTINCT_IPS,
+    STATISTIC_LOGINS,
+    STATISTIC_NEW_IPS,
+    LongTermStats,
+    user_statistic_id,
+)
+from custom_components.authenticated.sensor import AuthenticatedSensor
+from custom_components.authenticated.stats import HOUR
+
+START = datetime(2024, 3, 1, 10, tzinfo=timezone.utc)
+T0 = START.timestamp()
+
+
+def _imported(hass):
+    """Return the imported rows by statistic id, across all import calls."""
+    rows = {}
+    for metadata, statistics in hass.recorder_statistics:
+        rows.setdefault(metadata["statistic_id"], []).extend(statistics)
+    return rows
+
+
+def _write_history(path, rows):
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def test_seeds_finished_hours_from_history(hass):
+    history = hass.config.path("history.jsonl")
+    _write_history(
+        history,
+        [
+            {"timestamp": "2024-03-01T10:05:00+00:00", "ip": "8.8.8.8", "username": "alice", "new_ip": True},
+            {"timestamp": "2024-03-01T10:45:00+00:00", "ip": "8.8.8.8", "username": "alice", "new_ip": False},
+            {"timestamp": "2024-03-01T10:50:00+00:00", "ip": "1.1.1.1", "username": "Bob Smith", "new_ip": True},
+            {"timestamp": "2024-03-01T12:10:00+00:00", "ip": "9.9.9.9", "username": "alice", "new_ip": True},
+            {"timestamp": "2024-03-01T13:10:00+00:00", "ip": "9.9.9.9"},
+        ],
+    )
+
+    async def _run():
+        stats = LongTermStats(hass)
+        with patch("time.time", return_value=T0 + 3 * HOUR + 60):
+            await stats.async_load(history)
+        return stats
+
+    stats = asyncio.run(_run())
+    rows = _imported(hass)
+
+    assert [row["start"] for row in rows[STATISTIC_LOGINS]] == [START, START.replace(hour=12)]
+    assert [(row["state"], row["sum"]) for row in rows[STATISTIC_LOGINS]] == [(3, 3), (1, 4)]
+    assert [row["sum"] for row in rows[STATISTIC_NEW_IPS]] == [2, 3]
+    assert [row["max"] for row in rows[STATISTIC_DISTINCT_IPS]] == [2, 1]
+    assert [row["sum"] for row in rows[user_statistic_id("alice")]] == [2, 3]
+    assert rows["authenticated:logins_bob_smith"] == [{"start": START, "state": 1, "sum": 1}]
+    # The hour in progress is held back until it is finished.
+    assert list(stats.pending) == [int(T0 // HOUR) + 3]
+
+    metadata = {m["statistic_id"]: m for m, _ in hass.recorder_statistics}
+    assert metadata[STATISTIC_LOGINS]["has_sum"] and metadata[STATISTIC_LOGINS]["source"] == "authenticated"
+    assert metadata[STATISTIC_DISTINCT_IPS]["has_mean"] and not metadata[STATISTIC_DISTINCT_IPS]["has_sum"]
+
+
+def test_sums_continue_after_a_restart(hass):
+    async def _run():
+        stats = LongTermStats(hass)
+        await stats.async_load(hass.config.path("history.jsonl"))
+        stats.record(T0, "8.8.8.8", "alice", True)
+        stats.record(T0 + 60, "8.8.4.4", "alice", False)
+        assert stats.async_import(now=T0 + HOUR) == 1
+        stats.record(T0 + HOUR, "8.8.8.8", "alice", False)
+        await stats.async_save()
+
+        restarted = LongTermStats(hass)
+        await restarted.async_load(hass.config.path("history.jsonl"))
+        restarted.async_import(now=T0 + 2 * HOUR)
+
+    asyncio.run(_run())
+
+    assert [row["sum"] for row in _imported(hass)[STATISTIC_LOGINS]] == [2, 3]
+
+
+def test_logins_before_loading_are_kept(hass):
+    async def _run():
+        stats = LongTermStats(hass)
+        await stats.async_load(hass.config.path("history.jsonl"))
+        stats.record(T0, "8.8.8.8", "alice", True)
+        await stats.async_save()
+
+        restarted = LongTermStats(hass)
+        restarted.record(T0 + 60, "8.8.4.4", "alice", True)
+        await restarted.async_load(hass.config.path("history.jsonl"))
+        restarted.async_import(now=T0 + HOUR)
+
+    asyncio.run(_run())
+    rows = _imported(hass)
+
+    assert [row["sum"] for row in rows[STATISTIC_LOGINS]] == [2]
+    assert [row["max"] for row in rows[STATISTIC_DISTINCT_IPS]] == [2]
+
+
+def test_nothing_is_counted_without_the_recorder(hass):
+    hass.config.components = set()
+
+    async def _run():
+        stats = LongTermStats(hass)
+        await stats.async_load(hass.config.path("history.jsonl"))
+        return stats
+
+    stats = asyncio.run(_run())
+
+    assert not stats.loaded
+    assert stats.async_import(now=T0) == 0
+    assert hass.recorder_statistics == []
+
+
+def test_logins_are_imported_and_sensor_attributes_unrecorded(hass, setup_integration):
+    def _lookup(self, use_cache=True):
+        self.country = "Testland"
+        return True
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "unknown"
+        ):
+            entities = await setup_integration()
+            for ip in ("8.8.8.8", "8.8.4.4", "8.8.8.8"):
+                hass.bus.async_fire("homeassistant_auth", {"ip_address": ip, "user_id": "u1"})
+                await hass.async_block_till_done()
+        coordinator = hass.data[coordinator_mod.DATA_COORDINATOR]
+        coordinator.long_term_stats.async_import(now=datetime.now(timezone.utc).timestamp() + HOUR)
+        return entities
+
+    entities = asyncio.run(_run())
+    rows = _imported(hass)
+
+    assert rows[STATISTIC_LOGINS][-1]["sum"] == 3
+    assert rows[STATISTIC_NEW_IPS][-1]["sum"] == 2
+    assert rows[STATISTIC_DISTINCT_IPS][-1]["max"] == 2
+    assert rows[user_statistic_id("Unknown")][-1]["sum"] == 3
+
+    sensor = next(e for e in entities if isinstance(e, AuthenticatedSensor))
+    assert set(sensor.extra_state_attributes) == AuthenticatedSensor._unrecorded_attributes
+
+
+def test_ip_is_only_new_once_without_notifications(hass, setup_integration):
+    def _lookup(self, use_cache=True):
+        self.country = "Testland"
+        return True
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "unknown"
+        ):
+            await setup_integration(FakeConfigEntry({CONF_NOTIFY: False}))
+            for _ in range(3):
+                hass.bus.async_fire("homeassistant_auth", {"ip_address": "8.8.8.8", "user_id": "u1"})
+                await hass.async_block_till_done()
+        coordinator = hass.data[coordinator_mod.DATA_COORDINATOR]
+        coordinator.long_term_stats.async_import(now=datetime.now(timezone.utc).timestamp() + HOUR)
+        return coordinator
+
+    coordinator = asyncio.run(_run())
+    rows = _imported(hass)
+
+    assert not coordinator.notify
+    assert rows[STATISTIC_LOGINS][-1]["sum"] == 3
+    assert rows[STATISTIC_NEW_IPS][-1]["sum"] == 1
+    with open(coordinator.history_file) as f:
+        assert [json.loads(line)["new_ip"] for line in f] == [True, False, False]
@@ -0,0 +1,240 @@
+"""Tests for memory use as tracked IPs grow, and for the memory budget."""
+
+import asyncio
+import gc
+import json
+import os
+import tracemalloc
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.aggregation import SharedGeoCache
+from custom_components.authenticated.const import CONF_MEMORY_BUDGET
+from custom_components.authenticated.serialization import yaml_dump, yaml_load_chunks
+
+MIB = 1024 * 1024
+# No quota, so every new IP is looked up during the first refresh.
+CONFIG = {"daily_quota": 0, "monthly_quota": 0}
+
+
+def _ip(index):
+    return f"11.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"
+
+
+def _last_used(index):
+    return f"2024-01-01T{index // 3600 % 24:02d}:{index // 60 % 60:02d}:{index % 60:02d}+00:00"
+
+
+def _write_auth(hass, count, last_used=_last_used):
+    auth = {
+        "data": {
+            "users": [{"id": f"u{i}", "name": f"User {i}"} for i in range(10)],
+            "refresh_tokens": [
+                {
+                    "last_used_ip": _ip(i),
+                    "last_used_at": last_used(i),
+                    "user_id": f"u{i % 10}",
+                    "client_id": "https://example.org/",
+                }
+                for i in range(count)
+            ],
+        }
+    }
+    with open(hass.config.path(".storage/auth"), "w") as f:
+        json.dump(auth, f)
+
+
+def _lookup(self, use_cache=True):
+    _lookup.calls += 1
+    self.country = "Norway"
+    self.country_code = "NO"
+    self.city = "Oslo"
+    self.asn = "AS2119"
+    self.org = "Telenor Norge AS"
+    self.latitude = 59.91
+    self.longitude = 10.75
+    self.timezone = "Europe/Oslo"
+    self.enriched_at = "2024-01-01T00:00:00+00:00"
+    return True
+
+
+@pytest.fixture
+def lookups():
+    _lookup.calls = 0
+    with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+        coordinator_mod, "get_hostname", lambda ip: "unknown"
+    ):
+        yield _lookup
+
+
+async def _refreshed(hass, budget=None):
+    coordinator = coordinator_mod.AuthenticatedCoordinator(
+        hass, {**CONFIG, CONF_MEMORY_BUDGET: budget}
+    )
+    await coordinator.async_refresh()
+    return coordinator
+
+
+def _outfile(coordinator):
+    with open(coordinator.out) as f:
+        return {ip: attrs for chunk in yaml_load_chunks(f) for ip, attrs in chunk.items()}
+
+
+@pytest.mark.parametrize(
+    "count, budget, peak_limit, steady_limit",
+    [
+        (10_000, None, 16, 13),
+        (10_000, 4, 18, 4),
+        (100_000, 32, 170, 32),
+    ],
+)
+def test_memory_stays_within_limits(hass, lookups, count, budget, peak_limit, steady_limit):
+    _write_auth(hass, count)
+
+    async def _run():
+        gc.collect()
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            coordinator = await _refreshed(hass, budget)
+            gc.collect()
+            steady, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return coordinator, (peak - start) / MIB, (steady - start) / MIB
+
+    coordinator, peak, steady = asyncio.run(_run())
+
+    assert lookups.calls == count
+    assert peak < peak_limit, f"peak {peak:.1f} MiB"
+    assert steady < steady_limit, f"steady state {steady:.1f} MiB"
+    if budget is not None:
+        assert len(coordinator.ips) < count
+        assert len(coordinator.all_records) == count
+
+
+def test_outfile_without_budget_is_a_plain_yaml_dump(tmp_path):
+    """Writing record by record leaves the format unchanged without a budget."""
+    records = {
+        "8.8.8.8": {
+            "country": "Norway",
+            "city": "Tromsø",
+            "user_ids": ["a", "b"],
+            "hostname": None,
+            "new_ip": True,
+        },
+        "1.1.1.1": {"country": "yes", "previous_used_at": "2024-01-01T00:00:00+00:00"},
+        "::1": {"user_ids": []},
+    }
+    path = str(tmp_path / ".ip_authenticated.yaml")
+
+    coordinator_mod.write_outfile(path, records)
+
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == yaml_dump(records)
+
+
+def test_spilled_records_stay_in_outfile_and_exports(hass, lookups):
+    _write_auth(hass, 2000)
+
+    async def _run():
+        coordinator = await _refreshed(hass, budget=0.5)
+        records = await hass.async_add_executor_job(
+            lambda: dict(coordinator.all_records.items())
+        )
+        return coordinator, records
+
+    coordinator, records = asyncio.run(_run())
+
+    assert 0 < len(coordinator.ips) < 2000
+    assert coordinator.spill.count() == 2000 - len(coordinator.ips)
+    # The most recently used IPs are the ones kept in memory.
+    assert _ip(1999) in coordinator.ips and _ip(0) not in coordinator.ips
+    assert len(coordinator.all_records) == 2000
+    assert records == _outfile(coordinator)
+    assert records[_ip(0)]["country"] == "Norway"
+    assert records[_ip(0)]["last_used_at"] == _last_used(0)
+
+
+def test_restart_parses_only_records_kept_in_memory(hass, lookups):
+    _write_auth(hass, 2000)
+
+    async def _run():
+        first = await _refreshed(hass, budget=0.5)
+        expected = _outfile(first)
+        with patch.object(
+            coordinator_mod, "compact_record", wraps=coordinator_mod.compact_record
+        ) as parsed:
+            restarted = await _refreshed(hass, budget=0.5)
+        return first, restarted, expected, parsed.call_count
+
+    first, restarted, expected, parsed = asyncio.run(_run())
+
+    assert lookups.calls == 2000
+    assert parsed == len(first.ips)
+    assert set(restarted.ips) == set(first.ips)
+    assert _outfile(restarted) == expected
+
+
+def test_changed_outfile_is_read_whole(hass, lookups):
+    _write_auth(hass, 2000)
+
+    async def _run():
+        first = await _refreshed(hass, budget=0.5)
+        records = _outfile(first)
+        records[_ip(0)]["country"] = "Edited"
+        with open(first.out, "w") as f:
+            yaml_dump(records, f)
+        return await _refreshed(hass, budget=0.5)
+
+    records = _outfile(asyncio.run(_run()))
+
+    assert lookups.calls == 2000
+    assert records[_ip(0)]["country"] == "Edited"
+    assert len(records) == 2000
+
+
+def test_spilled_ip_is_restored_when_used_again(hass, lookups):
+    _write_auth(hass, 2000)
+
+    async def _run():
+        coordinator = await _refreshed(hass, budget=0.5)
+        assert _ip(0) not in coordinator.ips and _ip(1) not in coordinator.ips
+
+        # A login from a spilled IP is not a new IP.
+        await coordinator.async_handle_auth_event(
+            SimpleNamespace(data={"ip_address": _ip(0), "user_id": "u0"})
+        )
+        ipdata = coordinator.ips[_ip(0)]
+        assert not ipdata.new_ip and ipdata.country == "Norway"
+
+        # A token used since its record was spilled brings the record back.
+        _write_auth(hass, 2000, lambda i: "2025-01-01T00:00:00+00:00" if i == 1 else _last_used(i))
+        await coordinator.async_refresh()
+        return coordinator
+
+    records = _outfile(asyncio.run(_run()))
+
+    assert lookups.calls == 2000
+    assert records[_ip(1)]["last_used_at"] == "2025-01-01T00:00:00+00:00"
+    assert records[_ip(1)]["country"] == "Norway"
+    assert len(records) == 2000
+
+
+def test_shed_geo_cache_keeps_unflushed_results(tmp_path):
+    path = str(tmp_path / "geo_cache.json")
+    with open(path, "w") as f:
+        json.dump({"8.8.8.8": {"country": "US"}}, f)
+    cache = SharedGeoCache(path)
+    cache.refresh()
+    cache.put("1.1.1.1", {"country": "AU"})
+
+    cache.shed()
+
+    assert len(cache) == 1
+    assert cache.get("8.8.8.8") is None
+    cache.flush()
+    assert os.path.exists(path) and cache.get("8.8.8.8") == {"country": "US"}
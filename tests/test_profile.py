@@ -0,0 +1,157 @@
+"""Tests for the on-demand profiling service."""
+
+import asyncio
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+from homeassistant.exceptions import HomeAssistantError, Unauthorized
+
+from custom_components.authenticated import profiling
+from custom_components.authenticated.serialization import json_dumps
+
+ROWS = [{"ip": f"10.0.{i // 256}.{i % 256}", "user": "u1", "country": "Norway"} for i in range(2000)]
+
+
+def _busy(stop):
+    while not stop.is_set():
+        json_dumps(ROWS)
+
+
+def _functions(path):
+    return {(os.path.basename(filename), name) for filename, _, name in pstats.Stats(path).stats}
+
+
+def test_sampling_covers_executor_jobs(hass, setup_integration):
+    async def _run():
+        await setup_integration()
+        stop = threading.Event()
+        job = hass.async_add_executor_job(_busy, stop)
+        response = await hass.services.async_call(
+            "authenticated",
+            "profile",
+            {"duration": 0.3, "mode": "sample", "memory": True},
+            return_response=True,
+        )
+        stop.set()
+        await job
+        return response
+
+    response = asyncio.run(_run())
+
+    assert set(response) == {"pstats", "summary", "memory"}
+    assert all(os.path.dirname(path) == hass.config.path() for path in response.values())
+    functions = _functions(response["pstats"])
+    assert ("serialization.py", "json_dumps") in functions
+    # Stacks are cut at the integration, the test's own frames are left out.
+    assert ("test_profile.py", "_busy") not in functions
+    with open(response["summary"]) as f:
+        assert "json_dumps" in f.read()
+    with open(response["memory"]) as f:
+        assert "Growth over the profiling window" in f.read()
+    assert profiling.DATA_PROFILE not in hass.data
+
+
+def test_deterministic_profiles_coroutines(hass, setup_integration):
+    async def _work(stop):
+        while not stop.is_set():
+            json_dumps(ROWS[:100])
+            await asyncio.sleep(0)
+
+    async def _run():
+        await setup_integration()
+        stop = asyncio.Event()
+        task = asyncio.ensure_future(_work(stop))
+        response = await hass.services.async_call(
+            "authenticated",
+            "profile",
+            {"duration": 0.2, "mode": "deterministic", "memory": False},
+            return_response=True,
+        )
+        stop.set()
+        await task
+        return response
+
+    response = asyncio.run(_run())
+
+    assert set(response) == {"pstats", "summary"}
+    stats = pstats.Stats(response["pstats"]).stats
+    calls = [v[1] for (f, _, name), v in stats.items() if name == "json_dumps" and f.startswith(profiling.PACKAGE_DIR)]
+    assert calls and calls[0] > 1
+
+
+def test_one_session_at_a_time(hass):
+    async def _run():
+        first = asyncio.ensure_future(profiling.async_profile(hass, 0.2, memory=False))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HomeAssistantError):
+            await profiling.async_profile(hass, 0.1, memory=False)
+        return await first
+
+    assert "pstats" in asyncio.run(_run())
+
+
+@pytest.mark.parametrize("mode", [profiling.MODE_SAMPLE, profiling.MODE_DETERMINISTIC])
+def test_cancelled_session_stops_tracing(hass, mode):
+    threads = threading.active_count()
+
+    async def _run():
+        task = asyncio.ensure_future(profiling.async_profile(hass, 60, mode))
+        await asyncio.sleep(0.1)
+        assert tracemalloc.is_tracing()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_run())
+
+    assert not tracemalloc.is_tracing()
+    assert sys.getprofile() is None
+    assert not any(t.name == "authenticated_sampler" for t in threading.enumerate())
+    assert threading.active_count() <= threads
+    assert profiling.DATA_PROFILE not in hass.data
+
+
+def test_profile_and_export_are_admin_only(hass, setup_integration):
+    hass.auth.users = {
+        "admin": SimpleNamespace(is_admin=True),
+        "user": SimpleNamespace(is_admin=False),
+    }
+
+    async def _call(service, user_id):
+        return await hass.services.async_call(
+            "authenticated",
+            service,
+            {"duration": 0.1, "mode": "sample", "memory": False},
+            return_response=True,
+            context=SimpleNamespace(user_id=user_id),
+        )
+
+    async def _run():
+        await setup_integration()
+        for service in ("profile", "export"):
+            with pytest.raises(Unauthorized):
+                await _call(service, "user")
+        return await _call("profile", "admin")
+
+    assert "pstats" in asyncio.run(_run())
+
+
+def test_sampled_stats_fold_stacks():
+    sampler = profiling.StackSampler(interval=0.01)
+    a, b, c = ("pkg.py", 1, "a"), ("pkg.py", 5, "b"), ("lib.py", 9, "c")
+    sampler.samples.update({(a, b, c): 3, (a, b): 1, (a, a): 2})
+
+    stats = sampler.stats()
+
+    assert stats[c][2] == pytest.approx(0.03)
+    assert stats[b][2] == pytest.approx(0.01)
+    assert stats[b][3] == pytest.approx(0.04)
+    # Recursion counts towards cumulative time once.
+    assert stats[a][3] == pytest.approx(0.06)
+    assert stats[c][4][b][3] == pytest.approx(0.03)
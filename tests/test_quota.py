@@ -0,0 +1,146 @@
+"""Tests for provider quota accounting and lookup priorities."""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from conftest import FakeConfigEntry
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.backfill import BackfillScheduler
+from custom_components.authenticated.const import DATA_COORDINATOR
+from custom_components.authenticated.quota import (
+    PRIORITY_BACKFILL,
+    PRIORITY_LIVE,
+    PRIORITY_RETRY,
+    QuotaTracker,
+)
+
+NOON = datetime(2024, 5, 31, 12, tzinfo=timezone.utc).timestamp()
+NEXT_DAY = datetime(2024, 6, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def test_priorities_leave_budget_for_live_logins(hass):
+    quota = QuotaTracker(hass)
+
+    assert quota.limit("ipapi", "daily") == 1000
+    assert quota.acquire("ipapi", PRIORITY_BACKFILL, 800, now=NOON) == 500
+    assert quota.acquire("ipapi", PRIORITY_BACKFILL, now=NOON) == 0
+    assert quota.acquire("ipapi", PRIORITY_RETRY, 800, now=NOON) == 400
+    assert quota.acquire("ipapi", PRIORITY_LIVE, 800, now=NOON) == 100
+    assert quota.available("ipapi", PRIORITY_LIVE, now=NOON) == 0
+    assert quota.seconds_until_available("ipapi", now=NOON) == 12 * 3600
+
+    quota.release("ipapi", 1, now=NOON)
+    assert quota.acquire("ipapi", PRIORITY_LIVE, now=NOON) == 1
+
+
+def test_periods_roll_over(hass):
+    quota = QuotaTracker(hass)
+    quota.acquire("ipapi", count=1000, now=NOON)
+
+    state = quota.state("ipapi", now=NEXT_DAY)
+    assert state["daily"] == {"limit": 1000, "used": 0, "remaining": 1000}
+    assert state["monthly"] == {"limit": 30000, "used": 0, "remaining": 30000}
+
+    quota.acquire("ipinfo", count=10, now=NOON)
+    assert quota.state("ipinfo", now=NOON)["monthly"]["remaining"] == 49990
+    assert quota.state("ipinfo", now=NOON)["daily"]["remaining"] is None
+
+
+def test_overrides_and_unlimited_providers(hass):
+    assert QuotaTracker(hass, daily=0).limit("ipapi", "daily") is None
+    assert QuotaTracker(hass, daily=5).limit("ipapi", "daily") == 5
+    unlimited = QuotaTracker(hass, daily=0, monthly=0)
+    assert unlimited.available("ipapi") is None
+    assert unlimited.acquire("ipapi", PRIORITY_BACKFILL, 10**6) == 10**6
+    assert QuotaTracker(hass).available("self_hosted") is None
+
+
+def test_counts_persist_across_restarts(hass):
+    async def _run():
+        quota = QuotaTracker(hass)
+        await quota.async_load()
+        quota.acquire("ipapi", count=7)
+        await quota.async_save()
+
+        restarted = QuotaTracker(hass)
+        # Lookups made before loading finished are added to the stored ones.
+        restarted.acquire("ipapi", count=2)
+        await restarted.async_load()
+        return restarted
+
+    restarted = asyncio.run(_run())
+    assert restarted.state("ipapi")["daily"]["used"] == 9
+
+
+def test_reconcile_defers_to_live_logins(hass, setup_integration):
+    auth = {
+        "data": {
+            "users": [],
+            "refresh_tokens": [
+                {"last_used_ip": f"8.8.8.{i}", "last_used_at": f"2024-01-01T00:00:{i:02d}", "user_id": "u1"}
+                for i in range(1, 11)
+            ],
+        }
+    }
+    with open(hass.config.path(".storage/auth"), "w") as f:
+        json.dump(auth, f)
+    looked_up = []
+
+    def _lookup(self, use_cache=True):
+        looked_up.append(self.ip_address)
+        self.country = "Testland"
+        return True
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "unknown"
+        ):
+            await setup_integration(FakeConfigEntry({"daily_quota": 4}))
+            reconciled = list(looked_up)
+            for ip in ("1.1.1.1", "9.9.9.9", "1.0.0.1"):
+                hass.bus.async_fire("homeassistant_auth", {"ip_address": ip, "user_id": "u1"})
+                await hass.async_block_till_done()
+        return reconciled
+
+    reconciled = asyncio.run(_run())
+    coordinator = hass.data[DATA_COORDINATOR]
+
+    assert reconciled == ["8.8.8.1", "8.8.8.2"]
+    assert looked_up[2:] == ["1.1.1.1", "9.9.9.9"]
+    # Deferred reconcile lookups are left to the backfill, not retried.
+    assert "8.8.8.3" not in coordinator.retry_queue
+    entry = coordinator.retry_queue.entries["1.0.0.1"]
+    assert entry["error"] == "Lookup quota exhausted"
+    assert coordinator.retry_queue.paused_until > entry["due"] - 1
+
+    sensor = hass.states["sensor.authenticated_quota_test_entry"]
+    assert sensor.state == 0
+    assert sensor.attributes["provider"] == "ipapi"
+    assert sensor.attributes["daily_limit"] == 4
+    assert sensor.attributes["monthly_remaining"] == 30000 - 4
+
+
+def test_backfill_stops_at_its_share(hass):
+    coordinator = coordinator_mod.AuthenticatedCoordinator(hass, {"daily_quota": 4})
+    coordinator.last_update_success = True
+    coordinator.retry_queue.loaded = True
+    for i in range(5):
+        data = coordinator_mod.AuthenticatedData(f"8.8.8.{i}", {"last_used_at": f"2024-01-0{i + 1}"})
+        coordinator.ips[data.ipaddr] = coordinator_mod.IPData(data, {}, "ipapi", new=False)
+    calls = []
+
+    def _lookup(self, use_cache=True):
+        calls.append(self.ip_address)
+        return True
+
+    async def _write():
+        pass
+
+    coordinator.async_write_to_file = _write
+    with patch.object(coordinator_mod.IPData, "lookup", _lookup):
+        asyncio.run(BackfillScheduler(coordinator, 30, batch_size=5).async_run())
+
+    assert calls == ["8.8.8.4", "8.8.8.3"]
@@ -0,0 +1,80 @@
+"""Tests for the persistent lookup retry queue."""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.retry import (
+    BASE_DELAY,
+    MAX_DELAY,
+    RetryQueue,
+    backoff_delay,
+)
+
+
+def test_backoff_is_exponential_with_jitter():
+    for attempts in range(1, 12):
+        delay = min(MAX_DELAY, BASE_DELAY * 2 ** (attempts - 1))
+        for _ in range(20):
+            assert delay / 2 <= backoff_delay(attempts) <= delay
+
+
+def test_retry_after_pauses_queue_and_persists(hass):
+    async def _run():
+        queue = RetryQueue(hass)
+        await queue.async_load()
+        queue.schedule("8.8.8.8", error="boom")
+        queue.schedule("1.1.1.1", retry_after=3600)
+        await queue.async_save()
+
+        restored = RetryQueue(hass)
+        await restored.async_load()
+        return restored
+
+    queue = asyncio.run(_run())
+    later = time.time() + MAX_DELAY
+    assert set(queue.entries) == {"8.8.8.8", "1.1.1.1"}
+    assert queue.entries["1.1.1.1"]["due"] >= time.time() + 3500
+    assert queue.due(now=time.time() + 600) == []
+    assert queue.due(now=later) == ["8.8.8.8", "1.1.1.1"]
+
+
+def test_failed_lookup_is_retried_once_provider_recovers(hass, setup_integration):
+    with open(hass.config.path(".storage/auth"), "w") as f:
+        json.dump({"data": {"users": [], "refresh_tokens": []}}, f)
+    outcomes = [False, True]
+
+    def _lookup(self):
+        ok = outcomes.pop(0)
+        if ok:
+            self.country = "Testland"
+        else:
+            self.retry_after = 30
+        return ok
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "unknown"
+        ):
+            await setup_integration()
+            hass.bus.async_fire("homeassistant_auth", {"ip_address": "8.8.8.8"})
+            await hass.async_block_till_done()
+
+            coordinator = hass.data["authenticated_coordinator"]
+            assert "8.8.8.8" in coordinator.retry_queue
+            assert coordinator.stored["8.8.8.8"]["country"] is None
+
+            # Nothing is due while the provider's Retry-After is running.
+            await coordinator.async_process_retries()
+            assert outcomes == [True]
+
+            coordinator.retry_queue.paused_until = 0
+            coordinator.retry_queue.entries["8.8.8.8"]["due"] = 0
+            await coordinator.async_process_retries()
+        return coordinator
+
+    coordinator = asyncio.run(_run())
+    assert len(coordinator.retry_queue) == 0
+    assert coordinator.stored["8.8.8.8"]["country"] == "Testland"
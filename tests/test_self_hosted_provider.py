@@ -0,0 +1,236 @@
+"""Tests for the configurable self-hosted geolocation provider."""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated import providers as providers_mod
+from custom_components.authenticated.providers import (
+    SelfHostedProvider,
+    get_path,
+    parse_mapping,
+)
+
+pytest.importorskip("requests")
+
+FIELDS = "country=location.country.name, country_code=location.country.iso, asn=network.asn"
+
+
+def _answer(ip):
+    return {
+        "ip": ip,
+        "location": {"country": {"name": "Testland", "iso": "TL"}},
+        "network": {"asn": "AS64500"},
+        "org": "Example",
+    }
+
+
+class GeoService:
+    """Local geo API speaking HTTP/1.1 so connections can be kept alive."""
+
+    def __init__(self, rate_limited=False, limited_ips=()):
+        self.requests = []
+        self.connections = set()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "60")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                service.requests.append(("GET", self.path, self.headers.get("Authorization")))
+                service.connections.add(self.client_address)
+                self._reply(200, _answer(self.path.rsplit("/", 1)[-1]))
+
+            def do_POST(self):
+                ips = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                service.requests.append(("POST", ips, self.headers.get("Authorization")))
+                service.connections.add(self.client_address)
+                if rate_limited:
+                    self._reply(429, {})
+                elif self.path == "/keyed":
+                    self._reply(200, {ip: _answer(ip) for ip in reversed(ips)})
+                else:
+                    self._reply(
+                        200,
+                        [
+                            {"error": True, "reason": "RateLimited"}
+                            if ip in limited_ips
+                            else _answer(ip)
+                            for ip in ips
+                        ],
+                    )
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def _reset_provider():
+    yield
+    SelfHostedProvider.configure(None)
+
+
+def test_mapping_helpers():
+    assert parse_mapping("a=b.c, d = e ,junk") == {"a": "b.c", "d": "e"}
+    assert parse_mapping({"a": 1}) == {"a": "1"}
+    assert parse_mapping(None) == {}
+    data = {"a": {"b": [{"c": 1}]}}
+    assert get_path(data, "a.b.0.c") == 1
+    assert get_path(data, "a.x.c") is None
+    assert get_path(data, "a.b.5") is None
+
+
+def test_lookups_map_fields_and_reuse_connection():
+    with GeoService() as service:
+        SelfHostedProvider.configure(
+            f"{service.url}/geo/{{ip}}", api_key="secret", fields=FIELDS
+        )
+        results = []
+        for ip in ("8.8.8.8", "1.1.1.1", "9.9.9.9"):
+            provider = SelfHostedProvider(ip)
+            provider.update_geo_info()
+            results.append(provider.computed_result)
+
+    assert not provider.failed
+    assert results[0]["country"] == "Testland"
+    assert results[0]["country_code"] == "TL"
+    assert results[0]["asn"] == "AS64500"
+    # Unmapped keys are read from the same name in the response.
+    assert results[0]["org"] == "Example"
+    assert results[0]["city"] is None
+    assert [path for _, path, _ in service.requests] == [
+        "/geo/8.8.8.8",
+        "/geo/1.1.1.1",
+        "/geo/9.9.9.9",
+    ]
+    assert {auth for _, _, auth in service.requests} == {"Bearer secret"}
+    assert len(service.connections) == 1
+
+
+def test_missing_url_fails_the_lookup():
+    SelfHostedProvider.configure(None)
+    provider = SelfHostedProvider("8.8.8.8")
+    provider.update_geo_info()
+    assert provider.failed
+
+
+@pytest.mark.parametrize("path", ["/batch", "/keyed"])
+def test_batch_lookup(path):
+    ips = ["8.8.8.8", "1.1.1.1", "9.9.9.9"]
+    with GeoService() as service:
+        SelfHostedProvider.configure(
+            f"{service.url}/geo/{{ip}}",
+            batch_url=service.url + path,
+            headers="X-Token=abc",
+            fields=FIELDS,
+        )
+        providers = SelfHostedProvider.lookup_batch(ips)
+
+    assert [p.ipaddr for p in providers] == ips
+    assert all(p.computed_result["country"] == "Testland" for p in providers)
+    assert [p.result["ip"] for p in providers] == ips
+    assert service.requests == [("POST", ips, None)]
+
+
+def test_batch_rate_limit_marks_every_ip():
+    with GeoService(rate_limited=True) as service:
+        SelfHostedProvider.configure(f"{service.url}/geo/{{ip}}", batch_url=f"{service.url}/batch")
+        providers = SelfHostedProvider.lookup_batch(["8.8.8.8", "1.1.1.1"])
+
+    assert all(p.failed and p.retry_after == 60 for p in providers)
+
+
+def test_rate_limit_within_a_chunk_keeps_earlier_results():
+    ips = [f"8.8.8.{i}" for i in range(5)]
+    with GeoService(limited_ips={"8.8.8.1"}) as service, patch.object(
+        providers_mod, "BATCH_SIZE", 3
+    ):
+        SelfHostedProvider.configure(
+            f"{service.url}/geo/{{ip}}", batch_url=f"{service.url}/batch", fields=FIELDS
+        )
+        providers = SelfHostedProvider.lookup_batch(ips)
+
+    assert [p.failed for p in providers] == [False, True, True, True, True]
+    assert providers[0].computed_result["country"] == "Testland"
+    assert [p.sent for p in providers] == [True, True, True, False, False]
+    assert len(service.requests) == 1
+
+
+def test_unsent_chunks_give_their_quota_back(hass):
+    """After a rate limit, later chunks are not sent and are not charged."""
+    ips = [f"8.8.8.{i}" for i in range(5)]
+
+    async def _run(coordinator):
+        ipdatas = [
+            coordinator_mod.IPData(
+                coordinator_mod.AuthenticatedData(ip, {}), {}, "self_hosted"
+            )
+            for ip in ips
+        ]
+        return await coordinator.async_lookup(ipdatas, coordinator_mod.PRIORITY_RETRY)
+
+    with GeoService(rate_limited=True) as service, patch.object(providers_mod, "BATCH_SIZE", 2):
+        coordinator = coordinator_mod.AuthenticatedCoordinator(
+            hass,
+            {
+                "provider": "self_hosted",
+                "provider_url": f"{service.url}/geo/{{ip}}",
+                "provider_batch_url": f"{service.url}/batch",
+                "daily_quota": 100,
+            },
+        )
+        results = asyncio.run(_run(coordinator))
+
+    assert results == [False, False, None, None, None]
+    assert len(service.requests) == 1
+    assert coordinator.quota.state("self_hosted")["daily"]["used"] == 2
+
+
+def test_lookup_many_batches_uncached_ips():
+    class Cache:
+        def get(self, ip):
+            return {"country": "Cached"} if ip == "1.1.1.1" else None
+
+        def put(self, ip, result):
+            pass
+
+    def _ipdata(ip):
+        data = coordinator_mod.AuthenticatedData(ip, {})
+        return coordinator_mod.IPData(data, {}, "self_hosted", geo_cache=Cache())
+
+    with GeoService() as service:
+        SelfHostedProvider.configure(
+            f"{service.url}/geo/{{ip}}", batch_url=f"{service.url}/batch", fields=FIELDS
+        )
+        ipdatas = [_ipdata(ip) for ip in ("8.8.8.8", "1.1.1.1", "9.9.9.9")]
+        results = coordinator_mod.lookup_many(ipdatas)
+
+    assert results == [True, True, True]
+    assert [d.country for d in ipdatas] == ["Testland", "Cached", "Testland"]
+    assert service.requests == [("POST", ["8.8.8.8", "9.9.9.9"], None)]
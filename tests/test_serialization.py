@@ -0,0 +1,93 @@
+"""Tests for the JSON and YAML codec layer."""
+
+import io
+import json
+import math
+import random
+
+import pytest
+
+from benchmark import make_auth, make_history, make_records, run_benchmarks, speedups
+from custom_components.authenticated import serialization
+from custom_components.authenticated.export import append_history, iter_history
+from custom_components.authenticated.serialization import JSON_CODECS, YAML_CODECS
+
+
+def test_json_codecs_agree():
+    rng = random.Random(1)
+    rows = make_history(50, rng)
+    auth = make_auth(20, rng)
+
+    for codec in JSON_CODECS.values():
+        assert [codec.dumps(row) for row in rows] == [
+            json.dumps(row, separators=(",", ":"), ensure_ascii=False).encode() for row in rows
+        ]
+        assert codec.loads(json.dumps(auth)) == auth
+        assert codec.loads(json.dumps(auth).encode()) == auth
+
+
+def test_json_codecs_keep_stdlib_edge_cases():
+    for codec in JSON_CODECS.values():
+        assert math.isnan(codec.loads('{"x": NaN}')["x"])
+        assert codec.loads(codec.dumps({1: "a"})) == {"1": "a"}
+        with pytest.raises(ValueError):
+            codec.loads("{")
+
+
+def test_yaml_codecs_agree():
+    records = make_records(50, random.Random(1))
+    expected = io.StringIO()
+    serialization.YAML_CODECS["python"].dump(records, expected)
+
+    for codec in YAML_CODECS.values():
+        out = io.StringIO()
+        codec.dump(records, out)
+        assert out.getvalue() == expected.getvalue()
+        assert out.getvalue().startswith("---\n")
+        assert codec.load(out.getvalue()) == records
+
+
+def test_yaml_records_load_like_a_dumped_mapping():
+    records = make_records(50, random.Random(1))
+    records["8.8.8.8"] = {
+        "yes": 1e-05,
+        "Key with space": [1, 2.5, None, "NO"],
+        "n": float("inf"),
+        "org": "Åse \u2028\x85 ☃ 😀\t\"\\",
+        "postal": "0150",
+        "nested": {"a": True},
+    }
+    records["::1"] = {}
+    records[5] = None
+    text = "---\n" + "".join(serialization.yaml_record(ip, attrs) for ip, attrs in records.items())
+
+    assert serialization.YAML.load(text) == records
+    parts = list(serialization.yaml_load_chunks(io.StringIO(text), size=7))
+    assert len(parts) == 8
+    assert {ip: attrs for part in parts for ip, attrs in part.items()} == records
+
+    dumped = io.StringIO(serialization.yaml_dump(records))
+    parts = serialization.yaml_load_chunks(dumped)
+    assert {ip: attrs for part in parts for ip, attrs in part.items()} == records
+
+
+def test_history_journal_reads_older_lines(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    with open(path, "w") as f:
+        f.write(json.dumps({"ip": "8.8.8.8", "username": "Åse"}) + "\n")
+    append_history(path, {"ip": "8.8.4.4", "username": "Åse"})
+
+    assert [row["username"] for row in iter_history(path)] == ["Åse", "Åse"]
+
+
+@pytest.mark.skipif(
+    "orjson" not in JSON_CODECS or "libyaml" not in YAML_CODECS,
+    reason="needs orjson and libyaml",
+)
+def test_accelerated_codecs_are_faster():
+    ratios = speedups(run_benchmarks(records=300, repeat=3))
+
+    for case in ("auth_load", "history_load", "history_dump"):
+        assert ratios[case]["orjson"] > 1, case
+    for case in ("outfile_load", "outfile_dump"):
+        assert ratios[case]["libyaml"] > 1, case
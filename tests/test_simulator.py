@@ -0,0 +1,66 @@
+"""Tests for the login-storm simulator harness."""
+
+import json
+import random
+import urllib.error
+import urllib.request
+from ipaddress import ip_address, ip_network
+
+import pytest
+
+from simulator import SCENARIOS, StubGeoServer, percentiles, run_simulation
+
+
+def test_percentiles_use_nearest_rank():
+    samples = list(range(1, 101))
+    assert percentiles(samples) == {"p50": 50, "p90": 90, "p99": 99, "max": 100}
+    assert percentiles([]) == {}
+
+
+def test_scenarios_generate_public_addresses():
+    for name, scenario in SCENARIOS.items():
+        addresses = scenario(random.Random(1))
+        for _ in range(200):
+            assert ip_address(next(addresses)).is_global, name
+
+
+def test_hot_scenario_repeats_addresses():
+    addresses = SCENARIOS["hot_ips"](random.Random(1))
+    sample = [next(addresses) for _ in range(1000)]
+    assert len(set(sample)) < 200
+
+
+def test_ipv6_churn_stays_in_few_prefixes():
+    addresses = SCENARIOS["ipv6_churn"](random.Random(1))
+    sample = [next(addresses) for _ in range(500)]
+    prefixes = {ip_network(f"{ip}/64", strict=False) for ip in sample}
+    assert len(set(sample)) == 500
+    assert len(prefixes) <= 8
+
+
+def test_stub_server_serves_and_counts_lookups():
+    with StubGeoServer(rate_limit_every=2) as server:
+        url = server.url.format("8.8.8.8")
+        with urllib.request.urlopen(url) as response:
+            data = json.load(response)
+        with pytest.raises(urllib.error.HTTPError) as err:
+            urllib.request.urlopen(url)
+    assert data["ip"] == "8.8.8.8"
+    assert data["country_name"].startswith("Country")
+    assert err.value.code == 429
+    assert err.value.headers["Retry-After"] == "1"
+    assert server.requests == 2
+
+
+def test_login_storm_report():
+    """A small burst runs end to end against the stub provider."""
+    pytest.importorskip("requests")
+
+    report = run_simulation(scenario="new_ips", events=20, seed=3)
+
+    assert report["events"] == 20
+    assert report["tracked_ips"] == 20
+    assert report["lookups"] == 20
+    assert set(report["latency_ms"]) == {"p50", "p90", "p99", "max"}
+    assert report["file_writes_by_file"][".ip_authenticated_history.jsonl"] == 20
+    assert report["peak_memory_kb"] > 0
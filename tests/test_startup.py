@@ -0,0 +1,101 @@
+"""Tests for the integration's startup cost."""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+from custom_components import authenticated
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.sensor import AuthenticatedSensor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SLOW_LOOKUP = 0.5
+
+
+def _write_auth(hass, ips):
+    auth = {
+        "data": {
+            "users": [{"id": "u1", "name": "Alice"}],
+            "refresh_tokens": [
+                {
+                    "last_used_ip": ip,
+                    "last_used_at": f"2024-01-01T00:00:{i:02d}+00:00",
+                    "user_id": "u1",
+                    "client_id": "https://example.org/",
+                }
+                for i, ip in enumerate(ips)
+            ],
+        }
+    }
+    with open(hass.config.path(".storage/auth"), "w") as f:
+        json.dump(auth, f)
+
+
+def _slow_lookup(self):
+    time.sleep(SLOW_LOOKUP)
+    self.country = "Testland"
+    return True
+
+
+def test_setup_entry_does_not_wait_for_enrichment(hass, config_entry):
+    """Entities are added before the auth file is reconciled and enriched."""
+    _write_auth(hass, ["8.8.8.8", "1.1.1.1"])
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _slow_lookup):
+            start = time.perf_counter()
+            await authenticated.async_setup_entry(hass, config_entry)
+            setup_time = time.perf_counter() - start
+
+            coordinator = hass.data[authenticated.DOMAIN][config_entry.entry_id]
+            assert hass.config_entries.entities[config_entry.entry_id]
+            assert coordinator.ips == {}
+
+            await hass.async_block_till_done()
+        return setup_time, coordinator
+
+    setup_time, coordinator = asyncio.run(_run())
+
+    assert setup_time < SLOW_LOOKUP / 5, f"setup took {setup_time:.3f}s"
+    entity = hass.config_entries.entities[config_entry.entry_id][0]
+    assert entity.native_value == "1.1.1.1"
+    assert coordinator.ips["8.8.8.8"].country == "Testland"
+
+
+def test_restored_state_is_used_until_initial_run(hass):
+    """The entity reports its last state while the initial run is pending."""
+    restored = type(
+        "State", (), {"state": "9.9.9.9", "attributes": {"username": "Alice"}}
+    )()
+    coordinator = coordinator_mod.AuthenticatedCoordinator(hass, {})
+    entity = AuthenticatedSensor(coordinator)
+
+    async def _last_state():
+        return restored
+
+    entity.async_get_last_state = _last_state
+    asyncio.run(entity.async_added_to_hass())
+
+    assert entity.native_value == "9.9.9.9"
+    assert entity.extra_state_attributes == {"username": "Alice"}
+
+
+def test_providers_import_does_not_load_requests():
+    """requests is only imported lazily on the executor lookup path."""
+    code = (
+        "import sys; sys.path.insert(0, 'tests'); import conftest; "
+        "import custom_components.authenticated.providers; "
+        "print('requests' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=REPO_ROOT,
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,119 @@
+"""Tests for the incremental login statistics."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.stats import DAY, HOUR, HOURS_KEPT, LoginStats
+
+NOW = 1_700_000_000 - 1_700_000_000 % DAY + 12 * HOUR
+
+
+def test_rollups_cover_their_period(hass):
+    stats = LoginStats(hass)
+    stats.record(NOW, "Norway", "AS1", "alice")
+    stats.record(NOW - 2 * HOUR, "Norway", "AS2", "alice")
+    stats.record(NOW - 3 * DAY, "Sweden", "AS3", "bob")
+    stats.record(NOW - 20 * DAY, None, None, "bob")
+
+    hour = stats.query("hour", now=NOW)
+    assert hour["logins"] == 1
+
+    day = stats.query("day", now=NOW)
+    assert day["logins"] == 2
+    assert day["countries"] == {"Norway": 2}
+    assert day["distinct_asns_per_user"] == {"alice": 2}
+
+    week = stats.query("week", now=NOW)
+    assert week["logins"] == 3
+    assert week["users"] == {"alice": 2, "bob": 1}
+
+    month = stats.query("month", now=NOW, limit=1)
+    assert month["logins"] == 4
+    assert month["countries"] == {"Norway": 2}
+    assert stats.query("month", now=NOW)["asns"]["Unknown"] == 1
+
+
+def test_old_buckets_are_pruned(hass):
+    stats = LoginStats(hass)
+    for hours in range(100):
+        stats.record(NOW + hours * HOUR, "Norway", "AS1", "alice")
+    assert len(stats.tables[HOUR]) == HOURS_KEPT
+    assert len(stats.tables[DAY]) == 5
+
+
+def test_buckets_persist_and_seed_from_history(hass):
+    history = hass.config.path("history.jsonl")
+    with open(history, "w") as f:
+        for country in ("Norway", "Norway", "Sweden"):
+            row = {"timestamp": "2099-01-01T00:00:00+00:00", "country": country}
+            f.write(json.dumps(row) + "\n")
+
+    async def _run():
+        seeded = LoginStats(hass)
+        await seeded.async_load(history)
+        seeded.record("2099-01-01T01:00:00+00:00", "Norway", "AS1", "alice")
+        await seeded.async_save()
+        restored = LoginStats(hass)
+        await restored.async_load(history)
+        return restored
+
+    restored = asyncio.run(_run())
+    week = restored.query("week", now="2099-01-01T02:00:00+00:00")
+    assert week["logins"] == 4
+    assert week["countries"] == {"Norway": 3, "Sweden": 1}
+
+
+def test_logins_before_loading_are_kept(hass):
+    history = hass.config.path("history.jsonl")
+    with open(history, "w") as f:
+        row = {"timestamp": "2099-01-01T00:00:00+00:00", "country": "Norway"}
+        f.write(json.dumps(row) + "\n")
+
+    async def _run():
+        first = LoginStats(hass)
+        # Already in the journal the first load seeds from.
+        first.record("2099-01-01T00:00:00+00:00", "Norway", "AS1", "alice")
+        first.record("2099-01-01T00:30:00+00:00", "Sweden", "AS1", "alice")
+        await first.async_load(history)
+        seeded = first.query("day", now="2099-01-01T01:00:00+00:00")
+        await first.async_save()
+
+        # After a restart the buckets come from storage, not the journal.
+        restarted = LoginStats(hass)
+        restarted.record("2099-01-01T00:45:00+00:00", "Sweden", "AS1", "bob")
+        await restarted.async_load(history)
+        return seeded, restarted.query("day", now="2099-01-01T01:00:00+00:00")
+
+    seeded, restarted = asyncio.run(_run())
+    assert seeded["countries"] == {"Norway": 1, "Sweden": 1}
+    assert restarted["countries"] == {"Norway": 1, "Sweden": 2}
+
+
+def test_logins_feed_sensors_and_service(hass, setup_integration):
+    def _lookup(self, use_cache=True):
+        self.country, self.asn = "Testland", "AS64500"
+        return True
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "unknown"
+        ):
+            entities = await setup_integration()
+            for ip in ("8.8.8.8", "8.8.4.4", "8.8.8.8"):
+                hass.bus.async_fire("homeassistant_auth", {"ip_address": ip, "user_id": "u1"})
+                await hass.async_block_till_done()
+        response = await hass.services.async_call(
+            "authenticated", "stats", {"period": "week"}, return_response=True
+        )
+        return entities, response
+
+    entities, response = asyncio.run(_run())
+
+    assert response["logins"] == 3
+    assert response["countries"] == {"Testland": 3}
+    assert response["distinct_asns_per_user"] == {"Unknown": 1}
+    day = hass.states["sensor.authenticated_logins_day_test_entry"]
+    assert day.state == 3
+    assert day.attributes["asns"] == {"AS64500": 3}
@@ -0,0 +1,202 @@
+"""Tests for the websocket login stream and paginated listings."""
+
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.authenticated import coordinator as coordinator_mod
+from custom_components.authenticated.export import iter_history_reverse
+from custom_components.authenticated.websocket_api import (
+    InvalidCursor,
+    _filters,
+    encode_cursor,
+    page_history,
+    page_records,
+)
+
+
+def _write_history(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            row = {
+                "timestamp": f"2024-01-01T{i // 60:02d}:{i % 60:02d}:00+00:00",
+                "ip": f"8.8.{i // 256}.{i % 256}",
+                "username": "alice" if i % 3 else "bob",
+                "country": "Norway" if i % 2 else "Sweden",
+            }
+            f.write(json.dumps(row) + "\n")
+
+
+def test_history_is_read_backwards_in_chunks(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    _write_history(path, 50)
+
+    rows = list(iter_history_reverse(path, chunk_size=37))
+    assert [row["ip"] for _, row in rows] == [f"8.8.0.{i}" for i in reversed(range(50))]
+
+    offset = rows[10][0]
+    rest = [row["ip"] for _, row in iter_history_reverse(path, before=offset, chunk_size=37)]
+    assert rest == [f"8.8.0.{i}" for i in reversed(range(39))]
+    assert list(iter_history_reverse(str(tmp_path / "missing.jsonl"))) == []
+
+
+def test_history_pages_cover_every_row_once(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    _write_history(path, 300)
+
+    seen = []
+    cursor = None
+    while True:
+        page = page_history(path, {"user": "alice"}, cursor, limit=70)
+        seen.extend(row["ip"] for row in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    expected = [f"8.8.{i // 256}.{i % 256}" for i in reversed(range(300)) if i % 3]
+    assert seen == expected
+
+
+def test_history_time_range_and_scan_limit(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    _write_history(path, 300)
+
+    page = page_history(
+        path,
+        {"since": "2024-01-01T04:00:00+00:00", "until": "2024-01-01T04:09:00+00:00"},
+    )
+    assert [row["timestamp"][11:16] for row in page["items"]] == [
+        f"04:{m:02d}" for m in reversed(range(10))
+    ]
+    assert page["next_cursor"] is None
+
+    # No row matches: the page comes back empty with a cursor to resume from.
+    page = page_history(path, {"country": "nowhere"}, max_scan=100)
+    assert page["items"] == []
+    resumed = page_history(path, {"country": "nowhere"}, page["next_cursor"], max_scan=1000)
+    assert resumed == {"items": [], "next_cursor": None}
+
+
+def test_record_pages_are_ordered_and_filtered():
+    records = {
+        f"8.8.{i // 256}.{i % 256}": {
+            "last_used_at": f"2024-01-{1 + i % 28:02d}T00:00:00+00:00",
+            "country": "Norway" if i % 2 else "Sweden",
+            "country_code": "NO" if i % 2 else "SE",
+            "asn": f"AS{i % 5}",
+        }
+        for i in range(1000)
+    }
+
+    seen = []
+    cursor = None
+    while True:
+        page = page_records(records, {"country": "no"}, cursor, limit=120)
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 500
+    assert len({item["ip"] for item in seen}) == 500
+    assert all(item["country"] == "Norway" for item in seen)
+    keys = [(item["last_used_at"], item["ip"]) for item in seen]
+    assert keys == sorted(keys, reverse=True)
+
+    page = page_records(records, {"asn": "as3", "country": "sweden"}, limit=5)
+    assert all(item["asn"] == "AS3" and item["country"] == "Sweden" for item in page["items"])
+
+
+def test_cursors_of_the_wrong_shape_are_rejected(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    _write_history(path, 10)
+    for value in (5, None, ["a"], ["a", 1], {"a": "b"}):
+        with pytest.raises(InvalidCursor):
+            page_records({}, {}, encode_cursor(value))
+    for value in ("5", True, -1, [1]):
+        with pytest.raises(InvalidCursor):
+            page_history(path, {}, encode_cursor(value))
+
+
+def test_websocket_commands(hass, setup_integration, ws_client):
+    def _lookup(self, use_cache=True):
+        self.country, self.country_code, self.asn = "Testland", "TL", "AS64500"
+        return True
+
+    async def _run():
+        with patch.object(coordinator_mod.IPData, "lookup", _lookup), patch.object(
+            coordinator_mod, "get_hostname", lambda ip: "unknown"
+        ):
+            await setup_integration()
+            subscribed = await ws_client.send(
+                {"type": "authenticated/logins/subscribe", "country": "tl"}
+            )
+            for ip in ("8.8.8.8", "8.8.4.4"):
+                hass.bus.async_fire("homeassistant_auth", {"ip_address": ip, "user_id": "u1"})
+                await hass.async_block_till_done()
+            ws_client.connection.subscriptions.pop(subscribed["id"])()
+            hass.bus.async_fire("homeassistant_auth", {"ip_address": "1.1.1.1", "user_id": "u1"})
+            await hass.async_block_till_done()
+
+            ips = await ws_client.send({"type": "authenticated/ips/list", "limit": 2})
+            history = await ws_client.send(
+                {
+                    "type": "authenticated/history/list",
+                    "since": datetime(2000, 1, 1, tzinfo=timezone.utc),
+                }
+            )
+            invalid = await ws_client.send({"type": "authenticated/ips/list", "cursor": "!!"})
+        return subscribed, ips, history, invalid
+
+    subscribed, ips, history, invalid = asyncio.run(_run())
+
+    events = ws_client.events(subscribed["id"])
+    assert [event["ip"] for event in events] == ["8.8.8.8", "8.8.4.4"]
+    assert events[0]["asn"] == "AS64500"
+
+    assert [item["ip"] for item in ips["result"]["items"]] == ["1.1.1.1", "8.8.4.4"]
+    assert ips["result"]["next_cursor"] is not None
+    assert [row["ip"] for row in history["result"]["items"]] == ["1.1.1.1", "8.8.4.4", "8.8.8.8"]
+    assert not invalid["success"]
+    assert invalid["error"]["code"] == "invalid_format"
+
+
+def test_time_filters_compare_in_utc(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    _write_history(path, 180)
+
+    # 02:00 at +02:00 is midnight UTC, so the rows from 01:00 UTC are kept.
+    since = datetime(2024, 1, 1, 2, tzinfo=timezone(timedelta(hours=2)))
+    filters = _filters({"since": since, "until": datetime(2024, 1, 1, 1, 30)})
+    assert filters == {
+        "since": "2024-01-01T00:00:00+00:00",
+        "until": "2024-01-01T01:30:00+00:00",
+    }
+
+    page = page_history(path, filters, None, limit=200)
+    assert len(page["items"]) == 91
+    assert page["items"][0]["timestamp"] == "2024-01-01T01:30:00+00:00"
+    assert page["items"][-1]["timestamp"] == "2024-01-01T00:00:00+00:00"
+
+
+def test_commands_require_admin(hass, setup_integration, ws_client):
+    ws_client.connection.user.is_admin = False
+
+    async def _run():
+        await setup_integration()
+        return [
+            await ws_client.send({"type": command})
+            for command in (
+                "authenticated/logins/subscribe",
+                "authenticated/ips/list",
+                "authenticated/history/list",
+            )
+        ]
+
+    for result in asyncio.run(_run()):
+        assert not result["success"]
+        assert result["error"]["code"] == "unauthorized"
+    assert ws_client.connection.subscriptions == {}